@@ -0,0 +1,166 @@
+"""
+Absences and worked time per service for every weekly, monthly, quarterly and
+yearly period of a year: one aggregate query over fact_daily_attendance per
+period against NumPy reductions over the memory-mapped attendance matrices.
+Then checks that the worked time statistics count a day written after the
+last matrix refresh.
+
+The matrices are written to MATRIX_DIR, which is replaced.
+
+Usage: BENCH_DATABASE_URL=postgresql://... MATRIX_DIR=/tmp/matrix \
+    python -m benchmarks.attendance_matrix
+"""
+
+import os
+import shutil
+from datetime import date
+from typing import Dict, Sequence, Tuple
+import numpy as np
+from prefect.logging import disable_run_logger
+from sqlalchemy import text
+from benchmarks.common import get_bench_engine, seed, timer
+from database import MATRIX_DIR
+from database.db import get_engine, warm_pool
+from database.dimensions import calendar_index
+from database.matrix import ABSENT, NO_SERVICE, attendance_matrix, day_ordinals
+from tasks.durations import duration_stats
+from tasks.matrix import refresh_attendance_matrix
+from tasks.utils import REPORT_KINDS, _period_day_ids, report_periods
+
+SERVICES = 20
+EMPLOYEES = 3000
+YEAR = 2025
+
+PERIOD_TOTALS = text(
+    """
+    SELECT
+        e.service_id,
+        count(*) FILTER (WHERE NOT a.present),
+        COALESCE(
+            sum(
+                CAST(extract(epoch FROM a.check_out_hour - a.check_in_hour) AS integer)
+            ) FILTER (WHERE a.present),
+            0
+        )
+    FROM hr_data.fact_daily_attendance a
+    JOIN hr_data.dim_employee e ON e.id = a.id_employee
+    WHERE a.date_id = ANY(:date_ids)
+    GROUP BY e.service_id
+    """
+)
+TAKE_DAY = text(
+    """
+    DELETE FROM hr_data.fact_daily_attendance WHERE date_id = :date_id
+    RETURNING date_id, id_employee, present, check_in_hour, check_out_hour
+    """
+)
+PUT_DAY = text(
+    """
+    INSERT INTO hr_data.fact_daily_attendance
+        (date_id, id_employee, present, check_in_hour, check_out_hour)
+    VALUES (:date_id, :id_employee, :present, :check_in_hour, :check_out_hour)
+    """
+)
+
+
+def matrix_totals(date_ids: Sequence[int]) -> Dict[int, Tuple[int, int]]:
+    """
+    return service id -> days recorded absent | seconds worked
+    """
+    date_ids = np.asarray(date_ids, np.int64)
+    totals: Dict[int, Tuple[int, int]] = {}
+    for year in np.unique(date_ids // 10000).tolist():
+        matrix = attendance_matrix(year)
+        days = day_ordinals(date_ids[date_ids // 10000 == year])
+        absences = np.count_nonzero(matrix.presence[:, days] == ABSENT, axis=1)
+        seconds = matrix.worked_seconds[:, days].sum(axis=1, dtype=np.int64)
+
+        known = matrix.services != NO_SERVICE
+        service_ids, rows = np.unique(matrix.services[known], return_inverse=True)
+        for service_id, service_absences, service_seconds in zip(
+            service_ids.tolist(),
+            np.bincount(rows, absences[known], len(service_ids)).tolist(),
+            np.bincount(rows, seconds[known], len(service_ids)).tolist(),
+        ):
+            previous = totals.get(service_id, (0, 0))
+            totals[service_id] = (
+                previous[0] + int(service_absences),
+                previous[1] + int(service_seconds),
+            )
+    return totals
+
+
+def check_pending_day() -> None:
+    """
+    Write back the last working day of the year after a matrix refresh ran
+    without it, and compare the December statistics with a refresh
+    """
+    start, end = date(YEAR, 12, 1), date(YEAR, 12, 31)
+    last_day = calendar_index().working_day_ids_between(start, end)[-1]
+    with get_engine().begin() as conn:
+        rows = conn.execute(TAKE_DAY, {"date_id": last_day}).mappings().all()
+    with disable_run_logger():
+        refresh_attendance_matrix.fn()
+    without_day = duration_stats(start, end)
+
+    with get_engine().begin() as conn:
+        conn.execute(PUT_DAY, rows)
+    pending = duration_stats(start, end)
+    with disable_run_logger():
+        refresh_attendance_matrix.fn()
+    refreshed = duration_stats(start, end)
+
+    assert pending != without_day
+    assert pending == refreshed
+    print(f"day {last_day} written after the refresh is counted")
+
+
+def main() -> None:
+    engine = get_bench_engine()
+    get_engine(engine.url)
+    seed(engine, SERVICES, EMPLOYEES, YEAR)
+    warm_pool()
+    shutil.rmtree(MATRIX_DIR, ignore_errors=True)
+
+    with disable_run_logger(), timer() as built:
+        refresh_attendance_matrix.fn()
+    size = sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(MATRIX_DIR)
+        for name in names
+    )
+    print(f"matrices built in {built[0]:.2f}s, {size / 2**20:.1f} MiB")
+
+    calendar = calendar_index()
+    periods = report_periods(REPORT_KINDS, date(YEAR, 1, 1), date(YEAR, 12, 31))
+    period_ids = [_period_day_ids(calendar, period) for period in periods]
+
+    def postgres() -> list:
+        with get_engine().connect() as conn:
+            return [
+                {
+                    service_id: (absences, seconds)
+                    for service_id, absences, seconds in conn.execute(
+                        PERIOD_TOTALS, {"date_ids": date_ids}
+                    )
+                }
+                for date_ids in period_ids
+            ]
+
+    def matrix() -> list:
+        return [matrix_totals(date_ids) for date_ids in period_ids]
+
+    print(f"{len(periods)} periods")
+    print(f"{'source':<8} | {'seconds':>8}")
+    results = {}
+    for name, fetch in (("postgres", postgres), ("matrix", matrix)):
+        with timer() as elapsed:
+            results[name] = fetch()
+        print(f"{name:<8} | {elapsed[0]:>8.3f}")
+
+    assert results["postgres"] == results["matrix"]
+    check_pending_day()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Time to regenerate a year of weekly, monthly, quarterly and yearly workbooks:
+one fetch and render per period, as separate report runs would, against one
+scan of the daily summary rendered in a process pool.
+
+Usage: BENCH_DATABASE_URL=postgresql://... python -m benchmarks.backfill
+"""
+
+import os
+import tempfile
+from datetime import date
+from typing import Dict
+from prefect.logging import disable_run_logger
+from benchmarks.common import count_queries, get_bench_engine, seed, timer
+from database import RENDER_PROCESSES
+from database.db import get_engine, warm_pool
+from database.models import ReportDataset
+from tasks.backfill import render_report, render_reports
+from tasks.utils import (
+    REPORT_KINDS,
+    ReportPeriod,
+    fetch_monthly_dataset,
+    fetch_period_datasets,
+    fetch_quarterly_dataset,
+    fetch_weekly_dataset,
+    fetch_yearly_dataset,
+    report_periods,
+)
+
+SERVICES = 20
+EMPLOYEES = 3000
+YEAR = 2025
+
+
+def fetch_period(period: ReportPeriod) -> ReportDataset:
+    kind, start_date, end_date = period
+    if kind == "weekly":
+        return fetch_weekly_dataset.fn(start_date, end_date)
+    if kind == "monthly":
+        return fetch_monthly_dataset.fn(start_date.month, start_date.year)
+    if kind == "quarterly":
+        return fetch_quarterly_dataset.fn(
+            (start_date.month - 1) // 3 + 1, start_date.year
+        )
+    return fetch_yearly_dataset.fn(start_date.year)
+
+
+def per_period(periods) -> Dict[ReportPeriod, ReportDataset]:
+    return {period: fetch_period(period) for period in periods}
+
+
+def render_sequentially(datasets: Dict[ReportPeriod, ReportDataset]) -> None:
+    for period, dataset in datasets.items():
+        render_report(period, dataset)
+
+
+def main() -> None:
+    engine = get_bench_engine()
+    get_engine(engine.url)
+    seed(engine, SERVICES, EMPLOYEES, YEAR)
+    warm_pool()
+    os.chdir(tempfile.mkdtemp())
+
+    periods = report_periods(REPORT_KINDS, date(YEAR, 1, 1), date(YEAR, 12, 31))
+    print(f"{len(periods)} reports, {RENDER_PROCESSES} render processes")
+    print(f"{'strategy':<10} | {'queries':>7} | {'fetch s':>8} | {'render s':>8}")
+    with disable_run_logger():
+        results = {}
+        for name, fetch, render in (
+            ("per period", per_period, render_sequentially),
+            ("backfill", fetch_period_datasets.fn, render_reports.fn),
+        ):
+            with count_queries(get_engine()) as statements, timer() as fetched:
+                datasets = fetch(periods)
+            with timer() as rendered:
+                render(datasets)
+            print(
+                f"{name:<10} | {len(statements):>7} | {fetched[0]:>8.3f} "
+                f"| {rendered[0]:>8.3f}"
+            )
+            results[name] = [
+                [tuple(row) for row in dataset.rows] for dataset in datasets.values()
+            ]
+
+    assert results["per period"] == results["backfill"]
+
+
+if __name__ == "__main__":
+    main()
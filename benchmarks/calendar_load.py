@@ -0,0 +1,101 @@
+"""
+Time to load the date dimension: one DateDimension entity per day through the
+ORM, against the vectorized build copied in bulk.
+
+Usage: BENCH_DATABASE_URL=postgresql://... python -m benchmarks.calendar_load [years...]
+"""
+
+import sys
+from datetime import date, timedelta
+from typing import List
+from prefect.logging import disable_run_logger
+from sqlalchemy import Engine, text
+from sqlalchemy.orm import Session
+from benchmarks.common import get_bench_engine, seed, timer
+from database.db import get_engine
+from database.models import DAY_NAMES, MONTH_NAMES, DateDimension
+from tasks.date_dimension import load_calendar
+from tasks.warehousing import CREATE_FACT_PARTITIONS
+
+YEAR_COUNTS = [1, 10, 25]
+FIRST_YEAR = 2000
+# Fixed-date public holidays, enough to exercise est_ferie
+HOLIDAY_DAYS = [(1, 1), (5, 1), (7, 30), (8, 14), (11, 18)]
+
+
+def holidays(years: int) -> List[date]:
+    return [
+        date(year, month, day)
+        for year in range(FIRST_YEAR, FIRST_YEAR + years)
+        for month, day in HOLIDAY_DAYS
+    ]
+
+
+def orm(engine: Engine, years: int) -> None:
+    """
+    Previous strategy: one validated entity and INSERT per day, then the fact
+    table partitions of the new months
+    """
+    public_holidays = set(holidays(years))
+    day = date(FIRST_YEAR, 1, 1)
+    with Session(engine) as session:
+        while day.year < FIRST_YEAR + years:
+            session.add(
+                DateDimension(
+                    date_id=int(day.strftime("%Y%m%d")),
+                    date_literale=day,
+                    annee=day.year,
+                    trimestre=(day.month - 1) // 3 + 1,
+                    mois=day.month,
+                    nom_mois=MONTH_NAMES[day.month - 1],
+                    jour=day.day,
+                    nom_jour=DAY_NAMES[day.weekday()],
+                    jour_semaine=day.isoweekday(),
+                    est_ferie=day in public_holidays,
+                )
+            )
+            day += timedelta(days=1)
+        session.commit()
+
+    with engine.begin() as conn:
+        conn.execute(CREATE_FACT_PARTITIONS)
+
+
+def vectorized(engine: Engine, years: int) -> None:
+    load_calendar.fn(
+        date(FIRST_YEAR, 1, 1), date(FIRST_YEAR + years - 1, 12, 31), holidays(years)
+    )
+
+
+def calendar_rows(engine: Engine) -> list:
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT * FROM hr_data.dim_date ORDER BY date_id")
+        ).all()
+
+
+def main() -> None:
+    engine = get_bench_engine()
+    get_engine(engine.url)
+    year_counts = [int(arg) for arg in sys.argv[1:]] or YEAR_COUNTS
+
+    print(f"{'years':>5} | {'strategy':<10} | {'seconds':>8}")
+    with disable_run_logger():
+        for years in year_counts:
+            reference = None
+            for name, load in {"orm": orm, "vectorized": vectorized}.items():
+                # An empty calendar, without the partitions of the fact tables
+                seed(engine, 1, 0, FIRST_YEAR)
+                with engine.begin() as conn:
+                    conn.execute(text("TRUNCATE hr_data.dim_date CASCADE"))
+                with timer() as elapsed:
+                    load(engine, years)
+                print(f"{years:>5} | {name:<10} | {elapsed[0]:>8.3f}")
+
+                rows = calendar_rows(engine)
+                assert reference is None or rows == reference
+                reference = rows
+
+
+if __name__ == "__main__":
+    main()
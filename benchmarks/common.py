@@ -0,0 +1,182 @@
+import glob
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Iterator, List, Tuple
+from sqlalchemy import Engine, create_engine, event, text
+from database.models import DAY_NAMES, MONTH_NAMES, Base
+from tasks.warehousing import (
+    DAILY_HEADCOUNT_UPSERT,
+    record_refresh,
+    refresh_monthly_rollup,
+    refresh_service_summary,
+)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "..", "database", "migrations")
+
+# Benchmarks drop and recreate the hr_data schema, so they never fall back to
+# DATABASE_URL_LOCAL and must be pointed at a scratch database explicitly.
+BENCH_DB_URL = os.getenv("BENCH_DATABASE_URL")
+
+
+def get_bench_engine() -> Engine:
+    if BENCH_DB_URL is None:
+        raise ValueError("BENCH_DATABASE_URL must point to a scratch database.")
+    return create_engine(BENCH_DB_URL, future=True)
+
+
+def apply_migrations(engine: Engine) -> None:
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql"))):
+                with open(path, encoding="utf-8") as migration:
+                    cursor.execute(migration.read())
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def seed(
+    engine: Engine, services: int, employees: int, year: int = 2025, months: int = 12
+) -> None:
+    """
+    Recreate the hr_data schema and fill it with synthetic attendance for the
+    first `months` months of `year`
+    """
+    with engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA IF EXISTS hr_data CASCADE"))
+        conn.execute(text("CREATE SCHEMA hr_data"))
+    Base.metadata.create_all(engine)
+    apply_migrations(engine)
+
+    month_names = ", ".join(f"'{name}'" for name in MONTH_NAMES)
+    day_names = ", ".join(f"'{name}'" for name in DAY_NAMES)
+
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f"""
+                INSERT INTO hr_data.dim_date
+                SELECT
+                    to_char(d, 'YYYYMMDD')::int,
+                    d::date,
+                    extract(year FROM d),
+                    extract(quarter FROM d),
+                    extract(month FROM d),
+                    (ARRAY[{month_names}])[extract(month FROM d)],
+                    extract(day FROM d),
+                    (ARRAY[{day_names}])[extract(isodow FROM d)],
+                    extract(isodow FROM d),
+                    false
+                FROM generate_series(
+                    make_date(:year, 1, 1), make_date(:year, 12, 31), interval '1 day'
+                ) AS d
+                """
+            ),
+            {"year": year},
+        )
+        conn.execute(text("SELECT hr_data.create_fact_partitions()"))
+        conn.execute(
+            text(
+                "INSERT INTO hr_data.dim_service (name) "
+                "SELECT 'Service ' || g FROM generate_series(1, :services) AS g"
+            ),
+            {"services": services},
+        )
+        conn.execute(text("INSERT INTO hr_data.dim_job (name) VALUES ('Employé')"))
+        conn.execute(
+            text(
+                """
+                INSERT INTO hr_data.dim_employee
+                SELECT
+                    g, 'Prénom ' || g, 'Nom ' || g, make_date(:year - 1, 1, 1), NULL,
+                    NULL, 1, (g % :services) + 1, '', 'CIN' || g,
+                    'employe' || g || '@example.com', 100000 + g, '', 'CDI'
+                FROM generate_series(1, :employees) AS g
+                """
+            ),
+            {"year": year, "services": services, "employees": employees},
+        )
+        conn.execute(
+            text(
+                """
+                INSERT INTO hr_data.fact_daily_attendance
+                SELECT
+                    dd.date_id,
+                    e.id,
+                    p.present,
+                    CASE WHEN p.present
+                        THEN time '08:00' + random() * interval '60 minutes' END,
+                    CASE WHEN p.present
+                        THEN time '16:00' + random() * interval '150 minutes' END
+                FROM hr_data.dim_date dd
+                CROSS JOIN hr_data.dim_employee e
+                CROSS JOIN LATERAL (SELECT random() > 0.1 AS present) p
+                WHERE dd.jour_semaine < 6 AND dd.mois <= :months
+                """
+            ),
+            {"months": months},
+        )
+        conn.execute(DAILY_HEADCOUNT_UPSERT)
+        refresh_service_summary(conn)
+        refresh_monthly_rollup(conn, "hr_data.fact_monthly_service_summary")
+        # Log the refreshes so the report router trusts the summaries
+        for target in (
+            "hr_data.fact_daily_headcount",
+            "hr_data.fact_daily_service_summary",
+            "hr_data.fact_monthly_service_summary",
+        ):
+            record_refresh(conn, target, datetime.now(timezone.utc), 0.0)
+        conn.execute(text("ANALYZE"))
+
+
+@contextmanager
+def count_queries(engine: Engine) -> Iterator[List[str]]:
+    statements: List[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@contextmanager
+def capture_statements(engine: Engine) -> Iterator[List[Tuple[str, Any]]]:
+    statements: List[Tuple[str, Any]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@contextmanager
+def peak_memory() -> Iterator[List[int]]:
+    peak: List[int] = []
+    tracemalloc.start()
+    try:
+        yield peak
+    finally:
+        peak.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+
+@contextmanager
+def timer() -> Iterator[List[float]]:
+    elapsed: List[float] = []
+    start = time.perf_counter()
+    try:
+        yield elapsed
+    finally:
+        elapsed.append(time.perf_counter() - start)
@@ -0,0 +1,64 @@
+"""
+Peak Python memory of the daily CSV and attendance classification: all rows
+materialized first, against batches streamed from a server-side cursor.
+
+Usage: BENCH_DATABASE_URL=postgresql://... python -m benchmarks.daily_stream [employees...]
+"""
+
+import os
+import sys
+import tempfile
+from prefect.logging import disable_run_logger
+from benchmarks.common import get_bench_engine, peak_memory, seed, timer
+from database.db import get_engine
+from tasks.utils import (
+    classify_attendance,
+    fetch_employees_per_date,
+    generate_daily_csv,
+    stream_daily_attendance,
+)
+
+EMPLOYEE_COUNTS = [500, 5000, 50000]
+SERVICES = 20
+TARGET_DATE_ID = 20250106
+THRESHOLDS = [8.5, 8]
+
+
+def materialized(target_date_id: int) -> None:
+    """
+    Previous strategy: fetch every row, then classify and write the CSV
+    """
+    rows = fetch_employees_per_date.fn(target_date_id)
+    classify_attendance.fn(rows, THRESHOLDS)
+    generate_daily_csv.fn(rows, "materialized")
+
+
+def streamed(target_date_id: int) -> None:
+    stream_daily_attendance.fn(target_date_id, THRESHOLDS, "streamed")
+
+
+def main() -> None:
+    engine = get_bench_engine()
+    get_engine(engine.url)
+    employee_counts = [int(arg) for arg in sys.argv[1:]] or EMPLOYEE_COUNTS
+
+    os.chdir(tempfile.mkdtemp())
+    print(f"{'employees':>9} | {'strategy':<12} | {'seconds':>8} | {'peak MiB':>8}")
+    with disable_run_logger():
+        for employees in employee_counts:
+            seed(engine, SERVICES, employees, months=1)
+            for name, run in {
+                "materialized": materialized,
+                "streamed": streamed,
+            }.items():
+                run(TARGET_DATE_ID)  # warm the connection pool and the plan cache
+                with timer() as elapsed, peak_memory() as peak:
+                    run(TARGET_DATE_ID)
+                print(
+                    f"{employees:>9} | {name:<12} | {elapsed[0]:>8.3f} | "
+                    f"{peak[0] / 2**20:>8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
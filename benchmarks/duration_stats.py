@@ -0,0 +1,74 @@
+"""
+Worked time statistics of a year at the scale of tens of millions of
+attendance days: the single-sort grouped pass of tasks.durations against
+np.percentile on each service x month group. Synthetic durations, no database.
+
+Usage: python -m benchmarks.duration_stats
+"""
+
+import numpy as np
+from benchmarks.common import peak_memory, timer
+from tasks.durations import DURATION_BUCKETS, DURATION_PERCENTILES
+from tasks.durations import grouped_duration_stats
+
+EMPLOYEES = 100_000
+WORKING_DAYS = 250
+SERVICES = 20
+MONTHS = 12
+
+
+def per_group(groups: np.ndarray, seconds: np.ndarray, group_count: int) -> tuple:
+    order = np.argsort(groups, kind="stable")
+    bounds = np.array(DURATION_BUCKETS) * 3600
+    splits = np.split(
+        seconds[order], np.cumsum(np.bincount(groups, minlength=group_count))[:-1]
+    )
+    return (
+        np.array([len(values) for values in splits]),
+        np.array([values.mean() for values in splits]),
+        np.array([np.percentile(values, DURATION_PERCENTILES) for values in splits]),
+        np.array(
+            [
+                np.bincount(
+                    np.searchsorted(bounds, values, side="right"),
+                    minlength=len(bounds) + 1,
+                )
+                for values in splits
+            ]
+        ),
+    )
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    rows = EMPLOYEES * WORKING_DAYS
+    services = rng.integers(SERVICES, size=EMPLOYEES)
+    months = np.arange(WORKING_DAYS) * MONTHS // WORKING_DAYS
+    month_groups = (months[None, :] * SERVICES + services[:, None]).ravel()
+    seconds = rng.normal(8 * 3600, 1.5 * 3600, rows).clip(60, 16 * 3600)
+    seconds = seconds.astype(np.int64)
+
+    # Every day counts in its month and in the year total, as for a yearly report
+    groups = np.concatenate(
+        [month_groups, MONTHS * SERVICES + np.repeat(services, WORKING_DAYS)]
+    )
+    seconds = np.concatenate([seconds, seconds])
+    group_count = (MONTHS + 1) * SERVICES
+    print(f"{rows} attendance days, {len(groups)} grouped values, {group_count} groups")
+
+    print(f"{'strategy':<12} | {'seconds':>8} | {'peak MiB':>8}")
+    results = {}
+    for name, compute in (
+        ("single sort", grouped_duration_stats),
+        ("per group", per_group),
+    ):
+        with peak_memory() as peak, timer() as elapsed:
+            results[name] = compute(groups, seconds, group_count)
+        print(f"{name:<12} | {elapsed[0]:>8.2f} | {peak[0] / 2**20:>8.0f}")
+
+    for single, grouped in zip(results["single sort"], results["per group"]):
+        assert np.allclose(single, grouped)
+
+
+if __name__ == "__main__":
+    main()
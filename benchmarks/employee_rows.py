@@ -0,0 +1,71 @@
+"""
+Time and peak Python memory of the daily employee fetch: ORM entities against
+projection records.
+
+Usage: BENCH_DATABASE_URL=postgresql://... python -m benchmarks.employee_rows
+"""
+
+import sys
+from prefect.logging import disable_run_logger
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
+from benchmarks.common import get_bench_engine, peak_memory, seed, timer
+from database.db import get_engine
+from database.models import DailyAttendance, DateDimension, DimEmployee
+from tasks.utils import fetch_employees_per_date
+
+EMPLOYEES = 40000
+SERVICES = 50
+TARGET_DATE_ID = 20250106
+RUNS = 5
+
+
+def fetch_entities(target_date_id: int) -> list:
+    """
+    Previous strategy: full DimEmployee and DailyAttendance entities
+    """
+    work_duration = DailyAttendance.check_out_hour - DailyAttendance.check_in_hour
+    stmt = (
+        select(DimEmployee, DailyAttendance, work_duration)
+        .join(DailyAttendance, DimEmployee.id == DailyAttendance.id_employee)
+        .join(DateDimension, DailyAttendance.date_id == DateDimension.date_id)
+        .where(~DateDimension.est_ferie)
+        .where(DateDimension.date_id == target_date_id)
+        .options(joinedload(DailyAttendance.date_table))
+    )
+    with Session(get_engine()) as session:
+        return session.execute(stmt).all()
+
+
+def main() -> None:
+    engine = get_bench_engine()
+    get_engine(engine.url)
+    employees = int(sys.argv[1]) if len(sys.argv) > 1 else EMPLOYEES
+    seed(engine, SERVICES, employees, months=1)
+
+    strategies = {
+        "entities": fetch_entities,
+        "projection": fetch_employees_per_date.fn,
+    }
+    print(f"{employees} employees, {RUNS} runs")
+    print(f"{'strategy':<12} | {'rows':>6} | {'best seconds':>12} | {'peak MiB':>8}")
+    with disable_run_logger():
+        for name, fetch in strategies.items():
+            fetch(TARGET_DATE_ID)  # warm the connection pool and the plan cache
+
+            best = float("inf")
+            for _ in range(RUNS):
+                with timer() as elapsed:
+                    rows = fetch(TARGET_DATE_ID)
+                best = min(best, elapsed[0])
+
+            with peak_memory() as peak:
+                fetch(TARGET_DATE_ID)
+
+            print(
+                f"{name:<12} | {len(rows):>6} | {best:>12.3f} | {peak[0] / 2**20:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
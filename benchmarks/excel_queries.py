@@ -0,0 +1,79 @@
+"""
+Query count and wall time of the yearly workbook against the number of services.
+
+Usage: BENCH_DATABASE_URL=postgresql://... python -m benchmarks.excel_queries
+"""
+
+import os
+import sys
+import tempfile
+from prefect.logging import disable_run_logger
+from sqlalchemy import Integer, func, select
+from sqlalchemy.orm import Session
+from benchmarks.common import count_queries, get_bench_engine, seed, timer
+from database.db import get_engine
+from database.models import DailyAttendance, DateDimension, DimEmployee, DimService
+from tasks.utils import fetch_yearly_dataset, generate_yearly_excel
+
+SERVICE_COUNTS = [10, 50, 150]
+EMPLOYEES = 3000
+YEAR = 2025
+
+
+def per_service_tables(target_year: int) -> None:
+    """
+    Previous strategy: one aggregate over the fact table per service
+    """
+    with Session(get_engine()) as session:
+        services = session.execute(select(DimService.id, DimService.name)).all()
+        for service in services:
+            stmt = (
+                select(
+                    DateDimension.mois,
+                    DateDimension.nom_mois,
+                    func.sum((~DailyAttendance.present).cast(Integer)).label("absence"),
+                    func.count(DimEmployee.id).label("employee_count"),
+                )
+                .join(DailyAttendance, DateDimension.date_id == DailyAttendance.date_id)
+                .join(DimEmployee, DimEmployee.id == DailyAttendance.id_employee)
+                .join(DimService, DimService.id == DimEmployee.service_id)
+                .group_by(DateDimension.mois, DateDimension.nom_mois)
+                .where(~DateDimension.est_ferie)
+                .where(DateDimension.annee == target_year)
+                .where(DateDimension.jour_semaine.not_in([6, 7]))
+                .where(DimService.id == service.id)
+                .order_by(DateDimension.mois)
+            )
+            session.execute(stmt).all()
+
+
+def main() -> None:
+    engine = get_bench_engine()
+    get_engine(engine.url)
+    service_counts = [int(arg) for arg in sys.argv[1:]] or SERVICE_COUNTS
+
+    os.chdir(tempfile.mkdtemp())
+    print(f"{'services':>8} | {'strategy':<12} | {'queries':>7} | {'seconds':>8}")
+    with disable_run_logger():
+        for services in service_counts:
+            seed(engine, services, EMPLOYEES, YEAR)
+
+            with count_queries(get_engine()) as queries, timer() as elapsed:
+                per_service_tables(YEAR)
+            print(
+                f"{services:>8} | {'per service':<12} | "
+                f"{len(queries):>7} | {elapsed[0]:>8.3f}"
+            )
+
+            with count_queries(get_engine()) as queries, timer() as elapsed:
+                generate_yearly_excel.fn(
+                    fetch_yearly_dataset.fn(YEAR), YEAR, f"bench_{services}"
+                )
+            print(
+                f"{services:>8} | {'grouped':<12} | "
+                f"{len(queries):>7} | {elapsed[0]:>8.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
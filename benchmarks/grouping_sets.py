@@ -0,0 +1,90 @@
+"""
+Year end: the December, Q4 and yearly datasets fetched by one query each, as
+separate report runs do, against one GROUPING SETS query over the daily summary.
+The separate quarterly and yearly queries are timed from every source of the
+report router.
+
+Usage: BENCH_DATABASE_URL=postgresql://... python -m benchmarks.grouping_sets
+"""
+
+from datetime import date
+from prefect.logging import disable_run_logger
+from sqlalchemy import text
+from benchmarks.common import count_queries, get_bench_engine, seed, timer
+from database.db import get_engine, warm_pool
+from tasks.utils import (
+    fetch_monthly_dataset,
+    fetch_period_datasets,
+    fetch_quarterly_dataset,
+    fetch_yearly_dataset,
+    report_period,
+)
+
+SERVICES = 20
+EMPLOYEES = 3000
+YEAR = 2025
+RUNS = 5
+
+# Each step queues December for a refresh, so the router falls back to the next
+# source. The queued summaries still hold the seeded figures.
+SOURCES = {
+    "monthly summary": None,
+    "daily summary": text(
+        "INSERT INTO hr_data.absence_pending_months "
+        "VALUES ('hr_data.fact_monthly_service_summary', :year, 12)"
+    ),
+    "raw facts": text(
+        "INSERT INTO hr_data.summary_pending_dates VALUES (:year * 10000 + 1231)"
+    ),
+}
+
+
+def separate() -> list:
+    return [
+        fetch_monthly_dataset.fn(12, YEAR),
+        fetch_quarterly_dataset.fn(4, YEAR),
+        fetch_yearly_dataset.fn(YEAR),
+    ]
+
+
+def shared() -> list:
+    year_end = date(YEAR, 12, 31)
+    periods = [
+        report_period(kind, year_end) for kind in ("monthly", "quarterly", "yearly")
+    ]
+    return list(fetch_period_datasets.fn(periods).values())
+
+
+def best_of(fetch) -> tuple:
+    best = float("inf")
+    for _ in range(RUNS):
+        with count_queries(get_engine()) as statements, timer() as elapsed:
+            datasets = fetch()
+        best = min(best, elapsed[0])
+    return best, len(statements), datasets
+
+
+def main() -> None:
+    engine = get_bench_engine()
+    get_engine(engine.url)
+    seed(engine, SERVICES, EMPLOYEES, YEAR)
+    warm_pool()
+
+    print(f"best of {RUNS} runs")
+    print(f"{'strategy':<28} | {'queries':>7} | {'seconds':>8}")
+    with disable_run_logger():
+        seconds, queries, reference = best_of(shared)
+        print(f"{'grouping sets':<28} | {queries:>7} | {seconds:>8.3f}")
+        reference = [[tuple(row) for row in d.rows] for d in reference]
+
+        for source, make_stale in SOURCES.items():
+            if make_stale is not None:
+                with engine.begin() as conn:
+                    conn.execute(make_stale, {"year": YEAR})
+            seconds, queries, datasets = best_of(separate)
+            print(f"{'separate, ' + source:<28} | {queries:>7} | {seconds:>8.3f}")
+            assert [[tuple(row) for row in d.rows] for d in datasets] == reference
+
+
+if __name__ == "__main__":
+    main()
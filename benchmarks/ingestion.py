@@ -0,0 +1,135 @@
+"""
+Rows per second loading a month of badge clock exports: one INSERT per row,
+against COPY into the staging table and one merge per fact table.
+
+Usage: BENCH_DATABASE_URL=postgresql://... python -m benchmarks.ingestion [employees...]
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+from datetime import date, time, timedelta
+from prefect.logging import disable_run_logger
+from sqlalchemy import Engine, text
+from benchmarks.common import get_bench_engine, seed, timer
+from database.db import get_engine
+from tasks.ingestion import BADGE_COLUMNS, ingest_badge_file
+
+EMPLOYEE_COUNTS = [1000, 5000]
+SERVICES = 20
+YEAR = 2025
+MONTH = 1
+
+ROW_INSERT = """
+    INSERT INTO hr_data.fact_daily_attendance AS a
+        (date_id, id_employee, present, check_in_hour, check_out_hour)
+    SELECT dd.date_id, e.id, %(check_in)s IS NOT NULL, %(check_in)s, %(check_out)s
+    FROM hr_data.dim_employee e, hr_data.dim_date dd
+    WHERE e.matricule = %(matricule)s AND dd.date_literale = %(date)s
+    ON CONFLICT (date_id, id_employee) DO UPDATE
+    SET
+        present = EXCLUDED.present,
+        check_in_hour = EXCLUDED.check_in_hour,
+        check_out_hour = EXCLUDED.check_out_hour
+"""
+ROW_INSERT_ABSENCE = """
+    INSERT INTO hr_data.fact_absence (id_employe, id_type_absence, date_absence_id)
+    SELECT e.id, %(absence_type)s, dd.date_id
+    FROM hr_data.dim_employee e, hr_data.dim_date dd
+    WHERE e.matricule = %(matricule)s AND dd.date_literale = %(date)s
+    ON CONFLICT (id_employe, date_absence_id) DO UPDATE
+    SET id_type_absence = EXCLUDED.id_type_absence
+"""
+
+
+def write_badge_export(path: str, employees: int) -> int:
+    """
+    return the number of rows written, one per employee and working day
+    """
+    rows = 0
+    day = date(YEAR, MONTH, 1)
+    with open(path, "w", newline="") as export:
+        writer = csv.writer(export)
+        writer.writerow(BADGE_COLUMNS)
+        while day.month == MONTH:
+            if day.weekday() < 5:
+                for g in range(1, employees + 1):
+                    if random.random() > 0.1:
+                        check_in = time(8, random.randrange(60))
+                        check_out = time(16 + random.randrange(3), random.randrange(60))
+                        writer.writerow([100000 + g, day, check_in, check_out, None])
+                    else:
+                        writer.writerow([100000 + g, day, None, None, 1])
+                    rows += 1
+            day += timedelta(days=1)
+    return rows
+
+
+def clear_facts(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "TRUNCATE hr_data.fact_daily_attendance, hr_data.fact_absence, "
+                "hr_data.ingested_attendance_files, hr_data.summary_pending_dates, "
+                "hr_data.absence_pending_months"
+            )
+        )
+
+
+def row_by_row(engine: Engine, path: str) -> None:
+    """
+    Previous strategy: one INSERT per badge row
+    """
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor, open(path, newline="") as export:
+            for row in csv.DictReader(export):
+                row = {column: value or None for column, value in row.items()}
+                cursor.execute(ROW_INSERT, row)
+                if row["absence_type"] is not None:
+                    cursor.execute(ROW_INSERT_ABSENCE, row)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    engine = get_bench_engine()
+    get_engine(engine.url)
+    employee_counts = [int(arg) for arg in sys.argv[1:]] or EMPLOYEE_COUNTS
+    path = os.path.join(tempfile.mkdtemp(), "badges.csv")
+
+    print(f"{'rows':>8} | {'strategy':<22} | {'seconds':>8} | {'rows/s':>9}")
+    with disable_run_logger():
+        for employees in employee_counts:
+            seed(engine, SERVICES, employees, YEAR, months=0)
+            with engine.begin() as conn:
+                conn.execute(
+                    text(
+                        "INSERT INTO hr_data.dim_type_absence "
+                        "VALUES (1, 'Maladie', true, true, NULL, '')"
+                    )
+                )
+            rows = write_badge_export(path, employees)
+
+            strategies = {
+                "row by row": lambda: row_by_row(engine, path),
+                "copy + merge": lambda: ingest_badge_file.fn(path),
+                "copy + merge, same file": lambda: ingest_badge_file.fn(path),
+                "copy + merge, reingest": lambda: ingest_badge_file.fn(path, True),
+            }
+            for name, run in strategies.items():
+                if name in ("row by row", "copy + merge"):
+                    clear_facts(engine)
+                with timer() as elapsed:
+                    run()
+                print(
+                    f"{rows:>8} | {name:<22} | {elapsed[0]:>8.3f} | "
+                    f"{rows / elapsed[0]:>9,.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
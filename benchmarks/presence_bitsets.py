@@ -0,0 +1,120 @@
+"""
+Absences per employee in random windows of working days, and the longest run
+of absences of each employee over the year: queries over fact_daily_attendance
+against the presence bitsets packed from the attendance matrices.
+
+The matrices are written to MATRIX_DIR, which is replaced.
+
+Usage: BENCH_DATABASE_URL=postgresql://... MATRIX_DIR=/tmp/matrix \
+    python -m benchmarks.presence_bitsets
+"""
+
+import random
+import shutil
+from datetime import date, timedelta
+from prefect.logging import disable_run_logger
+from sqlalchemy import text
+from benchmarks.common import get_bench_engine, seed, timer
+from database import MATRIX_DIR
+from database.bitsets import presence_bitsets
+from database.db import get_engine, warm_pool
+from tasks.matrix import refresh_attendance_matrix
+
+SERVICES = 20
+EMPLOYEES = 3000
+YEAR = 2025
+WINDOWS = 50
+
+WORKING_DAYS = """
+    WITH working_days AS (
+        SELECT date_id, row_number() OVER (ORDER BY date_id) AS rank
+        FROM hr_data.dim_date
+        WHERE jour_semaine < 6 AND NOT est_ferie AND annee = :year
+    )
+"""
+WINDOW_ABSENCES = text(
+    WORKING_DAYS
+    + """
+    SELECT a.id_employee, count(*) FILTER (WHERE NOT a.present)
+    FROM hr_data.fact_daily_attendance a
+    JOIN working_days USING (date_id)
+    WHERE a.date_id BETWEEN :start AND :end
+    GROUP BY a.id_employee
+    """
+)
+# Gaps and islands: the absences of a run share rank - row_number()
+LONGEST_ABSENCES = text(
+    WORKING_DAYS
+    + """
+    SELECT id_employee, max(days)
+    FROM (
+        SELECT id_employee, count(*) AS days
+        FROM (
+            SELECT
+                a.id_employee,
+                rank - row_number() OVER (
+                    PARTITION BY a.id_employee ORDER BY rank
+                ) AS run
+            FROM hr_data.fact_daily_attendance a
+            JOIN working_days USING (date_id)
+            WHERE NOT a.present
+        ) absences
+        GROUP BY id_employee, run
+    ) runs
+    GROUP BY id_employee
+    """
+)
+
+
+def date_id(day: date) -> int:
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+def main() -> None:
+    engine = get_bench_engine()
+    get_engine(engine.url)
+    seed(engine, SERVICES, EMPLOYEES, YEAR)
+    warm_pool()
+    shutil.rmtree(MATRIX_DIR, ignore_errors=True)
+    with disable_run_logger():
+        refresh_attendance_matrix.fn()
+
+    random.seed(0)
+    windows = []
+    for _ in range(WINDOWS):
+        start = date(YEAR, 1, 1) + timedelta(days=random.randrange(300))
+        windows.append((start, start + timedelta(days=random.randrange(1, 60))))
+
+    with timer() as packed:
+        bitsets = presence_bitsets(YEAR)
+    print(f"bitsets packed in {packed[0]:.3f}s, {bitsets.absent.nbytes} bytes")
+
+    print(f"{'query':<26} | {'postgres s':>10} | {'bitsets s':>9}")
+    with get_engine().connect() as conn, timer() as postgres:
+        expected = [
+            dict(
+                conn.execute(
+                    WINDOW_ABSENCES,
+                    {"year": YEAR, "start": date_id(start), "end": date_id(end)},
+                ).all()
+            )
+            for start, end in windows
+        ]
+    with timer() as bits:
+        counts = [bitsets.absent_days(start, end) for start, end in windows]
+    print(f"{f'{WINDOWS} window counts':<26} | {postgres[0]:>10.3f} | {bits[0]:>9.4f}")
+    assert [
+        {k: v for k, v in c.items() if k in e} for c, e in zip(counts, expected)
+    ] == expected
+
+    year = date(YEAR, 1, 1), date(YEAR, 12, 31)
+    with get_engine().connect() as conn, timer() as postgres:
+        expected = dict(conn.execute(LONGEST_ABSENCES, {"year": YEAR}).all())
+    with timer() as bits:
+        longest = bitsets.longest_absences(*year)
+    print(f"{'longest absence runs':<26} | {postgres[0]:>10.3f} | {bits[0]:>9.4f}")
+    assert {k: v for k, v in longest.items() if v} == expected
+
+
+if __name__ == "__main__":
+    main()
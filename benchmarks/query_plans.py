@@ -0,0 +1,175 @@
+"""
+Fail when a report query would read a fact table without restricting date_id.
+
+Every statement issued by the fetch_* tasks and the workbook generators, and
+the statement of every source the quarterly/yearly router can pick, is
+EXPLAINed with sequential scans disabled, so the plan does not depend on the
+size of the seeded data. Each scan of a fact table must then either look its
+rows up by date_id through an index, or read a partition left after pruning
+on date_id. A full index scan passes neither.
+
+Usage: BENCH_DATABASE_URL=postgresql://... python -m benchmarks.query_plans
+   or: BENCH_DATABASE_URL=postgresql://... \
+    pre-commit run query-plans --hook-stage manual
+"""
+
+import json
+import os
+import sys
+import tempfile
+from datetime import date
+from typing import Any, Dict, Iterator, List, Set, Tuple
+from prefect.logging import disable_run_logger
+from sqlalchemy import Engine, text
+from sqlalchemy.orm import Session
+from benchmarks.common import capture_statements, get_bench_engine, seed
+from database.db import get_engine
+from tasks.query_router import MONTHLY_SOURCES, _raw_facts_stmt
+from tasks.utils import (
+    fetch_employees_per_date,
+    fetch_monthly_dataset,
+    fetch_quarterly_dataset,
+    fetch_weekly_dataset,
+    fetch_yearly_dataset,
+    generate_monthly_excel,
+    generate_quarterly_excel,
+    generate_weekly_excel,
+    generate_yearly_excel,
+    total_employee_count,
+    year_period,
+)
+
+SERVICES = 10
+EMPLOYEES = 500
+YEAR = 2025
+# Column leading the period lookups of the fact tables without a date_id
+PERIOD_KEYS = {"fact_monthly_service_summary": "annee"}
+
+
+def report_statements(engine: Engine) -> List[Tuple[str, Any]]:
+    with capture_statements(engine) as statements:
+        fetch_employees_per_date.fn(20250303)
+        total_employee_count.fn(20250303)
+        generate_weekly_excel.fn(
+            fetch_weekly_dataset.fn(date(2025, 3, 3), date(2025, 3, 7)), "weekly"
+        )
+        generate_monthly_excel.fn(fetch_monthly_dataset.fn(3, YEAR), 3, "monthly")
+        generate_quarterly_excel.fn(fetch_quarterly_dataset.fn(2, YEAR), 2, "quarterly")
+        generate_yearly_excel.fn(fetch_yearly_dataset.fn(YEAR), YEAR, "yearly")
+
+        period = year_period(YEAR)
+        with Session(engine) as session:
+            for source in MONTHLY_SOURCES:
+                session.execute(source.statement(period)).all()
+            session.execute(_raw_facts_stmt(period)).all()
+
+    return statements
+
+
+def plan_nodes(plan: dict) -> Iterator[dict]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+# Partitions of each partitioned table of hr_data: the fact tables
+FACT_PARTITIONS = text(
+    """
+    SELECT p.relname, c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_class p ON p.oid = i.inhparent
+    JOIN pg_namespace n ON n.oid = p.relnamespace
+    WHERE n.nspname = 'hr_data'
+    """
+)
+
+
+def fact_partitions(engine: Engine) -> Dict[str, Set[str]]:
+    """
+    return partitioned table -> its partitions
+    """
+    partitions: Dict[str, Set[str]] = {}
+    with engine.connect() as conn:
+        for parent, partition in conn.execute(FACT_PARTITIONS):
+            partitions.setdefault(parent, set()).add(partition)
+    return partitions
+
+
+def unrestricted_fact_scans(
+    engine: Engine,
+    partitions: Dict[str, Set[str]],
+    statement: str,
+    parameters: Any,
+) -> List[str]:
+    """
+    return the scans of fact tables that neither look their period up in an
+    index nor read a pruned set of partitions
+    """
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans = [
+        node
+        for node in plan_nodes(plan[0]["Plan"])
+        if node.get("Relation Name", "").startswith("fact_")
+    ]
+
+    # Partitions are only skipped by pruning on date_id, the partition key
+    scanned = {node["Relation Name"] for node in scans}
+    pruned = {
+        partition
+        for children in partitions.values()
+        if not children <= scanned
+        for partition in children
+    }
+
+    unrestricted = []
+    for node in scans:
+        # Bitmap heap scans recheck the condition of their index scans
+        condition = node.get("Index Cond", "") + node.get("Recheck Cond", "")
+        key = PERIOD_KEYS.get(node["Relation Name"], "date_id")
+        if key not in condition and node["Relation Name"] not in pruned:
+            unrestricted.append(f"{node['Node Type']} on {node['Relation Name']}")
+    return unrestricted
+
+
+def main() -> None:
+    # The tasks connect through get_engine(), capture on that same engine
+    engine = get_engine(get_bench_engine().url)
+    os.chdir(tempfile.mkdtemp())
+
+    with disable_run_logger():
+        seed(engine, SERVICES, EMPLOYEES, YEAR)
+        statements = report_statements(engine)
+
+    selects = [
+        (statement, parameters)
+        for statement, parameters in statements
+        if statement.lstrip().upper().startswith("SELECT")
+    ]
+    partitions = fact_partitions(engine)
+    failures = 0
+    for statement, parameters in selects:
+        scans = unrestricted_fact_scans(engine, partitions, statement, parameters)
+        if scans:
+            failures += 1
+            print(f"{', '.join(scans)} without date_id:\n{statement}\n")
+
+    print(
+        f"{len(selects)} statements checked, "
+        f"{failures} reading a fact table without restricting date_id"
+    )
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
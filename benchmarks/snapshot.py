@@ -0,0 +1,76 @@
+"""
+Export of the star schema to Parquet, then the multi-grain rows of a year of
+weekly, monthly, quarterly and yearly reports: the GROUPING SETS query over the
+daily summary against the same rows computed from the snapshot.
+
+The snapshot is written to SNAPSHOT_DIR, which is replaced.
+
+Usage: BENCH_DATABASE_URL=postgresql://... SNAPSHOT_DIR=/tmp/snapshot \
+    python -m benchmarks.snapshot
+"""
+
+from datetime import date
+from prefect.logging import disable_run_logger
+from benchmarks.common import get_bench_engine, seed, timer
+from database.db import get_engine, warm_pool
+from database.dimensions import calendar_index
+from tasks.snapshot import export_snapshot, multi_grain_rows
+from tasks.utils import REPORT_KINDS, _period_day_ids, multi_grain_stmt, report_periods
+
+SERVICES = 20
+EMPLOYEES = 3000
+YEAR = 2025
+RUNS = 5
+
+
+def best_of(fetch) -> tuple:
+    best = float("inf")
+    for _ in range(RUNS):
+        with timer() as elapsed:
+            rows = fetch()
+        best = min(best, elapsed[0])
+    return best, rows
+
+
+def main() -> None:
+    engine = get_bench_engine()
+    get_engine(engine.url)
+    seed(engine, SERVICES, EMPLOYEES, YEAR)
+    warm_pool()
+
+    with disable_run_logger():
+        with timer() as exported:
+            rows, size = export_snapshot.fn()
+    print(f"export: {rows} rows, {size / 2**20:.1f} MiB in {exported[0]:.2f}s")
+
+    calendar = calendar_index()
+    day_ids: set[int] = set()
+    month_day_ids: set[int] = set()
+    for period in report_periods(REPORT_KINDS, date(YEAR, 1, 1), date(YEAR, 12, 31)):
+        ids = month_day_ids if period[0] in ("quarterly", "yearly") else day_ids
+        ids.update(_period_day_ids(calendar, period))
+    day_ids, month_day_ids = sorted(day_ids), sorted(month_day_ids)
+
+    def postgres() -> list:
+        with get_engine().connect() as conn:
+            statement = multi_grain_stmt(day_ids, month_day_ids)
+            return [tuple(row) for row in conn.execute(statement)]
+
+    print(f"best of {RUNS} runs")
+    print(f"{'source':<10} | {'rows':>6} | {'seconds':>8}")
+    results = {}
+    for name, fetch in (
+        ("postgres", postgres),
+        ("snapshot", lambda: multi_grain_rows(day_ids, month_day_ids)),
+    ):
+        seconds, results[name] = best_of(fetch)
+        print(f"{name:<10} | {len(results[name]):>6} | {seconds:>8.3f}")
+
+    # Postgres also returns the days of other grains, with no total
+    assert [row for row in results["postgres"] if row[3] is not None] == results[
+        "snapshot"
+    ]
+
+
+if __name__ == "__main__":
+    main()
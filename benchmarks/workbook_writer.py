@@ -0,0 +1,111 @@
+"""
+Time and peak RSS of a 150-sheet workbook of 250 rows per sheet: the previous
+generators, cell by cell with the whole workbook in memory and a title format
+per sheet, against the constant_memory ReportWorkbook. Each strategy runs in a
+fresh process so its peak RSS is its own. Synthetic data, no database.
+
+Usage: python -m benchmarks.workbook_writer
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from datetime import date, timedelta
+import xlsxwriter
+from benchmarks.common import timer
+from database.models import DAY_NAMES, ReportDataset, Service
+from tasks.utils import generate_monthly_excel, service_tables
+
+SHEETS = 150
+ROWS = 250
+STRATEGIES = ["cell by cell", "constant memory"]
+
+
+def dataset() -> ReportDataset:
+    days = [date(2025, 1, 1) + timedelta(days=offset) for offset in range(ROWS)]
+    return ReportDataset(
+        services=[Service(id, f"Service {id}") for id in range(1, SHEETS + 1)],
+        rows=[
+            (service_id, day, DAY_NAMES[day.weekday()], (service_id + i) % 7, 40)
+            for service_id in range(1, SHEETS + 1)
+            for i, day in enumerate(days)
+        ],
+    )
+
+
+def cell_by_cell(data: ReportDataset, target_month: int, filename: str) -> str:
+    """
+    Previous strategy: generate_monthly_excel before the shared writer
+    """
+    os.makedirs("data/monthly_reports/", exist_ok=True)
+    workbook = xlsxwriter.Workbook(f"data/monthly_reports/{filename}.xlsx")
+    date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+
+    tables = service_tables(data)
+    for service in data.services:
+        table = tables.get(service.id, [])
+        cleaned_name = "".join(
+            [c for c in service.name if c not in ["'", "/", '"', "@"]]
+        )
+        worksheet = workbook.add_worksheet(name=cleaned_name[:31])
+        worksheet.set_column(0, 0, 12)
+        worksheet.set_column(1, 1, 12)
+        worksheet.set_column(2, 2, 16)
+        worksheet.set_column(3, 3, 16)
+
+        headers = ["Date", "Jour", "Nombre d'absences", "Absence %"]
+        title = f"Rapport du mois {target_month} - {service.name}"
+        title_format = workbook.add_format(
+            {"align": "center", "bold": True, "font_size": 14}
+        )
+        worksheet.merge_range(0, 0, 0, len(headers) - 1, title, title_format)
+        for col, header in enumerate(headers):
+            worksheet.write(1, col, header)
+
+        for row_idx, row in enumerate(table, start=2):
+            date_literal, day_name, absence, _, absence_percentage = row
+            worksheet.write_datetime(row_idx, 0, date_literal, date_format)
+            worksheet.write(row_idx, 1, day_name)
+            worksheet.write(row_idx, 2, absence)
+            worksheet.write(row_idx, 3, absence_percentage)
+
+    workbook.close()
+    return f"data/monthly_reports/{filename}.xlsx"
+
+
+def run(strategy: str) -> None:
+    os.chdir(tempfile.mkdtemp())
+    data = dataset()
+    write = cell_by_cell if strategy == "cell by cell" else generate_monthly_excel.fn
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with timer() as elapsed:
+        path = write(data, 1, "workbook")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux
+    print(
+        f"{strategy:<16} | {elapsed[0]:>8.2f} | {peak / 1024:>13.0f} "
+        f"| {(peak - before) / 1024:>14.0f} | {os.path.getsize(path) / 2**20:>8.1f}"
+    )
+
+
+def main() -> None:
+    print(f"{SHEETS} sheets x {ROWS} rows")
+    print(
+        f"{'strategy':<16} | {'seconds':>8} | {'peak RSS MiB':>13} "
+        f"| {'writing MiB':>14} | {'size MiB':>8}"
+    )
+    for strategy in STRATEGIES:
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.workbook_writer", strategy],
+            check=True,
+            cwd=os.path.join(os.path.dirname(__file__), ".."),
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run(sys.argv[1])
+    else:
+        main()
@@ -3,3 +3,21 @@ from dotenv import load_dotenv
 
 load_dotenv()
 DB_URL = os.getenv("DATABASE_URL_LOCAL")
+
+# Task threads of each flow run, the database pool is sized from it
+TASK_CONCURRENCY = int(os.getenv("TASK_CONCURRENCY", "4"))
+# Dimension lookups cached per process: seconds before an entry expires and
+# entries kept before the least recently used ones are evicted
+DIMENSION_CACHE_TTL = int(os.getenv("DIMENSION_CACHE_TTL", "600"))
+DIMENSION_CACHE_SIZE = int(os.getenv("DIMENSION_CACHE_SIZE", "1024"))
+# Where the badge clocks drop their daily CSV exports
+BADGE_EXPORT_DIR = os.getenv("BADGE_EXPORT_DIR", "data/badge_exports")
+# Processes writing workbooks during a report backfill
+RENDER_PROCESSES = int(os.getenv("RENDER_PROCESSES", str(os.cpu_count() or 1)))
+# Columnar snapshot of the star schema, and where the fetch_*_dataset tasks
+# read from: "postgres", or "snapshot" to rebuild reports from the files
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "data/snapshot")
+REPORT_BACKEND = os.getenv("REPORT_BACKEND", "postgres")
+# Employee x day attendance matrices, one directory per year, mapped with
+# np.memmap by the vectorized absence and worked time aggregates
+MATRIX_DIR = os.getenv("MATRIX_DIR", "data/matrix")
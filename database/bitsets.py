@@ -0,0 +1,223 @@
+import os
+from dataclasses import dataclass, replace
+from datetime import date
+from typing import Dict, List, Sequence
+import numpy as np
+from database.dimensions import cached_dimension, calendar_index
+from database.matrix import (
+    ABSENT,
+    NO_RECORD,
+    attendance_matrix,
+    day_ordinals,
+    lookup_file,
+)
+
+WORD_BITS = 64
+
+
+def pack_bits(bits: np.ndarray) -> np.ndarray:
+    """
+    Pack a boolean employee x day matrix into 64-bit words, day i being bit
+    i % 64 of word i // 64
+    """
+    words = -(-bits.shape[1] // WORD_BITS)
+    padded = np.zeros((bits.shape[0], words * WORD_BITS), np.bool_)
+    padded[:, : bits.shape[1]] = bits
+    return np.packbits(padded, axis=1, bitorder="little").view("<u8")
+
+
+def _shift_down(words: np.ndarray) -> np.ndarray:
+    # Bit i takes bit i + 1, across word boundaries
+    carry = np.zeros_like(words)
+    carry[:, :-1] = words[:, 1:] << np.uint64(WORD_BITS - 1)
+    return (words >> np.uint64(1)) | carry
+
+
+def _date_id(day: date) -> int:
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+@dataclass(frozen=True)
+class PresenceBitsets:
+    """
+    A year of fact_daily_attendance as one bit per working day and employee,
+    bit i of a row standing for the working day date_ids[i]. Counting the
+    absences of any window is a popcount of a few words per employee.
+    """
+
+    year: int
+    date_ids: np.ndarray
+    # Employee id and service id of each row
+    employee_ids: np.ndarray
+    services: np.ndarray
+    absent: np.ndarray
+    recorded: np.ndarray
+
+    def rows(self, employee_ids: Sequence[int] | None = None) -> np.ndarray:
+        if employee_ids is None:
+            return np.arange(len(self.employee_ids))
+        ids = np.asarray(employee_ids, np.int64)
+        order = np.argsort(self.employee_ids)
+        positions = np.searchsorted(self.employee_ids, ids, sorter=order)
+        rows = order[positions.clip(max=len(order) - 1)]
+        unknown = self.employee_ids[rows] != ids
+        if unknown.any():
+            raise KeyError(f"Employees {ids[unknown].tolist()} not in the matrix")
+        return rows
+
+    def window(self, start_date: date, end_date: date) -> np.ndarray:
+        """
+        return a row with the bits of the working days from start_date to
+        end_date set
+        """
+        first = np.searchsorted(self.date_ids, _date_id(start_date))
+        last = np.searchsorted(self.date_ids, _date_id(end_date), side="right")
+        bits = np.zeros((1, len(self.date_ids)), np.bool_)
+        bits[0, first:last] = True
+        return pack_bits(bits)[0]
+
+    def date_ids_of(self, words: np.ndarray) -> List[int]:
+        """
+        return the working days whose bit is set in a row
+        """
+        bits = np.unpackbits(words.view(np.uint8), bitorder="little")
+        return self.date_ids[bits[: len(self.date_ids)].nonzero()[0]].tolist()
+
+    def _by_employee(self, rows: np.ndarray, values: np.ndarray) -> Dict[int, int]:
+        return dict(zip(self.employee_ids[rows].tolist(), values.tolist()))
+
+    def absent_days(
+        self,
+        start_date: date,
+        end_date: date,
+        employee_ids: Sequence[int] | None = None,
+    ) -> Dict[int, int]:
+        """
+        return employee id -> working days recorded absent in the window
+        """
+        rows = self.rows(employee_ids)
+        words = self.absent[rows] & self.window(start_date, end_date)
+        return self._by_employee(rows, np.bitwise_count(words).sum(axis=1))
+
+    def recorded_days(
+        self,
+        start_date: date,
+        end_date: date,
+        employee_ids: Sequence[int] | None = None,
+    ) -> Dict[int, int]:
+        """
+        return employee id -> working days with an attendance row in the window
+        """
+        rows = self.rows(employee_ids)
+        words = self.recorded[rows] & self.window(start_date, end_date)
+        return self._by_employee(rows, np.bitwise_count(words).sum(axis=1))
+
+    def longest_absences(
+        self,
+        start_date: date,
+        end_date: date,
+        employee_ids: Sequence[int] | None = None,
+    ) -> Dict[int, int]:
+        """
+        Weekends and holidays do not break a run, they have no bit
+
+        return employee id -> longest run of working days absent in the window
+        """
+        rows = self.rows(employee_ids)
+        runs = self.absent[rows] & self.window(start_date, end_date)
+        longest = np.zeros(len(rows), np.int64)
+        # After n rounds, a bit is left where a run of n + 1 absences starts
+        while runs.any():
+            longest += runs.any(axis=1)
+            runs &= _shift_down(runs)
+        return self._by_employee(rows, longest)
+
+    def absent_together(
+        self, employee_ids: Sequence[int], start_date: date, end_date: date
+    ) -> List[int]:
+        """
+        return the working days of the window every employee was absent
+        """
+        words = np.bitwise_and.reduce(self.absent[self.rows(employee_ids)], axis=0)
+        return self.date_ids_of(words & self.window(start_date, end_date))
+
+    def absent_any(
+        self, employee_ids: Sequence[int], start_date: date, end_date: date
+    ) -> List[int]:
+        """
+        return the working days of the window at least one employee was absent
+        """
+        words = np.bitwise_or.reduce(self.absent[self.rows(employee_ids)], axis=0)
+        return self.date_ids_of(words & self.window(start_date, end_date))
+
+    def with_days(
+        self,
+        date_ids: Sequence[int],
+        row_date_ids: Sequence[int],
+        employee_ids: Sequence[int],
+        present: Sequence[bool],
+    ) -> "PresenceBitsets":
+        """
+        Replace the bits of date_ids by the attendance rows of these days. The
+        employees hired since the matrices were written have no row, they are
+        left out.
+
+        return a copy, the cached bitsets of the year are left as they are
+        """
+        days = np.asarray(date_ids, np.int64)
+        days = days[np.isin(days, self.date_ids)]
+        if not len(days):
+            return self
+        replaced = np.zeros((1, len(self.date_ids)), np.bool_)
+        replaced[0, np.searchsorted(self.date_ids, days)] = True
+
+        row_days = np.asarray(row_date_ids, np.int64)
+        row_employees = np.asarray(employee_ids, np.int64)
+        kept = np.isin(row_days, days) & np.isin(row_employees, self.employee_ids)
+        rows = self.rows(row_employees[kept])
+        columns = np.searchsorted(self.date_ids, row_days[kept])
+        absent = np.zeros((len(self.employee_ids), len(self.date_ids)), np.bool_)
+        recorded = np.zeros_like(absent)
+        absent[rows, columns] = ~np.asarray(present, np.bool_)[kept]
+        recorded[rows, columns] = True
+
+        others = ~pack_bits(replaced)[0]
+        return replace(
+            self,
+            absent=(self.absent & others) | pack_bits(absent),
+            recorded=(self.recorded & others) | pack_bits(recorded),
+        )
+
+
+def presence_bitsets(year: int) -> PresenceBitsets:
+    """
+    Pack the presence matrix of a year, once per process until the matrices
+    are refreshed or the entry expires. Empty when the warehouse refresh has
+    not written the matrices yet.
+    """
+
+    def load():
+        date_ids = np.array(
+            calendar_index().working_day_ids_between(
+                date(year, 1, 1), date(year, 12, 31)
+            ),
+            np.int64,
+        )
+        matrix = attendance_matrix(year)
+        path = lookup_file("employees")
+        employee_ids = (
+            np.load(path)[: len(matrix.presence)]
+            if os.path.exists(path)
+            else np.zeros(0, np.int64)
+        )
+        presence = matrix.presence[: len(employee_ids), day_ordinals(date_ids)]
+        return PresenceBitsets(
+            year,
+            date_ids=date_ids,
+            employee_ids=employee_ids,
+            services=np.asarray(matrix.services[: len(employee_ids)]),
+            absent=pack_bits(presence == ABSENT),
+            recorded=pack_bits(presence != NO_RECORD),
+        )
+
+    return cached_dimension("attendance_matrix", year, load)
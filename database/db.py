@@ -1,13 +1,120 @@
-from sqlalchemy import create_engine
-from database import DB_URL
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from sqlalchemy import Engine, create_engine, exc
+from sqlalchemy.pool import QueuePool
+from database import DB_URL, TASK_CONCURRENCY
+
+# Every flow run is a separate process: one connection per task thread plus
+# one for the flow itself, with overflow for tasks that open a second one
+POOL_SIZE = TASK_CONCURRENCY + 1
+MAX_OVERFLOW = TASK_CONCURRENCY
+POOL_TIMEOUT = 30
+# Reopen connections before server or proxy idle timeouts close them
+POOL_RECYCLE = 1800
 
 _engine = None
+_engine_lock = threading.Lock()
+
+
+@dataclass
+class PoolStats:
+    checkouts: int = 0
+    timeouts: int = 0
+    connections_opened: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    peak_overflow: int = 0
+    checked_out: int = 0
+    overflow: int = 0
+
+    def __str__(self) -> str:
+        average_wait = self.wait_seconds / self.checkouts if self.checkouts else 0.0
+        return (
+            f"{self.checkouts} checkouts, "
+            f"wait avg {average_wait * 1000:.1f}ms max {self.max_wait_seconds * 1000:.1f}ms, "
+            f"{self.timeouts} timeouts, {self.connections_opened} connections opened, "
+            f"overflow {self.overflow} (peak {self.peak_overflow}/{MAX_OVERFLOW})"
+        )
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool recording how long checkouts wait and how far it overflows
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.stats.timeouts += 1
+            raise
 
+        wait = time.perf_counter() - start
+        with self._stats_lock:
+            self.stats.checkouts += 1
+            self.stats.wait_seconds += wait
+            self.stats.max_wait_seconds = max(self.stats.max_wait_seconds, wait)
+            self.stats.peak_overflow = max(self.stats.peak_overflow, self.overflow())
+        return conn
 
-def get_engine(db_url=DB_URL):
+    def _create_connection(self):
+        record = super()._create_connection()
+        with self._stats_lock:
+            self.stats.connections_opened += 1
+        return record
+
+
+def get_engine(db_url=DB_URL) -> Engine:
     global _engine
-    if _engine is None:
-        if db_url is None:
-            raise ValueError("DB URL must be provided the first time.")
-        _engine = create_engine(db_url, future=True)
+    # Tasks run in threads and may all ask for the engine at once
+    with _engine_lock:
+        if _engine is None:
+            if db_url is None:
+                raise ValueError("DB URL must be provided the first time.")
+            _engine = create_engine(
+                db_url,
+                future=True,
+                poolclass=InstrumentedQueuePool,
+                pool_size=POOL_SIZE,
+                max_overflow=MAX_OVERFLOW,
+                pool_timeout=POOL_TIMEOUT,
+                pool_recycle=POOL_RECYCLE,
+                pool_pre_ping=True,
+            )
     return _engine
+
+
+def pool_stats() -> PoolStats:
+    pool = get_engine().pool
+    with pool._stats_lock:
+        return replace(
+            pool.stats,
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+        )
+
+
+def warm_pool(connections: int = POOL_SIZE) -> None:
+    """
+    Open the pooled connections in parallel before the tasks need them
+    """
+    engine = get_engine()
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        opening = [executor.submit(engine.connect) for _ in range(connections)]
+
+    try:
+        for future in opening:
+            future.result()
+    finally:
+        for future in opening:
+            if future.exception() is None:
+                future.result().close()
@@ -0,0 +1,230 @@
+import threading
+from dataclasses import dataclass, replace
+from datetime import date
+from typing import Callable, Hashable, List, Sequence, Tuple, TypeVar
+import numpy as np
+from cachetools import TTLCache
+from sqlalchemy import Row, select
+from sqlalchemy.orm import Session, aliased
+from database import DIMENSION_CACHE_SIZE, DIMENSION_CACHE_TTL, REPORT_BACKEND
+from database.db import get_engine
+from database.models import DateDimension, DimEmployee, DimService, Service
+from database.snapshot import read_dimension
+
+T = TypeVar("T")
+
+# Entries are keyed on (table, key) so a table can be invalidated on its own.
+# Flow runs served by `prefect serve` are separate processes: an invalidation
+# only reaches the process it runs in, the TTL bounds staleness in the others.
+_cache: TTLCache = TTLCache(maxsize=DIMENSION_CACHE_SIZE, ttl=DIMENSION_CACHE_TTL)
+_cache_lock = threading.Lock()
+# Bumped by every invalidation, so a value loaded before it is not cached
+_generation = 0
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+    entries: int = 0
+
+    def __str__(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        return (
+            f"{self.hits} hits, {self.misses} misses ({hit_rate:.0%} hit rate), "
+            f"{self.entries} entries, {self.invalidations} invalidations"
+        )
+
+
+_stats = CacheStats()
+
+
+def cached_dimension(table: str, key: Hashable, load: Callable[[], T]) -> T:
+    """
+    Read-through lookup: return the cached value of (table, key), or load it
+    """
+    with _cache_lock:
+        try:
+            value = _cache[(table, key)]
+        except KeyError:
+            _stats.misses += 1
+            generation = _generation
+        else:
+            _stats.hits += 1
+            return value
+
+    # Loaded outside the lock, concurrent misses on one key may both query
+    value = load()
+    with _cache_lock:
+        if generation == _generation:
+            _cache[(table, key)] = value
+    return value
+
+
+def invalidate_dimensions(*tables: str) -> None:
+    """
+    Drop the cached entries of the given tables, or of every table
+    """
+    global _generation
+    with _cache_lock:
+        for entry in list(_cache):
+            if not tables or entry[0] in tables:
+                _cache.pop(entry, None)
+        _generation += 1
+        _stats.invalidations += 1
+
+
+def dimension_cache_stats() -> CacheStats:
+    with _cache_lock:
+        return replace(_stats, entries=len(_cache))
+
+
+def services() -> Sequence[Row[Tuple[int, str]] | Service]:
+    """
+    return service id | service name
+    """
+
+    def load():
+        if REPORT_BACKEND == "snapshot":
+            table = read_dimension("dim_service", ["id", "name"])
+            return tuple(map(Service._make, zip(*table.to_pydict().values())))
+        with Session(get_engine()) as session:
+            return tuple(session.execute(select(DimService.id, DimService.name)))
+
+    return cached_dimension("hr_data.dim_service", None, load)
+
+
+def manager_emails() -> List[str]:
+    """
+    return the email of every employee who manages someone
+    """
+
+    def load():
+        manager = aliased(DimEmployee)
+        employee = aliased(DimEmployee)
+        with Session(get_engine()) as session:
+            return tuple(
+                session.execute(
+                    select(manager.email)
+                    .join(employee, employee.hierarchical_manager_id == manager.id)
+                    .distinct()
+                ).scalars()
+            )
+
+    return list(cached_dimension("hr_data.dim_employee", "manager_emails", load))
+
+
+# dim_date columns held by the calendar index
+CALENDAR_COLUMNS = ["date_literale", "date_id", "jour_semaine", "est_ferie"]
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+@dataclass(frozen=True)
+class CalendarIndex:
+    """
+    dim_date held in arrays indexed by days since first_day, so resolving a
+    date, a date_id or a working day is an array lookup
+    """
+
+    first_day: date
+    # 0 where the calendar has no row for the day
+    date_ids: np.ndarray
+    jour_semaine: np.ndarray
+    est_ferie: np.ndarray
+
+    def _offset(self, day: date) -> int | None:
+        offset = day.toordinal() - self.first_day.toordinal()
+        if 0 <= offset < len(self.date_ids) and self.date_ids[offset]:
+            return offset
+        return None
+
+    def _checked_offset(self, day: date) -> int:
+        offset = self._offset(day)
+        if offset is None:
+            raise KeyError(f"{day} is not in hr_data.dim_date")
+        return offset
+
+    def _range(self, start_date: date, end_date: date) -> slice:
+        first = self.first_day.toordinal()
+        return slice(
+            max(start_date.toordinal() - first, 0),
+            max(end_date.toordinal() - first + 1, 0),
+        )
+
+    def date_id(self, day: date) -> int | None:
+        offset = self._offset(day)
+        return None if offset is None else int(self.date_ids[offset])
+
+    def day(self, date_id: int) -> date | None:
+        try:
+            day = date(date_id // 10000, date_id // 100 % 100, date_id % 100)
+        except ValueError:
+            return None
+        return None if self._offset(day) is None else day
+
+    def is_holiday(self, day: date) -> bool:
+        return bool(self.est_ferie[self._checked_offset(day)])
+
+    def is_working_day(self, day: date) -> bool:
+        offset = self._checked_offset(day)
+        return bool(self.jour_semaine[offset] < 6 and not self.est_ferie[offset])
+
+    def date_ids_between(self, start_date: date, end_date: date) -> List[int]:
+        date_ids = self.date_ids[self._range(start_date, end_date)]
+        return date_ids[date_ids != 0].tolist()
+
+    def weekday_ids_between(self, start_date: date, end_date: date) -> List[int]:
+        """
+        return the date_ids from Monday to Friday, holidays included
+        """
+        days = self._range(start_date, end_date)
+        date_ids = self.date_ids[days]
+        return date_ids[(date_ids != 0) & (self.jour_semaine[days] < 6)].tolist()
+
+    def working_day_ids_between(self, start_date: date, end_date: date) -> List[int]:
+        days = self._range(start_date, end_date)
+        date_ids = self.date_ids[days]
+        working = (
+            (date_ids != 0) & (self.jour_semaine[days] < 6) & ~self.est_ferie[days]
+        )
+        return date_ids[working].tolist()
+
+
+def calendar_index() -> CalendarIndex:
+    """
+    Load dim_date once per process, until it is invalidated or expires
+    """
+
+    def load():
+        if REPORT_BACKEND == "snapshot":
+            table = read_dimension("dim_date", CALENDAR_COLUMNS)
+            columns = [table[name].to_numpy() for name in CALENDAR_COLUMNS]
+        else:
+            with Session(get_engine()) as session:
+                rows = session.execute(
+                    select(*(getattr(DateDimension, name) for name in CALENDAR_COLUMNS))
+                ).all()
+            columns = [np.array(column) for column in zip(*rows)] if rows else []
+
+        if not columns or not len(columns[0]):
+            raise ValueError("hr_data.dim_date is empty, load the calendar first.")
+
+        days, date_ids, jour_semaine, est_ferie = columns
+        offsets = days.astype("datetime64[D]").astype(np.int64)
+        first = offsets.min()
+        offsets -= first
+        size = int(offsets.max()) + 1
+        index = CalendarIndex(
+            first_day=date.fromordinal(int(first) + EPOCH_ORDINAL),
+            date_ids=np.zeros(size, np.int32),
+            jour_semaine=np.zeros(size, np.int8),
+            est_ferie=np.zeros(size, np.bool_),
+        )
+        index.date_ids[offsets] = date_ids
+        index.jour_semaine[offsets] = jour_semaine
+        index.est_ferie[offsets] = est_ferie
+        return index
+
+    return cached_dimension("hr_data.dim_date", "calendar_index", load)
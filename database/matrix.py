@@ -0,0 +1,93 @@
+import os
+from dataclasses import dataclass
+import numpy as np
+from database import MATRIX_DIR
+
+# fact_daily_attendance as one pair of employee x day matrices per year, rows
+# indexed by employee ordinal and columns by day of the year. An employee keeps
+# their ordinal for good: new employees are appended, which appends rows to the
+# files. The ordinals and the service of each employee are two vectors shared
+# by every year, a year written before an employee joined has fewer rows.
+MATRIX_DAYS = 366
+MATRIX_DTYPES = {"presence": np.uint8, "worked_seconds": np.int32}
+# Values of the presence matrix
+NO_RECORD, PRESENT, ABSENT = 0, 1, 2
+# Service of the employees no longer in dim_employee
+NO_SERVICE = -1
+
+
+def matrix_file(year: int, name: str, directory: str = MATRIX_DIR) -> str:
+    return os.path.join(directory, str(year), f"{name}.bin")
+
+
+def lookup_file(name: str, directory: str = MATRIX_DIR) -> str:
+    """
+    name is employees, the id of each ordinal, or services, their service id
+    """
+    return os.path.join(directory, f"{name}.npy")
+
+
+def day_ordinals(date_ids: np.ndarray) -> np.ndarray:
+    """
+    return the day of the year of each date_id, from 0
+    """
+    years = date_ids // 10000
+    months = (years - 1970) * 12 + date_ids // 100 % 100 - 1
+    days = months.astype("datetime64[M]").astype("datetime64[D]") + (date_ids % 100 - 1)
+    first_days = (years - 1970).astype("datetime64[Y]").astype("datetime64[D]")
+    return (days - first_days).astype(np.int64)
+
+
+def open_matrix(year: int, name: str, rows: int | None = None) -> np.memmap:
+    """
+    Map a matrix read-only, or for writing when rows is given: the file then
+    grows to rows employees, the new rows are NO_RECORD
+    """
+    path = matrix_file(year, name)
+    dtype = np.dtype(MATRIX_DTYPES[name])
+    if rows is None:
+        return np.memmap(path, dtype, "r").reshape(-1, MATRIX_DAYS)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    size = rows * MATRIX_DAYS * dtype.itemsize
+    with open(path, "ab") as file:
+        if file.tell() < size:
+            file.truncate(size)
+    return np.memmap(path, dtype, "r+", shape=(rows, MATRIX_DAYS))
+
+
+@dataclass(frozen=True)
+class AttendanceMatrix:
+    """
+    A year of fact_daily_attendance, memory-mapped
+    """
+
+    year: int
+    presence: np.ndarray
+    worked_seconds: np.ndarray
+    # Service id of each row
+    services: np.ndarray
+
+
+def attendance_matrix(year: int) -> AttendanceMatrix:
+    """
+    Map the matrices of a year, an empty one when it has no attendance or the
+    warehouse refresh has not written it yet
+    """
+    if not os.path.exists(lookup_file("services")) or not os.path.exists(
+        matrix_file(year, "presence")
+    ):
+        empty = {
+            name: np.zeros((0, MATRIX_DAYS), dtype)
+            for name, dtype in MATRIX_DTYPES.items()
+        }
+        return AttendanceMatrix(year, services=np.zeros(0, np.int32), **empty)
+
+    services = np.load(lookup_file("services"), mmap_mode="r")
+    presence = open_matrix(year, "presence")
+    return AttendanceMatrix(
+        year,
+        presence=presence,
+        worked_seconds=open_matrix(year, "worked_seconds"),
+        services=services[: len(presence)],
+    )
@@ -0,0 +1,35 @@
+-- Daily headcount per service, the denominator of every absence rate.
+-- Filled and kept up to date by the warehouse refresh flow.
+CREATE TABLE IF NOT EXISTS hr_data.fact_daily_headcount (
+	date_id INTEGER NOT NULL REFERENCES hr_data.dim_date (date_id),
+	service_id INTEGER NOT NULL REFERENCES hr_data.dim_service (id),
+	headcount INTEGER NOT NULL,
+	PRIMARY KEY (date_id, service_id)
+);
+
+
+-- Count the staff of the calendar loaded before this migration, as
+-- DAILY_HEADCOUNT_UPSERT in tasks/warehousing.py does
+INSERT INTO hr_data.fact_daily_headcount (date_id, service_id, headcount)
+SELECT
+	dd.date_id,
+	s.id,
+	sum(COALESCE(mv.delta, 0)) OVER (
+		PARTITION BY s.id ORDER BY dd.date_literale
+	)
+FROM hr_data.dim_date dd
+CROSS JOIN hr_data.dim_service s
+LEFT JOIN (
+	SELECT service_id, GREATEST(day, cal.first_day) AS day, sum(delta) AS delta
+	FROM (
+		SELECT service_id, integration_date AS day, 1 AS delta
+		FROM hr_data.dim_employee
+		UNION ALL
+		SELECT service_id, departure_date, -1
+		FROM hr_data.dim_employee
+		WHERE departure_date IS NOT NULL
+	) movements
+	CROSS JOIN (SELECT min(date_literale) AS first_day FROM hr_data.dim_date) cal
+	GROUP BY service_id, GREATEST(day, cal.first_day)
+) mv ON mv.service_id = s.id AND mv.day = dd.date_literale
+ON CONFLICT DO NOTHING;
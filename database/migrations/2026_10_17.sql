@@ -0,0 +1,97 @@
+-- Absences, headcount and worked time per day and service. Maintained
+-- incrementally by the warehouse refresh flow from the days listed in
+-- hr_data.summary_pending_dates.
+CREATE TABLE IF NOT EXISTS hr_data.fact_daily_service_summary (
+	date_id INTEGER NOT NULL REFERENCES hr_data.dim_date (date_id),
+	service_id INTEGER NOT NULL REFERENCES hr_data.dim_service (id),
+	absence_count INTEGER NOT NULL,
+	headcount INTEGER NOT NULL,
+	worked_seconds BIGINT NOT NULL,
+	PRIMARY KEY (date_id, service_id)
+);
+
+
+-- Days whose summary rows are missing or out of date
+CREATE TABLE IF NOT EXISTS hr_data.summary_pending_dates (
+	date_id INTEGER PRIMARY KEY
+);
+
+
+CREATE OR REPLACE FUNCTION hr_data.mark_summary_pending_dates()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+	IF TG_OP <> 'DELETE' THEN
+		INSERT INTO hr_data.summary_pending_dates (date_id)
+		SELECT DISTINCT date_id FROM new_rows
+		ON CONFLICT DO NOTHING;
+	END IF;
+	IF TG_OP <> 'INSERT' THEN
+		INSERT INTO hr_data.summary_pending_dates (date_id)
+		SELECT DISTINCT date_id FROM old_rows
+		ON CONFLICT DO NOTHING;
+	END IF;
+	RETURN NULL;
+END;
+$$;
+
+
+-- Transition tables only allow one event per trigger
+CREATE OR REPLACE TRIGGER attendance_summary_insert
+AFTER INSERT ON hr_data.fact_daily_attendance
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_summary_pending_dates();
+
+CREATE OR REPLACE TRIGGER attendance_summary_update
+AFTER UPDATE ON hr_data.fact_daily_attendance
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_summary_pending_dates();
+
+CREATE OR REPLACE TRIGGER attendance_summary_delete
+AFTER DELETE ON hr_data.fact_daily_attendance
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_summary_pending_dates();
+
+CREATE OR REPLACE TRIGGER headcount_summary_insert
+AFTER INSERT ON hr_data.fact_daily_headcount
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_summary_pending_dates();
+
+CREATE OR REPLACE TRIGGER headcount_summary_update
+AFTER UPDATE ON hr_data.fact_daily_headcount
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_summary_pending_dates();
+
+
+
+-- Days are summarised under the service of each employee: moving employees
+-- queues the days they have attendance for
+CREATE OR REPLACE FUNCTION hr_data.mark_moved_employee_summary_pending_dates()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+	INSERT INTO hr_data.summary_pending_dates (date_id)
+	SELECT DISTINCT a.date_id
+	FROM hr_data.fact_daily_attendance a
+	WHERE a.id_employee IN (
+		SELECT n.id
+		FROM new_rows n
+		JOIN old_rows o ON o.id = n.id
+		WHERE n.service_id IS DISTINCT FROM o.service_id
+	)
+	ON CONFLICT DO NOTHING;
+	RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE TRIGGER employee_summary_update
+AFTER UPDATE ON hr_data.dim_employee
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_moved_employee_summary_pending_dates();
+
+-- Summarise the history loaded before this migration
+INSERT INTO hr_data.summary_pending_dates (date_id)
+SELECT DISTINCT date_id FROM hr_data.fact_daily_attendance
+ON CONFLICT DO NOTHING;
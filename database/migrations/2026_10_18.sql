@@ -0,0 +1,18 @@
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY needs a unique index on each view
+CREATE UNIQUE INDEX IF NOT EXISTS mv_employee_absence_monthly_key
+ON hr_data.mv_employee_absence_monthly (annee, mois, employee_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS mv_service_absence_monthly_key
+ON hr_data.mv_service_absence_monthly (annee, mois, id);
+
+
+-- Duration of every warehouse refresh step
+CREATE TABLE IF NOT EXISTS hr_data.warehouse_refresh_log (
+	id BIGSERIAL PRIMARY KEY,
+	target TEXT NOT NULL,
+	started_at TIMESTAMPTZ NOT NULL,
+	duration_seconds DOUBLE PRECISION NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS warehouse_refresh_log_target_started_at
+ON hr_data.warehouse_refresh_log (target, started_at DESC);
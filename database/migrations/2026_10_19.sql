@@ -0,0 +1,212 @@
+-- The monthly absence views become summary tables maintained per (annee, mois)
+-- bucket: only the months with new or modified fact_absence rows are
+-- recomputed by the warehouse refresh flow. The names are kept for readers.
+DO $$
+BEGIN
+	IF EXISTS (
+		SELECT 1 FROM pg_matviews
+		WHERE schemaname = 'hr_data' AND matviewname = 'mv_employee_absence_monthly'
+	) THEN
+		DROP MATERIALIZED VIEW hr_data.mv_employee_absence_monthly;
+	END IF;
+	IF EXISTS (
+		SELECT 1 FROM pg_matviews
+		WHERE schemaname = 'hr_data' AND matviewname = 'mv_service_absence_monthly'
+	) THEN
+		DROP MATERIALIZED VIEW hr_data.mv_service_absence_monthly;
+	END IF;
+END;
+$$;
+
+CREATE TABLE IF NOT EXISTS hr_data.mv_employee_absence_monthly (
+	annee INTEGER NOT NULL,
+	mois INTEGER NOT NULL,
+	employee_id INTEGER NOT NULL,
+	first_name VARCHAR NOT NULL,
+	last_name VARCHAR NOT NULL,
+	monthly_absence BIGINT NOT NULL,
+	PRIMARY KEY (annee, mois, employee_id)
+);
+
+CREATE TABLE IF NOT EXISTS hr_data.mv_service_absence_monthly (
+	annee INTEGER NOT NULL,
+	mois INTEGER NOT NULL,
+	id INTEGER NOT NULL,
+	name VARCHAR NOT NULL,
+	monthly_absence BIGINT NOT NULL,
+	PRIMARY KEY (annee, mois, id)
+);
+
+-- Superseded by the primary keys above
+DROP INDEX IF EXISTS hr_data.mv_employee_absence_monthly_key;
+DROP INDEX IF EXISTS hr_data.mv_service_absence_monthly_key;
+
+
+-- Months whose rows are out of date, per summary table
+CREATE TABLE IF NOT EXISTS hr_data.absence_pending_months (
+	target TEXT NOT NULL,
+	annee INTEGER NOT NULL,
+	mois INTEGER NOT NULL,
+	PRIMARY KEY (target, annee, mois)
+);
+
+
+CREATE OR REPLACE FUNCTION hr_data.mark_absence_pending_months()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+	IF TG_OP <> 'DELETE' THEN
+		INSERT INTO hr_data.absence_pending_months (target, annee, mois)
+		SELECT DISTINCT t.target, dd.annee, dd.mois
+		FROM new_rows r
+		JOIN hr_data.dim_date dd ON dd.date_id = r.date_absence_id
+		CROSS JOIN (
+			VALUES
+				('hr_data.mv_employee_absence_monthly'),
+				('hr_data.mv_service_absence_monthly')
+		) AS t (target)
+		ON CONFLICT DO NOTHING;
+	END IF;
+	IF TG_OP <> 'INSERT' THEN
+		INSERT INTO hr_data.absence_pending_months (target, annee, mois)
+		SELECT DISTINCT t.target, dd.annee, dd.mois
+		FROM old_rows r
+		JOIN hr_data.dim_date dd ON dd.date_id = r.date_absence_id
+		CROSS JOIN (
+			VALUES
+				('hr_data.mv_employee_absence_monthly'),
+				('hr_data.mv_service_absence_monthly')
+		) AS t (target)
+		ON CONFLICT DO NOTHING;
+	END IF;
+	RETURN NULL;
+END;
+$$;
+
+
+-- Transition tables only allow one event per trigger
+CREATE OR REPLACE TRIGGER absence_months_insert
+AFTER INSERT ON hr_data.fact_absence
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_absence_pending_months();
+
+CREATE OR REPLACE TRIGGER absence_months_update
+AFTER UPDATE ON hr_data.fact_absence
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_absence_pending_months();
+
+CREATE OR REPLACE TRIGGER absence_months_delete
+AFTER DELETE ON hr_data.fact_absence
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_absence_pending_months();
+
+
+
+-- The tables copy employee and service names and group by the service of each
+-- employee: edits of dim_employee and dim_service queue the months in which
+-- the employees concerned have absences.
+CREATE OR REPLACE FUNCTION hr_data.queue_employee_absence_months(
+	employee_ids INTEGER[]
+)
+RETURNS void
+LANGUAGE sql
+AS $$
+	INSERT INTO hr_data.absence_pending_months (target, annee, mois)
+	SELECT DISTINCT t.target, dd.annee, dd.mois
+	FROM hr_data.fact_absence abs
+	JOIN hr_data.dim_date dd ON dd.date_id = abs.date_absence_id
+	CROSS JOIN (
+		VALUES
+			('hr_data.mv_employee_absence_monthly'),
+			('hr_data.mv_service_absence_monthly')
+	) AS t (target)
+	WHERE abs.id_employe = ANY(employee_ids)
+	ON CONFLICT DO NOTHING;
+$$;
+
+
+CREATE OR REPLACE FUNCTION hr_data.mark_employee_absence_pending_months()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+	IF TG_OP = 'INSERT' THEN
+		PERFORM hr_data.queue_employee_absence_months(ARRAY(SELECT id FROM new_rows));
+	ELSIF TG_OP = 'DELETE' THEN
+		PERFORM hr_data.queue_employee_absence_months(ARRAY(SELECT id FROM old_rows));
+	ELSE
+		-- Only the employees whose copied or grouped columns changed
+		PERFORM hr_data.queue_employee_absence_months(ARRAY(
+			SELECT id FROM (
+				(
+					SELECT id, first_name, last_name, service_id FROM new_rows
+					EXCEPT
+					SELECT id, first_name, last_name, service_id FROM old_rows
+				)
+				UNION
+				(
+					SELECT id, first_name, last_name, service_id FROM old_rows
+					EXCEPT
+					SELECT id, first_name, last_name, service_id FROM new_rows
+				)
+			) changed
+		));
+	END IF;
+	RETURN NULL;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION hr_data.mark_service_absence_pending_months()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+	PERFORM hr_data.queue_employee_absence_months(ARRAY(
+		SELECT e.id
+		FROM hr_data.dim_employee e
+		WHERE e.service_id IN (
+			SELECT n.id
+			FROM new_rows n
+			JOIN old_rows o ON o.id = n.id
+			WHERE n.name IS DISTINCT FROM o.name
+		)
+	));
+	RETURN NULL;
+END;
+$$;
+
+
+CREATE OR REPLACE TRIGGER employee_absence_months_insert
+AFTER INSERT ON hr_data.dim_employee
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_employee_absence_pending_months();
+
+CREATE OR REPLACE TRIGGER employee_absence_months_update
+AFTER UPDATE ON hr_data.dim_employee
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_employee_absence_pending_months();
+
+CREATE OR REPLACE TRIGGER employee_absence_months_delete
+AFTER DELETE ON hr_data.dim_employee
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_employee_absence_pending_months();
+
+-- A new or deleted service has no employees, and so no absences, of its own
+CREATE OR REPLACE TRIGGER service_absence_months_update
+AFTER UPDATE ON hr_data.dim_service
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_service_absence_pending_months();
+
+-- Rebuild the history that was in the dropped views
+INSERT INTO hr_data.absence_pending_months (target, annee, mois)
+SELECT DISTINCT t.target, dd.annee, dd.mois
+FROM hr_data.fact_absence abs
+JOIN hr_data.dim_date dd ON dd.date_id = abs.date_absence_id
+CROSS JOIN (
+	VALUES
+		('hr_data.mv_employee_absence_monthly'),
+		('hr_data.mv_service_absence_monthly')
+) AS t (target)
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,20 @@
+-- Absences and headcount per month and service, over working days only
+-- (weekdays that are not public holidays). Rolled up from
+-- hr_data.fact_daily_service_summary for the months the summary refresh queues
+-- in hr_data.absence_pending_months.
+CREATE TABLE IF NOT EXISTS hr_data.fact_monthly_service_summary (
+	annee INTEGER NOT NULL,
+	mois INTEGER NOT NULL,
+	service_id INTEGER NOT NULL REFERENCES hr_data.dim_service (id),
+	absence_count INTEGER NOT NULL,
+	headcount INTEGER NOT NULL,
+	PRIMARY KEY (annee, mois, service_id)
+);
+
+
+-- Roll up the days already summarised
+INSERT INTO hr_data.absence_pending_months (target, annee, mois)
+SELECT DISTINCT 'hr_data.fact_monthly_service_summary', dd.annee, dd.mois
+FROM hr_data.fact_daily_service_summary s
+JOIN hr_data.dim_date dd ON dd.date_id = s.date_id
+ON CONFLICT DO NOTHING;
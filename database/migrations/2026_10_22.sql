@@ -0,0 +1,150 @@
+-- Monthly range partitions of the fact tables, keyed on their date_id
+-- (YYYYMMDD). Partitions are named <table>_y<YYYY>m<MM> and created for every
+-- month of the calendar plus the next one by hr_data.create_fact_partitions(),
+-- which the partition maintenance flow runs ahead of each month.
+CREATE OR REPLACE FUNCTION hr_data.create_month_partition(
+	parent TEXT, target_year INTEGER, target_month INTEGER
+)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+AS $$
+DECLARE
+	first_day DATE := make_date(target_year, target_month, 1);
+	partition_name TEXT := format(
+		'%s_y%sm%s', parent, target_year, lpad(target_month::TEXT, 2, '0')
+	);
+BEGIN
+	-- Detached partitions keep their name and are not recreated
+	IF to_regclass(format('hr_data.%I', partition_name)) IS NOT NULL THEN
+		RETURN false;
+	END IF;
+	EXECUTE format(
+		'CREATE TABLE hr_data.%I PARTITION OF hr_data.%I FOR VALUES FROM (%s) TO (%s)',
+		partition_name,
+		parent,
+		to_char(first_day, 'YYYYMMDD'),
+		to_char(first_day + INTERVAL '1 month', 'YYYYMMDD')
+	);
+	RETURN true;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION hr_data.create_fact_partitions()
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+	month RECORD;
+	created INTEGER := 0;
+BEGIN
+	FOR month IN
+		SELECT DISTINCT annee, mois FROM hr_data.dim_date
+		UNION
+		SELECT extract(year FROM m)::INTEGER, extract(month FROM m)::INTEGER
+		FROM generate_series(
+			date_trunc('month', current_date),
+			date_trunc('month', current_date) + INTERVAL '1 month',
+			INTERVAL '1 month'
+		) AS m
+	LOOP
+		IF hr_data.create_month_partition('fact_daily_attendance', month.annee, month.mois) THEN
+			created := created + 1;
+		END IF;
+		IF hr_data.create_month_partition('fact_absence', month.annee, month.mois) THEN
+			created := created + 1;
+		END IF;
+	END LOOP;
+	RETURN created;
+END;
+$$;
+
+
+-- Rebuild heap tables created before the models declared the partitioning
+DO $$
+BEGIN
+	IF (SELECT relkind FROM pg_class WHERE oid = 'hr_data.fact_daily_attendance'::regclass) = 'r' THEN
+		ALTER TABLE hr_data.fact_daily_attendance RENAME TO fact_daily_attendance_heap;
+		ALTER INDEX hr_data.fact_daily_attendance_pkey RENAME TO fact_daily_attendance_heap_pkey;
+		ALTER INDEX IF EXISTS hr_data.fact_daily_attendance_absent_date_id
+			RENAME TO fact_daily_attendance_heap_absent_date_id;
+
+		CREATE TABLE hr_data.fact_daily_attendance (
+			date_id INTEGER NOT NULL REFERENCES hr_data.dim_date (date_id),
+			id_employee INTEGER NOT NULL REFERENCES hr_data.dim_employee (id),
+			present BOOLEAN NOT NULL,
+			check_in_hour TIME WITHOUT TIME ZONE,
+			check_out_hour TIME WITHOUT TIME ZONE,
+			PRIMARY KEY (date_id, id_employee)
+		) PARTITION BY RANGE (date_id);
+		CREATE INDEX fact_daily_attendance_absent_date_id
+		ON hr_data.fact_daily_attendance (date_id, id_employee)
+		WHERE NOT present;
+	END IF;
+
+	IF (SELECT relkind FROM pg_class WHERE oid = 'hr_data.fact_absence'::regclass) = 'r' THEN
+		ALTER TABLE hr_data.fact_absence RENAME TO fact_absence_heap;
+		ALTER INDEX hr_data.fact_absence_pkey RENAME TO fact_absence_heap_pkey;
+		ALTER INDEX IF EXISTS hr_data.fact_absence_date_absence_id
+			RENAME TO fact_absence_heap_date_absence_id;
+
+		CREATE TABLE hr_data.fact_absence (
+			id_employe INTEGER NOT NULL REFERENCES hr_data.dim_employee (id),
+			id_type_absence INTEGER NOT NULL REFERENCES hr_data.dim_type_absence (id),
+			date_absence_id INTEGER NOT NULL REFERENCES hr_data.dim_date (date_id),
+			PRIMARY KEY (id_employe, date_absence_id)
+		) PARTITION BY RANGE (date_absence_id);
+		CREATE INDEX fact_absence_date_absence_id
+		ON hr_data.fact_absence (date_absence_id);
+	END IF;
+
+	PERFORM hr_data.create_fact_partitions();
+
+	-- The summaries are already up to date, copy before the triggers exist
+	IF to_regclass('hr_data.fact_daily_attendance_heap') IS NOT NULL THEN
+		INSERT INTO hr_data.fact_daily_attendance
+		SELECT date_id, id_employee, present, check_in_hour, check_out_hour
+		FROM hr_data.fact_daily_attendance_heap;
+		DROP TABLE hr_data.fact_daily_attendance_heap;
+	END IF;
+
+	IF to_regclass('hr_data.fact_absence_heap') IS NOT NULL THEN
+		INSERT INTO hr_data.fact_absence
+		SELECT id_employe, id_type_absence, date_absence_id
+		FROM hr_data.fact_absence_heap;
+		DROP TABLE hr_data.fact_absence_heap;
+	END IF;
+END;
+$$;
+
+
+-- Triggers of the dropped heap tables, see 2026_10_17.sql and 2026_10_19.sql
+CREATE OR REPLACE TRIGGER attendance_summary_insert
+AFTER INSERT ON hr_data.fact_daily_attendance
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_summary_pending_dates();
+
+CREATE OR REPLACE TRIGGER attendance_summary_update
+AFTER UPDATE ON hr_data.fact_daily_attendance
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_summary_pending_dates();
+
+CREATE OR REPLACE TRIGGER attendance_summary_delete
+AFTER DELETE ON hr_data.fact_daily_attendance
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_summary_pending_dates();
+
+CREATE OR REPLACE TRIGGER absence_months_insert
+AFTER INSERT ON hr_data.fact_absence
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_absence_pending_months();
+
+CREATE OR REPLACE TRIGGER absence_months_update
+AFTER UPDATE ON hr_data.fact_absence
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_absence_pending_months();
+
+CREATE OR REPLACE TRIGGER absence_months_delete
+AFTER DELETE ON hr_data.fact_absence
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_absence_pending_months();
@@ -0,0 +1,24 @@
+-- Badge clock exports are copied as text into this staging table, validated and
+-- merged into the fact tables by the attendance ingestion flow. Rows only live
+-- for the transaction that copies them, so the table is not WAL-logged and
+-- concurrent loads never see each other's rows.
+CREATE UNLOGGED TABLE IF NOT EXISTS hr_data.attendance_staging (
+	matricule TEXT,
+	date TEXT,
+	check_in TEXT,
+	check_out TEXT,
+	absence_type TEXT
+);
+
+
+-- Every badge file ingested, keyed on a hash of its contents so a file is only
+-- loaded once whatever its name
+CREATE TABLE IF NOT EXISTS hr_data.ingested_attendance_files (
+	id BIGSERIAL PRIMARY KEY,
+	file_name TEXT NOT NULL,
+	checksum TEXT NOT NULL UNIQUE,
+	ingested_at TIMESTAMPTZ NOT NULL,
+	rows_loaded INTEGER NOT NULL DEFAULT 0,
+	rows_rejected INTEGER NOT NULL DEFAULT 0,
+	duration_seconds DOUBLE PRECISION NOT NULL DEFAULT 0
+);
@@ -0,0 +1,49 @@
+-- Days whose columns of the employee x day attendance matrices are missing or
+-- out of date. Maintained like hr_data.summary_pending_dates, but taken by the
+-- attendance matrix refresh, so neither refresh consumes the other's days.
+CREATE TABLE IF NOT EXISTS hr_data.matrix_pending_dates (
+	date_id INTEGER PRIMARY KEY
+);
+
+
+CREATE OR REPLACE FUNCTION hr_data.mark_matrix_pending_dates()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+	IF TG_OP <> 'DELETE' THEN
+		INSERT INTO hr_data.matrix_pending_dates (date_id)
+		SELECT DISTINCT date_id FROM new_rows
+		ON CONFLICT DO NOTHING;
+	END IF;
+	IF TG_OP <> 'INSERT' THEN
+		INSERT INTO hr_data.matrix_pending_dates (date_id)
+		SELECT DISTINCT date_id FROM old_rows
+		ON CONFLICT DO NOTHING;
+	END IF;
+	RETURN NULL;
+END;
+$$;
+
+
+-- Transition tables only allow one event per trigger
+CREATE OR REPLACE TRIGGER attendance_matrix_insert
+AFTER INSERT ON hr_data.fact_daily_attendance
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_matrix_pending_dates();
+
+CREATE OR REPLACE TRIGGER attendance_matrix_update
+AFTER UPDATE ON hr_data.fact_daily_attendance
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_matrix_pending_dates();
+
+CREATE OR REPLACE TRIGGER attendance_matrix_delete
+AFTER DELETE ON hr_data.fact_daily_attendance
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION hr_data.mark_matrix_pending_dates();
+
+
+-- Build the matrices of the history loaded before this migration
+INSERT INTO hr_data.matrix_pending_dates (date_id)
+SELECT DISTINCT date_id FROM hr_data.fact_daily_attendance
+ON CONFLICT DO NOTHING;
@@ -1,6 +1,16 @@
-from typing import Any, List, Optional, Sequence, Tuple
-from datetime import date, time
-from sqlalchemy import Date, ForeignKey, CheckConstraint, Row, String
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import (
+    BigInteger,
+    Date,
+    DateTime,
+    ForeignKey,
+    CheckConstraint,
+    Index,
+    Row,
+    String,
+    text,
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 from database.enums import ContractType
@@ -42,7 +52,10 @@ class AbsenceType(Base):
 
 class Absence(Base):
     __tablename__ = "fact_absence"
-    __table_args__ = {"schema": "hr_data"}
+    __table_args__ = (
+        Index("fact_absence_date_absence_id", "date_absence_id"),
+        {"schema": "hr_data", "postgresql_partition_by": "RANGE (date_absence_id)"},
+    )
 
     id_employe: Mapped[int] = mapped_column(
         ForeignKey("hr_data.dim_employee.id"), primary_key=True
@@ -60,7 +73,15 @@ class Absence(Base):
 
 class DailyAttendance(Base):
     __tablename__ = "fact_daily_attendance"
-    __table_args__ = {"schema": "hr_data"}
+    __table_args__ = (
+        Index(
+            "fact_daily_attendance_absent_date_id",
+            "date_id",
+            "id_employee",
+            postgresql_where=text("NOT present"),
+        ),
+        {"schema": "hr_data", "postgresql_partition_by": "RANGE (date_id)"},
+    )
 
     date_id: Mapped[int] = mapped_column(
         ForeignKey("hr_data.dim_date.date_id"), primary_key=True
@@ -93,6 +114,8 @@ class DateDimension(Base):
             name="check_valid_day_name",
         ),
         CheckConstraint("jour_semaine BETWEEN 1 AND 7", name="check_valid_day_number"),
+        Index("dim_date_annee_mois", "annee", "mois"),
+        Index("dim_date_annee_trimestre", "annee", "trimestre"),
         {"schema": "hr_data"},
     )
 
@@ -168,7 +191,10 @@ class DateDimension(Base):
 # Employee dimension table
 class DimEmployee(Base):
     __tablename__ = "dim_employee"
-    __table_args__ = {"schema": "hr_data"}
+    __table_args__ = (
+        Index("dim_employee_service_id", "service_id"),
+        {"schema": "hr_data"},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
     first_name: Mapped[str]
@@ -193,6 +219,50 @@ class DimEmployee(Base):
     )
 
 
+# Daily headcount per service, derived from integration_date/departure_date
+class DailyHeadcount(Base):
+    __tablename__ = "fact_daily_headcount"
+    __table_args__ = {"schema": "hr_data"}
+
+    date_id: Mapped[int] = mapped_column(
+        ForeignKey("hr_data.dim_date.date_id"), primary_key=True
+    )
+    service_id: Mapped[int] = mapped_column(
+        ForeignKey("hr_data.dim_service.id"), primary_key=True
+    )
+    headcount: Mapped[int]
+
+
+# Absences, headcount and worked time per day and service
+class DailyServiceSummary(Base):
+    __tablename__ = "fact_daily_service_summary"
+    __table_args__ = {"schema": "hr_data"}
+
+    date_id: Mapped[int] = mapped_column(
+        ForeignKey("hr_data.dim_date.date_id"), primary_key=True
+    )
+    service_id: Mapped[int] = mapped_column(
+        ForeignKey("hr_data.dim_service.id"), primary_key=True
+    )
+    absence_count: Mapped[int]
+    headcount: Mapped[int]
+    worked_seconds: Mapped[int] = mapped_column(BigInteger)
+
+
+# Absences and headcount per month and service, over working days only
+class MonthlyServiceSummary(Base):
+    __tablename__ = "fact_monthly_service_summary"
+    __table_args__ = {"schema": "hr_data"}
+
+    annee: Mapped[int] = mapped_column(primary_key=True)
+    mois: Mapped[int] = mapped_column(primary_key=True)
+    service_id: Mapped[int] = mapped_column(
+        ForeignKey("hr_data.dim_service.id"), primary_key=True
+    )
+    absence_count: Mapped[int]
+    headcount: Mapped[int]
+
+
 # Service dimension table
 class DimService(Base):
     __tablename__ = "dim_service"
@@ -213,13 +283,57 @@ class DimJob(Base):
     description: Mapped[str | None]
 
 
+# Duration of every warehouse refresh step
+class WarehouseRefreshLog(Base):
+    __tablename__ = "warehouse_refresh_log"
+    __table_args__ = {"schema": "hr_data"}
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    target: Mapped[str]
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    duration_seconds: Mapped[float]
+
+
+# Badge clock exports loaded by the attendance ingestion flow
+class IngestedAttendanceFile(Base):
+    __tablename__ = "ingested_attendance_files"
+    __table_args__ = {"schema": "hr_data"}
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    file_name: Mapped[str]
+    checksum: Mapped[str] = mapped_column(unique=True)
+    ingested_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    rows_loaded: Mapped[int] = mapped_column(server_default="0")
+    rows_rejected: Mapped[int] = mapped_column(server_default="0")
+    duration_seconds: Mapped[float] = mapped_column(server_default="0")
+
+
 # ---------------------------------- REPORTING DATA MODELS ---------------------------------#
+class Service(NamedTuple):
+    id: int
+    name: str
+
+
+class EmployeeAttendance(NamedTuple):
+    matricule: int
+    first_name: str
+    last_name: str
+    present: bool
+    work_seconds: Optional[int]
+
+
+@dataclass(frozen=True)
+class AttendanceClassification:
+    absent: List[EmployeeAttendance]
+    under_thresholds: Dict[float, List[Tuple[EmployeeAttendance, timedelta]]]
+
+
 @dataclass(frozen=True)
 class DailyReportData:
     date: int
     employees_under_8_30h: List[Any]
     employees_under_8h: List[Any]
-    employees_absent: List[DimEmployee]
+    employees_absent: List[EmployeeAttendance]
     absence_percentage: float
 
 
@@ -229,7 +343,7 @@ class WeeklyReportData:
     end_date: date
     employees_under_8_30h: List[Any]
     employees_under_8h: List[Any]
-    employees_absent: List[DimEmployee]
+    employees_absent: List[EmployeeAttendance]
     absence_percentage: float
 
 
@@ -245,3 +359,45 @@ class EmailData:
 class ServiceAbsenceTable:
     service_name: str
     table: Sequence[Row[Tuple[date, str, bool, int, int, Any]]]
+
+
+@dataclass(frozen=True)
+class ReportDataset:
+    """
+    Absences at service x period grain, shared by the HTML body and the workbook
+
+    rows: service id | *period | absence count | total employees
+    """
+
+    services: Sequence[Row[Tuple[int, str]]]
+    rows: Sequence[Row[Tuple[Any, ...]]]
+
+
+class DurationStats(NamedTuple):
+    """
+    Worked time of a service over a period, in seconds, from the days present
+    with both badge times. histogram counts the days per DURATION_BUCKETS.
+    """
+
+    service_id: int
+    period: str
+    days: int
+    mean: float
+    p10: float
+    p50: float
+    p90: float
+    histogram: Tuple[int, ...]
+
+
+class ServiceAbsences(NamedTuple):
+    """
+    Absences of the employees of a service over a period, in working days.
+    long_absences counts the employees absent LONG_ABSENCE_DAYS working days
+    in a row or more.
+    """
+
+    service_id: int
+    absent_employees: int
+    absent_days: int
+    long_absences: int
+    longest: int
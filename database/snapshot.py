@@ -0,0 +1,95 @@
+import os
+from typing import Iterable, List, Sequence
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import BigInteger, Boolean, Date, Enum, Integer, String, Time
+from database import SNAPSHOT_DIR
+from database.models import Base
+
+# Dimensions are one file each. Facts are one file per month, named like the
+# Postgres partitions, and keyed on the date column of the table.
+SNAPSHOT_DIMENSIONS = [
+    "dim_date",
+    "dim_service",
+    "dim_job",
+    "dim_type_absence",
+    "dim_employee",
+]
+SNAPSHOT_FACTS = {
+    "fact_daily_attendance": "date_id",
+    "fact_absence": "date_absence_id",
+    # Read with the attendance to rebuild the daily service summary
+    "fact_daily_headcount": "date_id",
+}
+SNAPSHOT_COMPRESSION = "zstd"
+
+ARROW_TYPES = {
+    BigInteger: pa.int64(),
+    Integer: pa.int32(),
+    Boolean: pa.bool_(),
+    Date: pa.date32(),
+    Time: pa.time64("us"),
+    Enum: pa.string(),
+    String: pa.string(),
+}
+
+
+def table_schema(table: str) -> pa.Schema:
+    """
+    The Arrow schema of an hr_data table, from its model
+    """
+    columns = Base.metadata.tables[f"hr_data.{table}"].columns
+    return pa.schema(
+        [
+            pa.field(
+                column.name,
+                next(
+                    arrow_type
+                    for sql_type, arrow_type in ARROW_TYPES.items()
+                    if isinstance(column.type, sql_type)
+                ),
+                nullable=column.nullable,
+            )
+            for column in columns
+        ]
+    )
+
+
+def month_file(table: str, month: int, directory: str = SNAPSHOT_DIR) -> str:
+    """
+    month is YYYYMM, as date_id // 100
+    """
+    return os.path.join(
+        directory, table, f"{table}_y{month // 100}m{month % 100:02}.parquet"
+    )
+
+
+def dimension_file(table: str, directory: str = SNAPSHOT_DIR) -> str:
+    return os.path.join(directory, f"{table}.parquet")
+
+
+def read_dimension(table: str, columns: Sequence[str] | None = None) -> pa.Table:
+    path = dimension_file(table)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"No {table} in the snapshot at {SNAPSHOT_DIR}, export it first."
+        )
+    return pq.read_table(path, columns=columns, memory_map=True)
+
+
+def read_fact_months(
+    table: str, months: Iterable[int], columns: Sequence[str] | None = None
+) -> pa.Table:
+    """
+    The rows of the given months, memory-mapped. Months without a file have no
+    rows.
+    """
+    parts: List[pa.Table] = [
+        pq.read_table(path, columns=columns, memory_map=True)
+        for path in (month_file(table, month) for month in sorted(set(months)))
+        if os.path.exists(path)
+    ]
+    if not parts:
+        schema = table_schema(table)
+        return schema.empty_table().select(columns or schema.names)
+    return pa.concat_tables(parts)
@@ -1,8 +1,7 @@
 from datetime import date
 from typing import Any, Sequence, Tuple
 from prefect import task
-from sqlalchemy import Row
-from database.models import DailyReportData, DateDimension
+from database.models import DailyReportData
 
 
 @task
@@ -150,7 +149,7 @@ def generate_daily_report_html(daily_data: DailyReportData) -> str:
 
 @task
 def generate_weekly_report_html(
-    weekly_data: Sequence[Row[Tuple[date, str, bool, int, int, Any]]],
+    weekly_data: Sequence[Tuple[date, str, bool, int, int, Any]],
     start_date: date,
     end_date: date,
 ) -> str:
@@ -246,16 +245,16 @@ def generate_weekly_report_html(
 
 @task
 def generate_monthly_report_html(
-    monthly_data: Sequence[Row[Tuple[DateDimension, int, Any]]],
+    monthly_data: Sequence[Tuple[date, str, int, Any]],
     month_name: str,
     year: int,
 ) -> str:
     table_rows = ""
-    for dim_date, abs_count, abs_percentage in monthly_data:
+    for date_literal, day_name, abs_count, abs_percentage in monthly_data:
         table_rows += f"""
         <tr>
-            <td>{dim_date.date_literale}</td>
-            <td>{dim_date.nom_jour}</td>
+            <td>{date_literal}</td>
+            <td>{day_name}</td>
             <td>{abs_count}</td>
             <td>{abs_percentage}%</td>
         </tr>
@@ -340,7 +339,7 @@ def generate_monthly_report_html(
 
 @task
 def generate_quarterly_report_html(
-    quarterly_data: Sequence[Row[Tuple[int, str, int, Any]]],
+    quarterly_data: Sequence[Tuple[int, str, int, Any]],
     quarter: int,
     year: int,
 ) -> str:
@@ -434,7 +433,7 @@ def generate_quarterly_report_html(
 
 @task
 def generate_yearly_report_html(
-    yearly_data: Sequence[Row[Tuple[int, str, int, Any]]],
+    yearly_data: Sequence[Tuple[int, str, int, Any]],
     year: int,
 ) -> str:
     table_rows = ""
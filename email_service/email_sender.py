@@ -10,35 +10,18 @@ from dotenv import load_dotenv
 import os
 from prefect import task
 from prefect.logging import get_run_logger, disable_run_logger
-from database.db import get_engine
-from sqlalchemy.orm import aliased, Session
-from sqlalchemy import select
-from database.models import DimEmployee
+from database.dimensions import manager_emails
 
 
 @task
 def extract_receiver_emails() -> List[str]:
     logger = get_run_logger()
     try:
-        engine = get_engine()
+        return manager_emails()
     except Exception as e:
         logger.error(f"Error while connecting to the database: {e}")
         exit(1)
 
-    manager = aliased(DimEmployee)
-    employee = aliased(DimEmployee)
-
-    with Session(engine) as session:
-        return list(
-            session.execute(
-                select(manager.email)
-                .join(employee, employee.hierarchical_manager_id == manager.id)
-                .distinct()
-            )
-            .scalars()
-            .all()
-        )
-
 
 @task(retries=3, timeout_seconds=20)
 def send_daily_email(email_data: EmailData):
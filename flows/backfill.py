@@ -0,0 +1,52 @@
+import time
+from datetime import date
+from typing import List
+from database import REPORT_BACKEND, TASK_CONCURRENCY
+from database.db import pool_stats, warm_pool
+from database.dimensions import dimension_cache_stats
+from prefect import flow
+from prefect.logging import get_run_logger
+from prefect.task_runners import ThreadPoolTaskRunner
+from tasks.backfill import render_reports
+from tasks.utils import REPORT_KINDS, fetch_period_datasets, report_periods
+
+
+@flow(
+    flow_run_name="report-backfill-{start_date}-{end_date}",
+    task_runner=ThreadPoolTaskRunner(max_workers=TASK_CONCURRENCY),
+)
+def backfill_reports(
+    start_date: date, end_date: date, kinds: List[str] | None = None
+) -> List[str]:
+    """
+    Regenerate the workbooks of every report period overlapping start_date to
+    end_date, from one scan of the facts or of the snapshot files. Nothing is
+    emailed.
+
+    return xlsx file paths
+    """
+    logger = get_run_logger()
+
+    if start_date > end_date:
+        raise ValueError(f"Invalid backfill range: {start_date} > {end_date}")
+    periods = report_periods(kinds or REPORT_KINDS, start_date, end_date)
+
+    start = time.perf_counter()
+    # From the snapshot backend, reports are rebuilt without the database
+    if REPORT_BACKEND != "snapshot":
+        try:
+            warm_pool()
+        except Exception as e:
+            logger.error(f"Error while connecting to the database: {e}")
+            exit(1)
+
+    datasets = fetch_period_datasets(periods)
+    paths = render_reports(datasets)
+
+    logger.info(
+        f"{len(paths)} reports BACKFILLED in {time.perf_counter() - start:.2f}s"
+    )
+    if REPORT_BACKEND != "snapshot":
+        logger.info(f"Database pool: {pool_stats()}")
+    logger.info(f"Dimension cache: {dimension_cache_stats()}")
+    return paths
@@ -1,22 +1,19 @@
-from database.models import DailyReportData, EmailData, DateDimension
-from database.db import get_engine
+from database.models import DailyReportData, EmailData
+from database import TASK_CONCURRENCY
+from database.db import pool_stats, warm_pool
+from database.dimensions import calendar_index, dimension_cache_stats
 from email_service.email_sender import send_daily_email
 from email_service.email_generator import generate_daily_report_html
 from prefect import flow
 from prefect.logging import get_run_logger
 from prefect.task_runners import ThreadPoolTaskRunner
-from tasks.utils import (
-    fetch_employees_per_date,
-    fetch_absent_employees,
-    fetch_employees_under_working,
-    total_employee_count,
-    generate_daily_csv,
-)
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from tasks.utils import stream_daily_attendance, total_employee_count
+from tasks.warehousing import refresh_daily_headcount
 from datetime import date
 from flows import RECEIVER_EMAILS
 
+UNDER_WORK_THRESHOLDS = [8.5, 8]
+
 
 def generate_daily_flow_name() -> str:
     date_id = int(date.today().strftime("%Y%m%d"))
@@ -25,68 +22,60 @@ def generate_daily_flow_name() -> str:
 
 @flow(
     flow_run_name=generate_daily_flow_name,
-    task_runner=ThreadPoolTaskRunner(max_workers=4),
+    task_runner=ThreadPoolTaskRunner(max_workers=TASK_CONCURRENCY),
 )
 def daily_report(target_date_id: int | None = None):
     logger = get_run_logger()
 
-    engine = get_engine()
+    try:
+        warm_pool()
+    except Exception as e:
+        logger.error(f"Error while connecting to the database: {e}")
+        exit(1)
+
+    calendar = calendar_index()
 
     if target_date_id is None:
         today = date.today()
         if date.today().weekday() in {5, 6}:  # Skip weekends
             logger.info("Nothing to report on a weekend.")
             exit(0)
-        with Session(engine) as session:
-            target_date_id = session.execute(
-                select(DateDimension.date_id).where(
-                    DateDimension.date_literale == today
-                )
-            ).scalar_one_or_none()
+        target_date_id = calendar.date_id(today)
 
         if target_date_id is None:
             logger.error(f"No date_id found for today's date: {today}")
             return
 
+    target_day = calendar.day(target_date_id)
+    if target_day is None:
+        logger.error(f"No date found for date_id: {target_date_id}")
+        return
+
     # Check for holiday
-    with Session(engine) as session:
-        is_holiday = session.execute(
-            select(DateDimension.est_ferie).where(
-                DateDimension.date_id == target_date_id
-            )
-        ).scalar_one()
-
-    if is_holiday:
+    if calendar.is_holiday(target_day):
         logger.info("Today is a holiday. No email will be sent")
         exit(0)
 
-    employees_daily_data = fetch_employees_per_date(target_date_id)
+    # Employees loaded since the last warehouse refresh count on the day
+    headcount = refresh_daily_headcount.submit(target_date_id)
+    employee_count = total_employee_count.submit(target_date_id, wait_for=[headcount])
 
-    employee_count = total_employee_count.submit()
-
-    if employees_daily_data is None:
-        logger.error("Couldn't fetch employee data")
-        exit(1)
-
-    employees_under_8_30h = fetch_employees_under_working.submit(
-        employees_daily_data, 8.5
+    # One pass over the day's rows writes the CSV and classifies them
+    classification, csv_filepath = stream_daily_attendance(
+        target_date_id, UNDER_WORK_THRESHOLDS, f"daily_report{target_date_id}"
     )
-    employees_under_8h = fetch_employees_under_working.submit(employees_daily_data, 8)
-    employees_absent = fetch_absent_employees.submit(employees_daily_data)
 
-    csv_filepath = generate_daily_csv.submit(
-        employees_daily_data, f"daily_report{target_date_id}"
-    )
+    employees_absent = classification.absent
+    under_thresholds = classification.under_thresholds
 
-    absence_percentage = (
-        len(employees_absent.result()) / employee_count.result()
-    ) * 100
+    staff = employee_count.result()
+    absence_percentage = (len(employees_absent) / staff) * 100 if staff else 0.0
 
     daily_data = DailyReportData(
         date=target_date_id,
-        employees_absent=employees_absent.result(),
-        employees_under_8_30h=employees_under_8_30h.result(),
-        employees_under_8h=employees_under_8h.result(),
+        employees_absent=employees_absent,
+        employees_under_8_30h=under_thresholds[8.5],
+        employees_under_8h=under_thresholds[8],
         absence_percentage=absence_percentage,
     )
 
@@ -96,7 +85,9 @@ def daily_report(target_date_id: int | None = None):
         receiver_emails=RECEIVER_EMAILS,
         subject="Rapport Quotidien",
         html_content=html_report,
-        report_file_path=f"{csv_filepath.result()}",
+        report_file_path=f"{csv_filepath}",
     )
 
     send_daily_email(email_data)
+    logger.info(f"Database pool: {pool_stats()}")
+    logger.info(f"Dimension cache: {dimension_cache_stats()}")
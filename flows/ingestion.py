@@ -0,0 +1,41 @@
+import glob
+import os
+from tasks.ingestion import ingest_badge_file
+from database import BADGE_EXPORT_DIR
+from prefect import flow
+from prefect.logging import get_run_logger
+
+
+@flow
+def ingest_attendance(directory: str = BADGE_EXPORT_DIR, reingest: bool = False):
+    logger = get_run_logger()
+
+    paths = sorted(glob.glob(os.path.join(directory, "*.csv")))
+    logger.info(f"Ingesting {len(paths)} badge files from {directory}...")
+
+    loaded = rejected = 0
+    duration = 0.0
+    failed = []
+    # One file at a time in name order, so a later export of a day wins
+    for path in paths:
+        try:
+            result = ingest_badge_file(path, reingest)
+        except Exception as e:
+            logger.error(f"Error while ingesting {path}: {e}")
+            failed.append(path)
+            continue
+
+        if result is not None:
+            loaded += result[0]
+            rejected += result[1]
+            duration += result[2]
+
+    rows_per_second = (loaded + rejected) / duration if duration else 0.0
+    logger.info(
+        f"Attendance INGESTED: {loaded} rows loaded, {rejected} rejected "
+        f"({rows_per_second:,.0f} rows/s)"
+    )
+
+    if failed:
+        logger.error(f"{len(failed)} badge files could not be ingested: {failed}")
+        exit(1)
@@ -1,10 +1,20 @@
 from typing import Tuple
+from database import REPORT_BACKEND, TASK_CONCURRENCY
+from database.db import pool_stats, warm_pool
+from database.dimensions import dimension_cache_stats
 from prefect import flow
 from prefect.logging import get_run_logger
 from prefect.task_runners import ThreadPoolTaskRunner
 from email_service.email_generator import generate_monthly_report_html
 from email_service.email_sender import send_daily_email
-from tasks.utils import fetch_monthly_data, generate_monthly_excel
+from tasks.absences import fetch_service_absences
+from tasks.durations import fetch_duration_stats
+from tasks.utils import (
+    fetch_monthly_dataset,
+    fetch_monthly_data,
+    generate_monthly_excel,
+    month_period,
+)
 from database.models import EmailData
 from datetime import date
 from flows import RECEIVER_EMAILS
@@ -37,23 +47,35 @@ def generate_monthly_flow_name() -> str:
 
 @flow(
     flow_run_name=generate_monthly_flow_name,
-    task_runner=ThreadPoolTaskRunner(max_workers=4),
+    task_runner=ThreadPoolTaskRunner(max_workers=TASK_CONCURRENCY),
 )
 def monthly_report(target_month: int | None = None, target_year: int | None = None):
     logger = get_run_logger()
 
+    if REPORT_BACKEND != "snapshot":
+        try:
+            warm_pool()
+        except Exception as e:
+            logger.error(f"Error while connecting to the database: {e}")
+            exit(1)
+
     _target_month, _target_year = get_target_month_year()
     if target_month is None:
         target_month = _target_month
     if target_year is None:
         target_year = _target_year
 
-    monthly_data = fetch_monthly_data.submit(target_month, target_year)
+    monthly_dataset = fetch_monthly_dataset(target_month, target_year)
+    monthly_data = fetch_monthly_data.submit(monthly_dataset)
+    durations = fetch_duration_stats.submit(*month_period(target_month, target_year))
+    absences = fetch_service_absences.submit(*month_period(target_month, target_year))
     logger.info("Generating Excel sheets")
     xlsx_filepath = generate_monthly_excel.submit(
+        monthly_dataset,
         target_month,
-        target_year,
         f"monthly_report_{target_month}_{target_year}",
+        durations,
+        absences,
     )
 
     html_report = generate_monthly_report_html(
@@ -68,3 +90,6 @@ def monthly_report(target_month: int | None = None, target_year: int | None = No
     )
 
     send_daily_email(email_data)
+    if REPORT_BACKEND != "snapshot":
+        logger.info(f"Database pool: {pool_stats()}")
+    logger.info(f"Dimension cache: {dimension_cache_stats()}")
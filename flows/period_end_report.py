@@ -0,0 +1,81 @@
+from datetime import date
+from typing import List
+from database import REPORT_BACKEND
+from database.db import warm_pool
+from prefect import flow
+from prefect.logging import get_run_logger
+from prefect.runtime import flow_run
+from flows.monthly_report import monthly_report
+from flows.quarterly_report import quarterly_report
+from flows.yearly_report import yearly_report
+from tasks.utils import (
+    ReportPeriod,
+    fetch_period_datasets,
+    report_period,
+    shared_datasets,
+)
+
+
+def closing_kinds(day: date) -> List[str]:
+    """
+    return the report kinds whose period ends with the month of day
+    """
+    kinds = ["monthly"]
+    if day.month % 3 == 0:
+        kinds.append("quarterly")
+    if day.month == 12:
+        kinds.append("yearly")
+    return kinds
+
+
+def generate_period_end_flow_name() -> str:
+    target_day = flow_run.parameters.get("target_day") or date.today()
+    return f"period-end-report-{target_day.month}-{target_day.year}"
+
+
+@flow(flow_run_name=generate_period_end_flow_name)
+def period_end_report(target_day: date | None = None):
+    """
+    Send the monthly report, and the quarterly and yearly ones when the month
+    closes them, from one query for all of them
+    """
+    logger = get_run_logger()
+
+    if REPORT_BACKEND != "snapshot":
+        try:
+            warm_pool()
+        except Exception as e:
+            logger.error(f"Error while connecting to the database: {e}")
+            exit(1)
+
+    if target_day is None:
+        target_day = date.today()
+    kinds = closing_kinds(target_day)
+    periods: List[ReportPeriod] = [report_period(kind, target_day) for kind in kinds]
+
+    datasets = fetch_period_datasets(periods)
+    logger.info(f"Fetched the {', '.join(kinds)} datasets in one query")
+
+    quarter = (target_day.month - 1) // 3 + 1
+    reports = {
+        "monthly": (monthly_report, (target_day.month, target_day.year)),
+        "quarterly": (quarterly_report, (quarter, target_day.year)),
+        "yearly": (yearly_report, (target_day.year,)),
+    }
+    failed = []
+    with shared_datasets(datasets):
+        for kind in kinds:
+            report, args = reports[kind]
+            # A failed report must not keep the next ones from being sent
+            try:
+                state = report(*args, return_state=True)
+            except SystemExit as e:
+                logger.error(f"The {kind} report exited with code {e.code}")
+                failed.append(kind)
+                continue
+            if not state.is_completed():
+                logger.error(f"The {kind} report failed: {state.message}")
+                failed.append(kind)
+
+    if failed:
+        raise RuntimeError(f"Failed to send the {', '.join(failed)} reports")
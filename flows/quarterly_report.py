@@ -1,9 +1,16 @@
 from datetime import date
 from typing import Tuple
 from database.models import EmailData
-from tasks.utils import fetch_quarterly_data, generate_quarterly_excel
+from tasks.utils import (
+    fetch_quarterly_dataset,
+    fetch_quarterly_data,
+    generate_quarterly_excel,
+)
 from email_service.email_generator import generate_quarterly_report_html
 from email_service.email_sender import send_daily_email
+from database import REPORT_BACKEND, TASK_CONCURRENCY
+from database.db import pool_stats, warm_pool
+from database.dimensions import dimension_cache_stats
 from prefect import flow
 from prefect.logging import get_run_logger
 from prefect.task_runners import ThreadPoolTaskRunner
@@ -24,22 +31,30 @@ def generate_quarterly_flow_name() -> str:
 
 @flow(
     flow_run_name=generate_quarterly_flow_name,
-    task_runner=ThreadPoolTaskRunner(max_workers=4),
+    task_runner=ThreadPoolTaskRunner(max_workers=TASK_CONCURRENCY),
 )
 def quarterly_report(target_quarter: int | None, target_year: int | None):
     logger = get_run_logger()
 
+    if REPORT_BACKEND != "snapshot":
+        try:
+            warm_pool()
+        except Exception as e:
+            logger.error(f"Error while connecting to the database: {e}")
+            exit(1)
+
     _target_quarter, _target_year = get_target_quarter_year()
     if target_quarter is None:
         target_quarter = _target_quarter
     if target_year is None:
         target_year = _target_year
 
-    quarterly_data = fetch_quarterly_data.submit(target_quarter, target_year)
+    quarterly_dataset = fetch_quarterly_dataset(target_quarter, target_year)
+    quarterly_data = fetch_quarterly_data.submit(quarterly_dataset)
     logger.info("Generating Excel sheets")
     xlsx_filepath = generate_quarterly_excel.submit(
+        quarterly_dataset,
         target_quarter,
-        target_year,
         f"quarterly_report_Q{target_quarter}_{target_year}",
     )
 
@@ -55,3 +70,6 @@ def quarterly_report(target_quarter: int | None, target_year: int | None):
     )
 
     send_daily_email(email_data)
+    if REPORT_BACKEND != "snapshot":
+        logger.info(f"Database pool: {pool_stats()}")
+    logger.info(f"Dimension cache: {dimension_cache_stats()}")
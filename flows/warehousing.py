@@ -1,18 +1,102 @@
 from tasks.warehousing import (
+    manage_fact_partitions,
+    refresh_daily_headcount,
+    refresh_daily_service_summary,
+    refresh_monthly_service_summary,
     refresh_monthly_employee_absence_mv,
     refresh_monthly_service_absence_mv,
 )
+from tasks.date_dimension import load_calendar
+from tasks.matrix import refresh_attendance_matrix
+from tasks.snapshot import export_snapshot
+from datetime import date
+from database import SNAPSHOT_DIR, TASK_CONCURRENCY
+from database.db import pool_stats, warm_pool
+from database.dimensions import invalidate_dimensions
 from prefect import flow
 from prefect.logging import get_run_logger
+from prefect.task_runners import ThreadPoolTaskRunner
 
 
-@flow()
+@flow(task_runner=ThreadPoolTaskRunner(max_workers=TASK_CONCURRENCY))
 def refresh_warehouse():
     logger = get_run_logger()
 
+    try:
+        warm_pool()
+    except Exception as e:
+        logger.error(f"Error while connecting to the database: {e}")
+        exit(1)
+
     logger.info("Starting data warehouse refresh...")
 
-    refresh_monthly_employee_absence_mv()
-    refresh_monthly_service_absence_mv()
+    # The dimensions are reloaded ahead of the refresh, drop what this
+    # process cached of them
+    invalidate_dimensions()
+
+    # The summary copies the headcounts and is rolled up per month, the absence
+    # tables only read fact_absence and the matrices only fact_daily_attendance
+    headcount = refresh_daily_headcount.submit()
+    summary = refresh_daily_service_summary.submit(wait_for=[headcount])
+    durations = {
+        "hr_data.fact_daily_headcount": headcount,
+        "hr_data.fact_daily_service_summary": summary,
+        "hr_data.fact_monthly_service_summary": (
+            refresh_monthly_service_summary.submit(wait_for=[summary])
+        ),
+        "hr_data.mv_employee_absence_monthly": (
+            refresh_monthly_employee_absence_mv.submit()
+        ),
+        "hr_data.mv_service_absence_monthly": (
+            refresh_monthly_service_absence_mv.submit()
+        ),
+        "attendance_matrix": refresh_attendance_matrix.submit(),
+    }
+
+    for target, duration in durations.items():
+        logger.info(f"{target}: {duration.result():.2f}s")
 
     logger.info("Data warehouse REFRESHED")
+    logger.info(f"Database pool: {pool_stats()}")
+
+
+@flow
+def maintain_fact_partitions(retention_months: int | None = None):
+    logger = get_run_logger()
+
+    logger.info("Creating the upcoming fact table partitions...")
+
+    created, detached = manage_fact_partitions(retention_months)
+    for partition in detached:
+        logger.info(f"hr_data.{partition} DETACHED")
+
+    logger.info(f"Fact table partitions MAINTAINED ({created} created)")
+
+
+@flow
+def generate_calendar(
+    start_date: date, end_date: date, holidays: list[date] | None = None
+):
+    logger = get_run_logger()
+
+    logger.info(f"Loading the calendar from {start_date} to {end_date}...")
+
+    added, months_queued = load_calendar(start_date, end_date, holidays)
+
+    logger.info(f"Calendar LOADED ({added} days added)")
+    if months_queued:
+        logger.info(
+            f"{months_queued} months changed holidays, "
+            "the next warehouse refresh recomputes their summary"
+        )
+
+
+@flow
+def export_warehouse_snapshot():
+    logger = get_run_logger()
+
+    logger.info(f"Exporting the star schema to {SNAPSHOT_DIR}...")
+
+    rows, size = export_snapshot()
+
+    logger.info(f"Warehouse snapshot EXPORTED ({rows} rows, {size / 2**20:.1f} MiB)")
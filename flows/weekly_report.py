@@ -1,24 +1,35 @@
 from typing import Tuple
+from database import REPORT_BACKEND, TASK_CONCURRENCY
+from database.db import pool_stats, warm_pool
+from database.dimensions import dimension_cache_stats
 from prefect import flow
 from prefect.task_runners import ThreadPoolTaskRunner
 from prefect.logging import get_run_logger
+from prefect.runtime import flow_run
 from datetime import date, timedelta
-from tasks.utils import fetch_weekly_data, generate_weekly_excel
+from tasks.utils import fetch_weekly_dataset, fetch_weekly_data, generate_weekly_excel
 from email_service.email_generator import generate_weekly_report_html
 from email_service.email_sender import send_daily_email
 from database.models import EmailData
 from flows import RECEIVER_EMAILS
 
 
+def get_workweek(day: date) -> Tuple[date, date]:
+    monday = day - timedelta(days=day.weekday())
+    friday = monday + timedelta(days=4)
+    return monday, friday
+
+
 def get_last_workweek() -> Tuple[date, date]:
-    today = date.today()
-    last_monday = today - timedelta(days=today.weekday() + 7)
-    last_friday = last_monday + timedelta(days=4)
-    return last_monday, last_friday
+    return get_workweek(date.today() - timedelta(days=7))
 
 
 def generate_weekly_flow_name() -> str:
-    start, end = get_last_workweek()
+    target_day = flow_run.parameters.get("target_day")
+    if target_day is None:
+        start, end = get_last_workweek()
+    else:
+        start, end = get_workweek(target_day)
     start = start.strftime("%Y%m%d")
     end = end.strftime("%Y%m%d")
     return f"weekly-report-{start}-{end}"
@@ -26,17 +37,28 @@ def generate_weekly_flow_name() -> str:
 
 @flow(
     flow_run_name=generate_weekly_flow_name,
-    task_runner=ThreadPoolTaskRunner(max_workers=4),
+    task_runner=ThreadPoolTaskRunner(max_workers=TASK_CONCURRENCY),
 )
-def weekly_report():
+def weekly_report(target_day: date | None = None):
     logger = get_run_logger()
 
-    start_date, end_date = get_last_workweek()
-    weekly_data = fetch_weekly_data.submit(start_date, end_date)
+    if REPORT_BACKEND != "snapshot":
+        try:
+            warm_pool()
+        except Exception as e:
+            logger.error(f"Error while connecting to the database: {e}")
+            exit(1)
+
+    # The work week of target_day, the last one by default
+    if target_day is None:
+        start_date, end_date = get_last_workweek()
+    else:
+        start_date, end_date = get_workweek(target_day)
+    weekly_dataset = fetch_weekly_dataset(start_date, end_date)
+    weekly_data = fetch_weekly_data.submit(weekly_dataset)
     logger.info("Generating Excel sheets")
     xlsx_filepath = generate_weekly_excel.submit(
-        start_date,
-        end_date,
+        weekly_dataset,
         f"weekly_report_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}",
     )
     html_report = generate_weekly_report_html(
@@ -51,3 +73,6 @@ def weekly_report():
     )
 
     send_daily_email(email_data)
+    if REPORT_BACKEND != "snapshot":
+        logger.info(f"Database pool: {pool_stats()}")
+    logger.info(f"Dimension cache: {dimension_cache_stats()}")
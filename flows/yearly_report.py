@@ -1,9 +1,13 @@
+from database import REPORT_BACKEND, TASK_CONCURRENCY
+from database.db import pool_stats, warm_pool
+from database.dimensions import dimension_cache_stats
 from prefect import flow
 from prefect.logging import get_run_logger
 from prefect.task_runners import ThreadPoolTaskRunner
 from datetime import date
 from database.models import EmailData
-from tasks.utils import fetch_yearly_data, generate_yearly_excel
+from tasks.durations import fetch_duration_stats
+from tasks.utils import fetch_yearly_dataset, fetch_yearly_data, generate_yearly_excel
 from email_service.email_generator import generate_yearly_report_html
 from email_service.email_sender import send_daily_email
 from flows import RECEIVER_EMAILS
@@ -15,19 +19,32 @@ def generate_yearly_flow_name() -> str:
 
 @flow(
     flow_run_name=generate_yearly_flow_name,
-    task_runner=ThreadPoolTaskRunner(max_workers=4),
+    task_runner=ThreadPoolTaskRunner(max_workers=TASK_CONCURRENCY),
 )
 def yearly_report(target_year: int | None = None):
     logger = get_run_logger()
 
+    if REPORT_BACKEND != "snapshot":
+        try:
+            warm_pool()
+        except Exception as e:
+            logger.error(f"Error while connecting to the database: {e}")
+            exit(1)
+
     if target_year is None:
         target_year = date.today().year
 
-    yearly_data = fetch_yearly_data.submit(target_year)
+    yearly_dataset = fetch_yearly_dataset(target_year)
+    yearly_data = fetch_yearly_data.submit(yearly_dataset)
+    durations = fetch_duration_stats.submit(
+        date(target_year, 1, 1), date(target_year, 12, 31)
+    )
     logger.info("Generating Excel sheets")
     xlsx_filepath = generate_yearly_excel.submit(
+        yearly_dataset,
         target_year,
         f"yearly_report_{target_year}",
+        durations,
     )
 
     html_report = generate_yearly_report_html(yearly_data.result(), target_year)
@@ -40,3 +57,6 @@ def yearly_report(target_year: int | None = None):
     )
 
     send_daily_email(email_data)
+    if REPORT_BACKEND != "snapshot":
+        logger.info(f"Database pool: {pool_stats()}")
+    logger.info(f"Dimension cache: {dimension_cache_stats()}")
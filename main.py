@@ -5,15 +5,19 @@ from flows.weekly_report import weekly_report
 from flows.monthly_report import monthly_report
 from flows.quarterly_report import quarterly_report
 from flows.yearly_report import yearly_report
-from flows.warehousing import refresh_warehouse
+from flows.warehousing import (
+    export_warehouse_snapshot,
+    generate_calendar,
+    maintain_fact_partitions,
+    refresh_warehouse,
+)
+from flows.ingestion import ingest_attendance
+from flows.backfill import backfill_reports
+from flows.period_end_report import period_end_report
 
 
 if __name__ == "__main__":
     monthly_schedule = RRule("FREQ=MONTHLY;BYMONTHDAY=-1;BYHOUR=20;BYMINUTE=0")
-    quarterly_schedule = RRule(
-        "FREQ=YEARLY;BYMONTH=3,6,9,12;BYMONTHDAY=-1;BYHOUR=20;BYMINUTE=0"
-    )
-    yearly_schedule = RRule("FREQ=YEARLY;BYMONTH=12;BYMONTHDAY=-1;BYHOUR=20;BYMINUTE=0")
 
     daily_flow_deploy = daily_report.to_deployment(
         name="daily-report", cron="0 20 * * *"
@@ -21,24 +25,46 @@ if __name__ == "__main__":
     weekly_flow_deploy = weekly_report.to_deployment(
         name="weekly-report", cron="0 20 * * 5"
     )
-    monthly_flow_deploy = monthly_report.to_deployment(
-        name="monthly-report", schedule=monthly_schedule
-    )
-    quarterly_flow_deploy = quarterly_report.to_deployment(
-        name="quarterly-report", schedule=quarterly_schedule
-    )
-    yearly_flow_deploy = yearly_report.to_deployment(
-        name="yearly-report", schedule=yearly_schedule
+    # The monthly, quarterly and yearly reports closing on the same day are
+    # sent by one period end run, from one query. Their own deployments are
+    # kept to run them on demand.
+    period_end_deploy = period_end_report.to_deployment(
+        name="period-end-report", schedule=monthly_schedule
     )
+    monthly_flow_deploy = monthly_report.to_deployment(name="monthly-report")
+    quarterly_flow_deploy = quarterly_report.to_deployment(name="quarterly-report")
+    yearly_flow_deploy = yearly_report.to_deployment(name="yearly-report")
     warehouse_deploy = refresh_warehouse.to_deployment(
         name="warehouse-refresh", cron="0 23 * * *"
     )
+    # Next month's partitions must exist before its first attendance load
+    partitions_deploy = maintain_fact_partitions.to_deployment(
+        name="fact-partitions", cron="0 22 20 * *"
+    )
+    # The day's badge exports must be loaded before the daily report
+    ingestion_deploy = ingest_attendance.to_deployment(
+        name="attendance-ingestion", cron="30 19 * * *"
+    )
+    # Offline report runs read the files, not the database
+    snapshot_deploy = export_warehouse_snapshot.to_deployment(
+        name="warehouse-snapshot", cron="30 23 * * *"
+    )
+    # Run on demand with the year's dates and public holidays
+    calendar_deploy = generate_calendar.to_deployment(name="calendar")
+    # Run on demand to regenerate the reports of a range of dates
+    backfill_deploy = backfill_reports.to_deployment(name="report-backfill")
 
     serve(
         daily_flow_deploy,  # type: ignore
         weekly_flow_deploy,  # type: ignore
+        period_end_deploy,  # type: ignore
         monthly_flow_deploy,  # type: ignore
         quarterly_flow_deploy,  # type: ignore
         yearly_flow_deploy,  # type: ignore
         warehouse_deploy,  # type: ignore
+        partitions_deploy,  # type: ignore
+        ingestion_deploy,  # type: ignore
+        snapshot_deploy,  # type: ignore
+        calendar_deploy,  # type: ignore
+        backfill_deploy,  # type: ignore
     )
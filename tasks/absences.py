@@ -0,0 +1,128 @@
+import time
+from datetime import date
+from typing import List, Sequence
+import numpy as np
+from prefect import task
+from prefect.logging import get_run_logger
+from database import REPORT_BACKEND
+from database.bitsets import presence_bitsets
+from database.db import get_engine
+from database.dimensions import calendar_index, services
+from database.models import Service, ServiceAbsences
+from tasks.matrix import MATRIX_ATTENDANCE, MATRIX_PENDING_DAYS
+from tasks.workbook import ReportWorkbook
+
+# Working days absent in a row from which an absence counts as long
+LONG_ABSENCE_DAYS = 3
+
+
+def service_absences(start_date: date, end_date: date) -> List[ServiceAbsences]:
+    """
+    Absent days and absence runs of the employees of each service from
+    start_date to end_date, within one year, counted on the presence bitsets.
+    The days the matrices have not been refreshed for yet are read from the
+    attendance rows.
+
+    return the services with an absence, ordered by service
+    """
+    bitsets = presence_bitsets(start_date.year)
+    # The snapshot is exported after the warehouse refresh, nothing is pending
+    if REPORT_BACKEND != "snapshot":
+        date_ids = calendar_index().working_day_ids_between(start_date, end_date)
+        with get_engine().connect() as conn:
+            pending_ids = conn.scalars(
+                MATRIX_PENDING_DAYS, {"date_ids": date_ids}
+            ).all()
+            attendance = (
+                conn.execute(MATRIX_ATTENDANCE, {"date_ids": pending_ids}).all()
+                if pending_ids
+                else []
+            )
+        if pending_ids:
+            row_date_ids, employee_ids, present, _ = (
+                zip(*attendance) if attendance else ((),) * 4
+            )
+            bitsets = bitsets.with_days(
+                pending_ids, row_date_ids, employee_ids, present
+            )
+
+    service_ids = np.array(sorted(service.id for service in services()), np.int64)
+    if not len(service_ids):
+        return []
+    absent = np.fromiter(bitsets.absent_days(start_date, end_date).values(), np.int64)
+    longest = np.fromiter(
+        bitsets.longest_absences(start_date, end_date).values(), np.int64
+    )
+
+    # Employees who left dim_employee have no service
+    positions = np.searchsorted(service_ids, bitsets.services).clip(
+        max=len(service_ids) - 1
+    )
+    known = service_ids[positions] == bitsets.services
+    positions, absent, longest = positions[known], absent[known], longest[known]
+
+    def per_service(values: np.ndarray) -> List[int]:
+        return (
+            np.bincount(positions, weights=values, minlength=len(service_ids))
+            .astype(np.int64)
+            .tolist()
+        )
+
+    absent_employees = per_service(absent > 0)
+    absent_days = per_service(absent)
+    long_absences = per_service(longest >= LONG_ABSENCE_DAYS)
+    longest_runs = np.zeros(len(service_ids), np.int64)
+    np.maximum.at(longest_runs, positions, longest)
+
+    return [
+        ServiceAbsences(service_id, *totals)
+        for service_id, *totals in zip(
+            service_ids.tolist(),
+            absent_employees,
+            absent_days,
+            long_absences,
+            longest_runs.tolist(),
+        )
+        if totals[0]
+    ]
+
+
+@task
+def fetch_service_absences(start_date: date, end_date: date) -> List[ServiceAbsences]:
+    logger = get_run_logger()
+
+    start = time.perf_counter()
+    absences = service_absences(start_date, end_date)
+    logger.info(
+        f"Absences of {sum(row.absent_employees for row in absences)} employees "
+        f"counted in {time.perf_counter() - start:.3f}s"
+    )
+    return absences
+
+
+def write_absence_worksheet(
+    workbook: ReportWorkbook,
+    absences: Sequence[ServiceAbsences],
+    report_services: Sequence[Service],
+    title: str,
+) -> None:
+    """
+    Add the absences per employee of a report, summed up per service
+    """
+    names = {service.id: service.name for service in report_services}
+    worksheet = workbook.add_sheet(
+        "Absences longues",
+        f"Absences longues - {title}",
+        [
+            "Service",
+            "Employés absents",
+            "Jours d'absence",
+            f"Absences de {LONG_ABSENCE_DAYS} jours et plus",
+            "Plus longue absence (jours)",
+        ],
+        [24, 16, 16, 24, 24],
+    )
+    workbook.write_rows(
+        worksheet,
+        ((names.get(row.service_id, row.service_id), *row[1:]) for row in absences),
+    )
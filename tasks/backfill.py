@@ -0,0 +1,87 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+from prefect import task
+from prefect.logging import get_run_logger
+from database import RENDER_PROCESSES
+from database.models import ReportDataset
+from tasks.absences import service_absences
+from tasks.durations import duration_stats
+from tasks.utils import (
+    ReportPeriod,
+    generate_monthly_excel,
+    generate_quarterly_excel,
+    generate_weekly_excel,
+    generate_yearly_excel,
+)
+
+
+def render_report(period: ReportPeriod, dataset: ReportDataset) -> str:
+    """
+    Write the workbook of a period under the name its scheduled report uses
+
+    return xlsx file path
+    """
+    kind, start_date, end_date = period
+    if kind == "weekly":
+        return generate_weekly_excel.fn(
+            dataset,
+            f"weekly_report_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}",
+        )
+    if kind == "monthly":
+        month, year = start_date.month, start_date.year
+        return generate_monthly_excel.fn(
+            dataset,
+            month,
+            f"monthly_report_{month}_{year}",
+            duration_stats(start_date, end_date),
+            service_absences(start_date, end_date),
+        )
+    if kind == "quarterly":
+        quarter, year = (start_date.month - 1) // 3 + 1, start_date.year
+        return generate_quarterly_excel.fn(
+            dataset, quarter, f"quarterly_report_Q{quarter}_{year}"
+        )
+    return generate_yearly_excel.fn(
+        dataset,
+        start_date.year,
+        f"yearly_report_{start_date.year}",
+        duration_stats(start_date, end_date),
+    )
+
+
+@task
+def render_reports(datasets: Dict[ReportPeriod, ReportDataset]) -> List[str]:
+    """
+    Write the workbooks in a pool of processes, xlsxwriter is pure Python and
+    holds the GIL
+
+    return xlsx file paths, in period order
+    """
+    logger = get_run_logger()
+
+    start = time.perf_counter()
+    if RENDER_PROCESSES <= 1:
+        # A worker starts by importing the tasks, about 3s: not worth it alone
+        paths = list(map(render_report, datasets, datasets.values()))
+    else:
+        # Spawned, not forked: the flow run's threads may hold locks when forking
+        with ProcessPoolExecutor(
+            max_workers=RENDER_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            paths = list(
+                executor.map(
+                    render_report,
+                    datasets,
+                    datasets.values(),
+                    chunksize=max(len(datasets) // (RENDER_PROCESSES * 4), 1),
+                )
+            )
+
+    logger.info(
+        f"{len(paths)} workbooks written in {time.perf_counter() - start:.2f}s "
+        f"by {RENDER_PROCESSES} processes"
+    )
+    return paths
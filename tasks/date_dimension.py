@@ -0,0 +1,199 @@
+import argparse
+import io
+import time
+from datetime import date
+from functools import reduce
+from typing import Dict, Sequence, Tuple
+import numpy as np
+from prefect import task
+from prefect.logging import disable_run_logger, get_run_logger
+from sqlalchemy import text
+from database.db import get_engine
+from database.dimensions import invalidate_dimensions
+from database.models import DAY_NAMES, MONTH_NAMES
+from tasks.warehousing import CREATE_FACT_PARTITIONS
+
+# Columns of hr_data.dim_date, in table order
+CALENDAR_COLUMNS = [
+    "date_id",
+    "date_literale",
+    "annee",
+    "trimestre",
+    "mois",
+    "nom_mois",
+    "jour",
+    "nom_jour",
+    "jour_semaine",
+    "est_ferie",
+]
+
+CALENDAR_STAGING = text(
+    """
+    CREATE TEMPORARY TABLE dim_date_load
+    (LIKE hr_data.dim_date INCLUDING CONSTRAINTS) ON COMMIT DROP
+    """
+)
+CALENDAR_COPY = f"COPY dim_date_load ({', '.join(CALENDAR_COLUMNS)}) FROM STDIN"
+CALENDAR_INSERT = text(
+    """
+    INSERT INTO hr_data.dim_date
+    SELECT * FROM dim_date_load
+    ON CONFLICT (date_id) DO NOTHING
+    """
+)
+# Days already in the calendar take the holiday list when one is given. The
+# monthly service summary only counts working days, so the months it changes
+# are queued.
+CALENDAR_UPDATE_HOLIDAYS = text(
+    """
+    WITH updated AS (
+        UPDATE hr_data.dim_date dd
+        SET est_ferie = l.est_ferie
+        FROM dim_date_load l
+        WHERE dd.date_id = l.date_id AND dd.est_ferie <> l.est_ferie
+        RETURNING dd.annee, dd.mois
+    )
+    INSERT INTO hr_data.absence_pending_months (target, annee, mois)
+    SELECT DISTINCT 'hr_data.fact_monthly_service_summary', annee, mois
+    FROM updated
+    ON CONFLICT DO NOTHING
+    """
+)
+
+
+def build_calendar(
+    start_date: date, end_date: date, holidays: Sequence[date] = ()
+) -> Dict[str, np.ndarray]:
+    """
+    Every dim_date column for the days from start_date to end_date included
+    """
+    days = np.arange(
+        np.datetime64(start_date, "D"),
+        np.datetime64(end_date, "D") + np.timedelta64(1, "D"),
+    )
+    months_since_epoch = days.astype("datetime64[M]")
+    annee = days.astype("datetime64[Y]").astype(np.int64) + 1970
+    mois = months_since_epoch.astype(np.int64) % 12 + 1
+    jour = (days - months_since_epoch).astype(np.int64) + 1
+    # 1970-01-01 was a Thursday, ISO day 4
+    jour_semaine = (days.astype(np.int64) + 3) % 7 + 1
+
+    return {
+        "date_id": annee * 10000 + mois * 100 + jour,
+        "date_literale": days,
+        "annee": annee,
+        "trimestre": (mois - 1) // 3 + 1,
+        "mois": mois,
+        "nom_mois": np.array(MONTH_NAMES)[mois - 1],
+        "jour": jour,
+        "nom_jour": np.array(DAY_NAMES)[jour_semaine - 1],
+        "jour_semaine": jour_semaine,
+        "est_ferie": np.isin(days, np.array(holidays, dtype="datetime64[D]")),
+    }
+
+
+def validate_calendar(calendar: Dict[str, np.ndarray]) -> None:
+    """
+    The checks of the DateDimension validators, on whole columns
+    """
+    for column, label, low, high in (
+        ("trimestre", "quarter", 1, 4),
+        ("mois", "month", 1, 12),
+        ("jour", "day", 1, 31),
+        ("jour_semaine", "day number", 1, 7),
+    ):
+        invalid = (calendar[column] < low) | (calendar[column] > high)
+        if invalid.any():
+            raise ValueError(f"Invalid {label} value: {calendar[column][invalid][0]}")
+
+    for column, label, names in (
+        ("nom_mois", "month name", MONTH_NAMES),
+        ("nom_jour", "day name", DAY_NAMES),
+    ):
+        invalid = ~np.isin(calendar[column], names)
+        if invalid.any():
+            raise ValueError(f"Invalid {label}: {calendar[column][invalid][0]}")
+
+
+def calendar_copy_buffer(calendar: Dict[str, np.ndarray]) -> io.StringIO:
+    """
+    The calendar in COPY text format, one tab separated line per day
+    """
+    fields = [
+        np.where(calendar[column], "t", "f")
+        if column == "est_ferie"
+        else calendar[column].astype(str)
+        for column in CALENDAR_COLUMNS
+    ]
+    lines = reduce(
+        lambda line, field: np.char.add(np.char.add(line, "\t"), field), fields
+    )
+    return io.StringIO("\n".join(lines) + "\n")
+
+
+@task
+def load_calendar(
+    start_date: date, end_date: date, holidays: Sequence[date] | None = None
+) -> Tuple[int, int]:
+    """
+    Add the days from start_date to end_date to dim_date, and their fact table
+    partitions. Days already loaded keep their holidays, unless a holiday list
+    is given: it then replaces theirs.
+
+    return days added | months queued for the monthly summary
+    """
+    logger = get_run_logger()
+    try:
+        engine = get_engine()
+    except Exception as e:
+        logger.error(f"Error while connecting to the database: {e}")
+        exit(1)
+
+    start = time.perf_counter()
+    calendar = build_calendar(start_date, end_date, holidays or ())
+    validate_calendar(calendar)
+
+    # The temporary table copies the CHECK constraints of dim_date
+    with engine.begin() as conn:
+        conn.execute(CALENDAR_STAGING)
+        with conn.connection.cursor() as cursor:
+            cursor.copy_expert(CALENDAR_COPY, calendar_copy_buffer(calendar))
+        months_queued = (
+            conn.execute(CALENDAR_UPDATE_HOLIDAYS).rowcount
+            if holidays is not None
+            else 0
+        )
+        added = conn.execute(CALENDAR_INSERT).rowcount
+        partitions = conn.execute(CREATE_FACT_PARTITIONS).scalar_one()
+    invalidate_dimensions("hr_data.dim_date")
+
+    logger.info(
+        f"hr_data.dim_date LOADED in {time.perf_counter() - start:.2f}s: "
+        f"{added} days added, {months_queued} months with new holidays, "
+        f"{partitions} partitions created"
+    )
+    return added, months_queued
+
+
+def read_holidays(path: str) -> list[date]:
+    """
+    One YYYY-MM-DD date per line, blank lines and # comments are skipped
+    """
+    with open(path, encoding="utf-8") as holidays:
+        lines = (line.split("#")[0].strip() for line in holidays)
+        return [date.fromisoformat(line) for line in lines if line]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the date dimension")
+    parser.add_argument("start_date", type=date.fromisoformat)
+    parser.add_argument("end_date", type=date.fromisoformat)
+    parser.add_argument("--holidays", help="file of public holidays")
+    args = parser.parse_args()
+
+    holidays = read_holidays(args.holidays) if args.holidays else None
+    with disable_run_logger():
+        added, months_queued = load_calendar.fn(
+            args.start_date, args.end_date, holidays
+        )
+    print(f"{added} days added, {months_queued} months with new holidays")
@@ -0,0 +1,252 @@
+import time
+from datetime import date
+from typing import List, Sequence, Tuple
+import numpy as np
+from prefect import task
+from prefect.logging import get_run_logger
+from sqlalchemy import text
+from database import REPORT_BACKEND
+from database.db import get_engine
+from database.dimensions import calendar_index, services
+from database.matrix import PRESENT, attendance_matrix, day_ordinals
+from database.models import MONTH_NAMES, DurationStats, Service
+from tasks.matrix import MATRIX_PENDING_DAYS
+from tasks.workbook import ReportWorkbook
+
+# Upper bounds of the worked time histogram buckets in hours, the last bucket
+# has none
+DURATION_BUCKETS = (4, 6, 7, 8, 9, 10)
+DURATION_PERCENTILES = (10, 50, 90)
+# A day of work is shorter than a day, so group and duration pack in one key
+SECONDS_PER_DAY = 86400
+
+# Worked time as the attendance matrices hold it
+DURATION_PENDING_ATTENDANCE = text(
+    """
+    SELECT
+        a.date_id,
+        e.service_id,
+        COALESCE(
+            CAST(extract(epoch FROM a.check_out_hour - a.check_in_hour) AS integer), 0
+        )
+    FROM hr_data.fact_daily_attendance a
+    JOIN hr_data.dim_employee e ON e.id = a.id_employee
+    WHERE a.date_id = ANY(:date_ids) AND a.present
+    """
+)
+
+
+def grouped_duration_stats(
+    groups: np.ndarray, seconds: np.ndarray, group_count: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Statistics of the seconds of every group at once, from one in-place sort
+    of the packed group and duration: group boundaries and histogram buckets
+    are then binary searches. Percentiles interpolate like np.percentile.
+
+    return days | mean | percentiles (group x DURATION_PERCENTILES)
+        | histogram (group x bucket)
+    """
+    keys = groups.astype(np.int64) * SECONDS_PER_DAY
+    keys += seconds
+    keys.sort()
+
+    group_starts = np.arange(group_count + 1, dtype=np.int64) * SECONDS_PER_DAY
+    edges = np.searchsorted(keys, group_starts)
+    starts, days = edges[:-1], np.diff(edges)
+
+    bounds = np.array(DURATION_BUCKETS, np.int64) * 3600
+    bucket_edges = np.searchsorted(keys, group_starts[:-1, None] + bounds).reshape(
+        group_count, len(bounds)
+    )
+    histogram = np.diff(np.column_stack([starts, bucket_edges, edges[1:]]), axis=1)
+
+    # Each group is now a sorted slice of durations
+    keys %= SECONDS_PER_DAY
+    totals = np.zeros(group_count)
+    filled = days > 0
+    if filled.any():
+        totals[filled] = np.add.reduceat(keys, starts[filled])
+    mean = totals / np.maximum(days, 1)
+
+    positions = np.outer(np.maximum(days - 1, 0), DURATION_PERCENTILES) / 100
+    percentiles = np.zeros_like(positions)
+    if len(keys):
+        low = np.floor(positions).astype(np.int64)
+        # Empty groups start past the end, their percentiles are not read
+        last = len(keys) - 1
+        lows = keys[(starts[:, None] + low).clip(max=last)]
+        highs = keys[
+            (starts[:, None] + np.ceil(positions).astype(np.int64)).clip(max=last)
+        ]
+        percentiles = lows + (highs - lows) * (positions - low)
+
+    return days, mean, percentiles, histogram
+
+
+def duration_stats(start_date: date, end_date: date) -> List[DurationStats]:
+    """
+    Worked time per service of each month from start_date to end_date, and of
+    the whole range when it spans several months. Read from the attendance
+    matrices, a year of days is a few array operations. The days the matrices
+    have not been refreshed for yet are read from the attendance rows.
+
+    return stats ordered by service, then period
+    """
+    date_ids = np.array(
+        calendar_index().date_ids_between(start_date, end_date), np.int64
+    )
+    months = np.unique(date_ids // 100)
+    periods = [MONTH_NAMES[month % 100 - 1] for month in months.tolist()]
+    if len(months) > 1:
+        periods.append("Total")
+    service_ids = np.array(sorted(service.id for service in services()), np.int64)
+    if not len(service_ids):
+        return []
+    group_count = len(periods) * len(service_ids)
+
+    groups: List[np.ndarray] = []
+    seconds: List[np.ndarray] = []
+
+    def add_days(
+        day_ids: np.ndarray, day_services: np.ndarray, day_seconds: np.ndarray
+    ) -> None:
+        # Employees who left dim_employee have no service
+        positions = np.searchsorted(service_ids, day_services).clip(
+            max=len(service_ids) - 1
+        )
+        known = service_ids[positions] == day_services
+        month_groups = np.searchsorted(months, day_ids[known] // 100)
+        known_seconds = day_seconds[known].astype(np.int64)
+        groups.append(month_groups * len(service_ids) + positions[known])
+        seconds.append(known_seconds)
+        if len(months) > 1:
+            groups.append((len(periods) - 1) * len(service_ids) + positions[known])
+            seconds.append(known_seconds)
+
+    pending_ids = np.zeros(0, np.int64)
+    # The snapshot is exported after the warehouse refresh, nothing is pending
+    if REPORT_BACKEND != "snapshot":
+        with get_engine().connect() as conn:
+            pending_ids = np.array(
+                conn.scalars(
+                    MATRIX_PENDING_DAYS, {"date_ids": date_ids.tolist()}
+                ).all(),
+                np.int64,
+            )
+            attendance = (
+                conn.execute(
+                    DURATION_PENDING_ATTENDANCE, {"date_ids": pending_ids.tolist()}
+                ).all()
+                if len(pending_ids)
+                else []
+            )
+        if attendance:
+            day_ids, day_services, day_seconds = (
+                np.array(column, np.int64) for column in zip(*attendance)
+            )
+            # Days without both badge times count 0s, as in classify_attendance
+            worked = day_seconds > 0
+            add_days(day_ids[worked], day_services[worked], day_seconds[worked])
+    matrix_ids = date_ids[~np.isin(date_ids, pending_ids)]
+
+    for year in np.unique(matrix_ids // 10000).tolist():
+        year_ids = matrix_ids[matrix_ids // 10000 == year]
+        matrix = attendance_matrix(year)
+        days = day_ordinals(year_ids)
+        worked = matrix.worked_seconds[:, days]
+        rows, columns = np.nonzero((matrix.presence[:, days] == PRESENT) & (worked > 0))
+        add_days(year_ids[columns], matrix.services[rows], worked[rows, columns])
+
+    days, mean, percentiles, histogram = grouped_duration_stats(
+        np.concatenate(groups) if groups else np.zeros(0, np.int64),
+        np.concatenate(seconds) if seconds else np.zeros(0, np.int64),
+        group_count,
+    )
+
+    stats = []
+    for service, service_id in enumerate(service_ids.tolist()):
+        for period, name in enumerate(periods):
+            group = period * len(service_ids) + service
+            if days[group]:
+                p10, p50, p90 = percentiles[group].tolist()
+                stats.append(
+                    DurationStats(
+                        service_id,
+                        name,
+                        int(days[group]),
+                        float(mean[group]),
+                        p10,
+                        p50,
+                        p90,
+                        tuple(histogram[group].tolist()),
+                    )
+                )
+    return stats
+
+
+@task
+def fetch_duration_stats(start_date: date, end_date: date) -> List[DurationStats]:
+    logger = get_run_logger()
+
+    start = time.perf_counter()
+    stats = duration_stats(start_date, end_date)
+    logger.info(
+        f"Worked time of {sum(row.days for row in stats if row.period != 'Total')} "
+        f"days summarised in {time.perf_counter() - start:.2f}s"
+    )
+    return stats
+
+
+def bucket_labels() -> List[str]:
+    bounds = [f"{hours}h" for hours in DURATION_BUCKETS]
+    return (
+        [f"< {bounds[0]}"]
+        + [f"{low} - {high}" for low, high in zip(bounds, bounds[1:])]
+        + [f">= {bounds[-1]}"]
+    )
+
+
+def write_duration_worksheet(
+    workbook: ReportWorkbook,
+    stats: Sequence[DurationStats],
+    report_services: Sequence[Service],
+    title: str,
+) -> None:
+    """
+    Add the worked time statistics of a report as its last worksheet
+    """
+    names = {service.id: service.name for service in report_services}
+    worksheet = workbook.add_sheet(
+        "Durées de travail",
+        f"Durées de travail - {title}",
+        [
+            "Service",
+            "Période",
+            "Jours travaillés",
+            "Moyenne",
+            "P10",
+            "Médiane",
+            "P90",
+            *bucket_labels(),
+        ],
+        [24, 12, 16, *[10] * (4 + len(DURATION_BUCKETS) + 1)],
+        # Excel durations are fractions of a day
+        {col: {"num_format": "[h]:mm"} for col in range(3, 7)},
+    )
+    workbook.write_rows(
+        worksheet,
+        (
+            (
+                names.get(row.service_id, row.service_id),
+                row.period,
+                row.days,
+                *(
+                    seconds / SECONDS_PER_DAY
+                    for seconds in (row.mean, row.p10, row.p50, row.p90)
+                ),
+                *row.histogram,
+            )
+            for row in stats
+        ),
+    )
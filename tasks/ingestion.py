@@ -0,0 +1,219 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timezone
+from typing import Tuple
+from prefect import task
+from prefect.logging import get_run_logger
+from sqlalchemy import text
+from database.db import get_engine
+
+# A badge clock export has one row per employee and day, with this header. An
+# absent employee has neither check_in nor check_out, and an absence_type (an
+# id of dim_type_absence) once the absence is known. Dates are YYYY-MM-DD.
+BADGE_COLUMNS = ["matricule", "date", "check_in", "check_out", "absence_type"]
+COPY_BUFFER_SIZE = 1 << 16
+
+STAGING_COPY = f"""
+    COPY hr_data.attendance_staging ({", ".join(BADGE_COLUMNS)})
+    FROM STDIN WITH (FORMAT csv, HEADER MATCH)
+"""
+STAGING_CLEAR = text("DELETE FROM hr_data.attendance_staging")
+
+# Staged rows resolved against the dimensions, with the reason a row is rejected.
+# Values are only cast once they are known to parse. The resolution is the
+# costly part of a load, so it runs once into a table dropped at commit.
+STAGING_RESOLVE = text(
+    """
+    CREATE TEMPORARY TABLE attendance_resolved ON COMMIT DROP AS
+    SELECT
+        s.matricule,
+        s.date,
+        e.id AS id_employee,
+        dd.date_id,
+        t.check_in_hour,
+        t.check_out_hour,
+        ta.id AS id_type_absence,
+        CASE
+            WHEN e.id IS NULL THEN 'unknown matricule'
+            WHEN dd.date_id IS NULL THEN 'unknown date'
+            WHEN s.check_in IS NOT NULL AND t.check_in_hour IS NULL
+                THEN 'invalid check_in'
+            WHEN s.check_out IS NOT NULL AND t.check_out_hour IS NULL
+                THEN 'invalid check_out'
+            WHEN t.check_in_hour IS NULL AND t.check_out_hour IS NOT NULL
+                THEN 'check_out without check_in'
+            WHEN t.check_out_hour < t.check_in_hour THEN 'check_out before check_in'
+            WHEN s.absence_type IS NOT NULL AND ta.id IS NULL
+                THEN 'unknown absence_type'
+            WHEN ta.id IS NOT NULL AND t.check_in_hour IS NOT NULL
+                THEN 'absence_type on a present day'
+            WHEN count(*) OVER (PARTITION BY e.id, dd.date_id) > 1
+                THEN 'duplicate employee and date'
+        END AS error
+    FROM hr_data.attendance_staging s
+    CROSS JOIN LATERAL (
+        SELECT
+            CASE WHEN pg_input_is_valid(s.matricule, 'integer')
+                THEN CAST(s.matricule AS integer) END AS matricule,
+            CASE WHEN s.date ~ '^\\d{4}-\\d{2}-\\d{2}$'
+                AND pg_input_is_valid(s.date, 'date')
+                THEN CAST(s.date AS date) END AS day,
+            CASE WHEN pg_input_is_valid(s.check_in, 'time')
+                THEN CAST(s.check_in AS time) END AS check_in_hour,
+            CASE WHEN pg_input_is_valid(s.check_out, 'time')
+                THEN CAST(s.check_out AS time) END AS check_out_hour,
+            CASE WHEN pg_input_is_valid(s.absence_type, 'integer')
+                THEN CAST(s.absence_type AS integer) END AS absence_type
+    ) t
+    LEFT JOIN hr_data.dim_employee e ON e.matricule = t.matricule
+    LEFT JOIN hr_data.dim_date dd ON dd.date_literale = t.day
+    LEFT JOIN hr_data.dim_type_absence ta ON ta.id = t.absence_type
+    """
+)
+STAGING_VALIDATE = text(
+    """
+    SELECT error, count(*), min(concat_ws(' ', matricule, date))
+    FROM attendance_resolved
+    GROUP BY error
+    """
+)
+
+# Rows that did not change are left alone, so loading a file twice writes
+# nothing and queues nothing for the warehouse refresh
+ATTENDANCE_MERGE = text(
+    """
+    INSERT INTO hr_data.fact_daily_attendance AS a
+        (date_id, id_employee, present, check_in_hour, check_out_hour)
+    SELECT
+        date_id,
+        id_employee,
+        check_in_hour IS NOT NULL,
+        check_in_hour,
+        check_out_hour
+    FROM attendance_resolved
+    WHERE error IS NULL
+    ON CONFLICT (date_id, id_employee) DO UPDATE
+    SET
+        present = EXCLUDED.present,
+        check_in_hour = EXCLUDED.check_in_hour,
+        check_out_hour = EXCLUDED.check_out_hour
+    WHERE (a.present, a.check_in_hour, a.check_out_hour)
+        IS DISTINCT FROM (EXCLUDED.present, EXCLUDED.check_in_hour, EXCLUDED.check_out_hour)
+    """
+)
+ABSENCE_MERGE = text(
+    """
+    INSERT INTO hr_data.fact_absence AS abs
+        (id_employe, id_type_absence, date_absence_id)
+    SELECT id_employee, id_type_absence, date_id
+    FROM attendance_resolved
+    WHERE error IS NULL AND id_type_absence IS NOT NULL
+    ON CONFLICT (id_employe, date_absence_id) DO UPDATE
+    SET id_type_absence = EXCLUDED.id_type_absence
+    WHERE abs.id_type_absence IS DISTINCT FROM EXCLUDED.id_type_absence
+    """
+)
+
+# Registering the file first makes a concurrent load of the same file wait on
+# the checksum, then skip it once the first one commits
+BADGE_FILE_REGISTER = text(
+    """
+    INSERT INTO hr_data.ingested_attendance_files (file_name, checksum, ingested_at)
+    VALUES (:file_name, :checksum, :ingested_at)
+    ON CONFLICT (checksum) DO NOTHING
+    RETURNING id
+    """
+)
+BADGE_FILE_FORGET = text(
+    "DELETE FROM hr_data.ingested_attendance_files WHERE checksum = :checksum"
+)
+BADGE_FILE_RECORD = text(
+    """
+    UPDATE hr_data.ingested_attendance_files
+    SET
+        rows_loaded = :rows_loaded,
+        rows_rejected = :rows_rejected,
+        duration_seconds = :duration_seconds
+    WHERE id = :id
+    """
+)
+
+
+def file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as badge_file:
+        while chunk := badge_file.read(COPY_BUFFER_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@task
+def ingest_badge_file(
+    path: str, reingest: bool = False
+) -> Tuple[int, int, float] | None:
+    """
+    Load a badge clock export into fact_daily_attendance and fact_absence, in
+    one transaction. Files already ingested are skipped unless `reingest`.
+
+    return rows loaded | rows rejected | seconds, None if skipped
+    """
+    logger = get_run_logger()
+    try:
+        engine = get_engine()
+    except Exception as e:
+        logger.error(f"Error while connecting to the database: {e}")
+        exit(1)
+
+    file_name = os.path.basename(path)
+    checksum = file_checksum(path)
+
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        if reingest:
+            conn.execute(BADGE_FILE_FORGET, {"checksum": checksum})
+        file_id = conn.execute(
+            BADGE_FILE_REGISTER,
+            {"file_name": file_name, "checksum": checksum, "ingested_at": started_at},
+        ).scalar_one_or_none()
+        if file_id is None:
+            logger.info(f"{file_name} already ingested, skipping")
+            return None
+
+        with open(path, "rb") as badge_file, conn.connection.cursor() as cursor:
+            cursor.copy_expert(STAGING_COPY, badge_file, size=COPY_BUFFER_SIZE)
+        conn.execute(STAGING_RESOLVE)
+
+        loaded = rejected = 0
+        for error, count, example in conn.execute(STAGING_VALIDATE):
+            if error is None:
+                loaded = count
+            else:
+                rejected += count
+                logger.warning(
+                    f"{file_name}: {count} rows rejected, {error} ({example})"
+                )
+
+        attendance_changed = conn.execute(ATTENDANCE_MERGE).rowcount
+        absences_changed = conn.execute(ABSENCE_MERGE).rowcount
+        conn.execute(STAGING_CLEAR)
+
+        duration = time.perf_counter() - start
+        conn.execute(
+            BADGE_FILE_RECORD,
+            {
+                "id": file_id,
+                "rows_loaded": loaded,
+                "rows_rejected": rejected,
+                "duration_seconds": duration,
+            },
+        )
+
+    logger.info(
+        f"{file_name} INGESTED in {duration:.2f}s "
+        f"({(loaded + rejected) / duration:,.0f} rows/s): {loaded} rows loaded, "
+        f"{rejected} rejected, {attendance_changed} attendance and "
+        f"{absences_changed} absence rows changed"
+    )
+    return loaded, rejected, duration
@@ -0,0 +1,167 @@
+import os
+import time
+from datetime import datetime, timezone
+from typing import Tuple
+import numpy as np
+from prefect import task
+from prefect.logging import get_run_logger
+from sqlalchemy import Connection, text
+from database.db import get_engine
+from database.dimensions import invalidate_dimensions
+from database.matrix import (
+    ABSENT,
+    NO_RECORD,
+    NO_SERVICE,
+    PRESENT,
+    day_ordinals,
+    lookup_file,
+    open_matrix,
+)
+from tasks.warehousing import record_refresh
+
+# Days are queued in hr_data.matrix_pending_dates by triggers on the attendance
+MATRIX_MARK_ALL_PENDING = text(
+    """
+    INSERT INTO hr_data.matrix_pending_dates (date_id)
+    SELECT DISTINCT date_id FROM hr_data.fact_daily_attendance
+    ON CONFLICT DO NOTHING
+    """
+)
+MATRIX_TAKE_PENDING = text("DELETE FROM hr_data.matrix_pending_dates RETURNING date_id")
+# The days of date_ids written since the last refresh, reports read them from
+# the attendance rows
+MATRIX_PENDING_DAYS = text(
+    """
+    SELECT date_id FROM hr_data.matrix_pending_dates
+    WHERE date_id = ANY(:date_ids)
+    """
+)
+MATRIX_EMPLOYEES = text("SELECT id, service_id FROM hr_data.dim_employee ORDER BY id")
+# Worked time as the daily service summary counts it
+MATRIX_ATTENDANCE = text(
+    """
+    SELECT
+        date_id,
+        id_employee,
+        present,
+        CASE WHEN present
+            THEN COALESCE(
+                CAST(extract(epoch FROM check_out_hour - check_in_hour) AS integer), 0
+            )
+            ELSE 0
+        END
+    FROM hr_data.fact_daily_attendance
+    WHERE date_id = ANY(:date_ids)
+    """
+)
+
+
+def _save_lookup(name: str, values: np.ndarray) -> None:
+    # Replaced whole, a reader maps either the old vector or the new one
+    path = lookup_file(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.save(f"{path}.new.npy", values)
+    os.replace(f"{path}.new.npy", path)
+
+
+def _ordinals(employee_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    order = np.argsort(employee_ids)
+    return order[np.searchsorted(employee_ids, ids, sorter=order)]
+
+
+def update_employee_ordinals(conn: Connection) -> np.ndarray:
+    """
+    Append the employees hired since the last refresh and record the current
+    service of every ordinal
+
+    return the employee id of each ordinal
+    """
+    path = lookup_file("employees")
+    known = np.load(path) if os.path.exists(path) else np.zeros(0, np.int64)
+
+    rows = conn.execute(MATRIX_EMPLOYEES).all()
+    ids, service_ids = (
+        (np.array(column) for column in zip(*rows))
+        if rows
+        else (np.zeros(0, np.int64), np.zeros(0, np.int32))
+    )
+    employee_ids = np.concatenate(
+        [known, np.setdiff1d(ids, known, assume_unique=True)]
+    ).astype(np.int64)
+
+    services = np.full(len(employee_ids), NO_SERVICE, np.int32)
+    services[_ordinals(employee_ids, ids)] = service_ids
+    _save_lookup("employees", employee_ids)
+    _save_lookup("services", services)
+    return employee_ids
+
+
+def refresh_matrices(conn: Connection, full_rebuild: bool = False) -> Tuple[int, int]:
+    """
+    Rewrite the matrix columns of every pending day
+
+    return days | employees
+    """
+    if full_rebuild:
+        conn.execute(MATRIX_MARK_ALL_PENDING)
+
+    employee_ids = update_employee_ordinals(conn)
+    date_ids = np.array(conn.execute(MATRIX_TAKE_PENDING).scalars().all(), np.int64)
+    if not len(date_ids):
+        return 0, len(employee_ids)
+
+    rows = conn.execute(MATRIX_ATTENDANCE, {"date_ids": date_ids.tolist()}).all()
+    attendance_date_ids, ids, present, worked_seconds = (
+        (np.array(column) for column in zip(*rows))
+        if rows
+        else (np.zeros(0, np.int64),) * 4
+    )
+    attendance_years = attendance_date_ids // 10000
+    attendance_employees = _ordinals(employee_ids, ids)
+    attendance_days = day_ordinals(attendance_date_ids)
+
+    for year in np.unique(date_ids // 10000).tolist():
+        presence = open_matrix(year, "presence", len(employee_ids))
+        worked = open_matrix(year, "worked_seconds", len(employee_ids))
+
+        # Days emptied since the last refresh have no rows left to write
+        days = day_ordinals(date_ids[date_ids // 10000 == year])
+        presence[:, days] = NO_RECORD
+        worked[:, days] = 0
+
+        of_year = attendance_years == year
+        cells = attendance_employees[of_year], attendance_days[of_year]
+        presence[cells] = np.where(present[of_year], PRESENT, ABSENT)
+        worked[cells] = worked_seconds[of_year]
+        presence.flush()
+        worked.flush()
+
+    return len(date_ids), len(employee_ids)
+
+
+@task
+def refresh_attendance_matrix(full_rebuild: bool = False):
+    logger = get_run_logger()
+    try:
+        engine = get_engine()
+    except Exception as e:
+        logger.error(f"Error while connecting to the database: {e}")
+        exit(1)
+
+    logger.info("Refreshing the attendance matrices...")
+
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    # The days are only dequeued once their columns are written
+    with engine.begin() as conn:
+        days, employees = refresh_matrices(conn, full_rebuild)
+        duration = time.perf_counter() - start
+        record_refresh(conn, "attendance_matrix", started_at, duration)
+    # The presence bitsets of this process are packed from the matrices
+    invalidate_dimensions("attendance_matrix")
+
+    logger.info(
+        f"Attendance matrices REFRESHED in {duration:.2f}s "
+        f"({days} days, {employees} employees)"
+    )
+    return duration
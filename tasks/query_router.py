@@ -0,0 +1,252 @@
+from typing import Callable, List, NamedTuple, Sequence, Tuple
+from sqlalchemy import (
+    ColumnElement,
+    Integer,
+    Select,
+    Subquery,
+    and_,
+    column,
+    exists,
+    func,
+    select,
+    table,
+    tuple_,
+    union_all,
+)
+from sqlalchemy.orm import Session
+from database.models import (
+    DailyAttendance,
+    DailyHeadcount,
+    DailyServiceSummary,
+    DateDimension,
+    DimEmployee,
+    MonthlyServiceSummary,
+    WarehouseRefreshLog,
+)
+
+# First and last date_id of a report period. Every source restricts its own
+# date column with them, so fact tables are pruned and read through their index.
+Period = Tuple[int, int]
+
+RAW_FACTS = "hr_data.fact_daily_attendance"
+DAILY_SUMMARY = "hr_data.fact_daily_service_summary"
+MONTHLY_SUMMARY = "hr_data.fact_monthly_service_summary"
+
+# Working days only: weekdays that are not public holidays
+WORKING_DAYS = (~DateDimension.est_ferie, DateDimension.jour_semaine.not_in([6, 7]))
+
+# Queues drained by the warehouse refresh, see tasks/warehousing.py
+summary_pending_dates = table(
+    "summary_pending_dates", column("date_id"), schema="hr_data"
+)
+absence_pending_months = table(
+    "absence_pending_months",
+    column("target"),
+    column("annee"),
+    column("mois"),
+    schema="hr_data",
+)
+
+
+class ReportSource(NamedTuple):
+    name: str
+    is_fresh: Callable[[Session, Period], bool]
+    statement: Callable[[Period], Select]
+
+
+def _was_refreshed(session: Session, target: str) -> bool:
+    return session.execute(
+        select(exists().where(WarehouseRefreshLog.target == target))
+    ).scalar_one()
+
+
+def _months_between(
+    annee: ColumnElement[int], mois: ColumnElement[int], period: Period
+) -> ColumnElement[bool]:
+    first, last = (divmod(date_id // 100, 100) for date_id in period)
+    return and_(tuple_(annee, mois) >= first, tuple_(annee, mois) <= last)
+
+
+def _has_pending_days(session: Session, period: Period) -> bool:
+    return session.execute(
+        select(exists().where(summary_pending_dates.c.date_id.between(*period)))
+    ).scalar_one()
+
+
+def _has_pending_months(session: Session, target: str, period: Period) -> bool:
+    return session.execute(
+        select(
+            exists().where(
+                absence_pending_months.c.target == target,
+                _months_between(
+                    absence_pending_months.c.annee,
+                    absence_pending_months.c.mois,
+                    period,
+                ),
+            )
+        )
+    ).scalar_one()
+
+
+def _daily_summary_is_fresh(session: Session, period: Period) -> bool:
+    return _was_refreshed(session, DAILY_SUMMARY) and not _has_pending_days(
+        session, period
+    )
+
+
+def _monthly_summary_is_fresh(session: Session, period: Period) -> bool:
+    return (
+        _was_refreshed(session, MONTHLY_SUMMARY)
+        and _daily_summary_is_fresh(session, period)
+        and not _has_pending_months(session, MONTHLY_SUMMARY, period)
+    )
+
+
+def _monthly_summary_stmt(period: Period) -> Select:
+    return (
+        select(
+            MonthlyServiceSummary.service_id,
+            DateDimension.mois,
+            DateDimension.nom_mois,
+            MonthlyServiceSummary.absence_count.label("absence"),
+            MonthlyServiceSummary.headcount.label("employee_count"),
+        )
+        .join(
+            DateDimension,
+            and_(
+                DateDimension.annee == MonthlyServiceSummary.annee,
+                DateDimension.mois == MonthlyServiceSummary.mois,
+                DateDimension.jour == 1,
+            ),
+        )
+        .where(
+            _months_between(
+                MonthlyServiceSummary.annee, MonthlyServiceSummary.mois, period
+            )
+        )
+        .order_by(MonthlyServiceSummary.service_id, DateDimension.mois)
+    )
+
+
+def _daily_summary_stmt(period: Period) -> Select:
+    return (
+        select(
+            DailyServiceSummary.service_id,
+            DateDimension.mois,
+            DateDimension.nom_mois,
+            func.sum(DailyServiceSummary.absence_count).cast(Integer).label("absence"),
+            func.sum(DailyServiceSummary.headcount)
+            .cast(Integer)
+            .label("employee_count"),
+        )
+        .join(DateDimension, DateDimension.date_id == DailyServiceSummary.date_id)
+        .where(DailyServiceSummary.date_id.between(*period), *WORKING_DAYS)
+        .group_by(
+            DailyServiceSummary.service_id, DateDimension.mois, DateDimension.nom_mois
+        )
+        .order_by(DailyServiceSummary.service_id, DateDimension.mois)
+    )
+
+
+def _raw_facts_stmt(period: Period) -> Select:
+    # Same figures as the daily summary, computed from the attendance rows
+    daily = (
+        select(
+            DimEmployee.service_id,
+            DateDimension.mois,
+            DateDimension.nom_mois,
+            func.count().filter(~DailyAttendance.present).label("absence"),
+            func.coalesce(func.max(DailyHeadcount.headcount), 0).label("headcount"),
+        )
+        .join(DateDimension, DateDimension.date_id == DailyAttendance.date_id)
+        .join(DimEmployee, DimEmployee.id == DailyAttendance.id_employee)
+        .outerjoin(
+            DailyHeadcount,
+            and_(
+                DailyHeadcount.date_id == DailyAttendance.date_id,
+                DailyHeadcount.service_id == DimEmployee.service_id,
+                # The planner does not carry the range over the join
+                DailyHeadcount.date_id.between(*period),
+            ),
+        )
+        .where(DailyAttendance.date_id.between(*period), *WORKING_DAYS)
+        .group_by(
+            DailyAttendance.date_id,
+            DimEmployee.service_id,
+            DateDimension.mois,
+            DateDimension.nom_mois,
+        )
+        .subquery()
+    )
+
+    return (
+        select(
+            daily.c.service_id,
+            daily.c.mois,
+            daily.c.nom_mois,
+            func.sum(daily.c.absence).cast(Integer).label("absence"),
+            func.sum(daily.c.headcount).cast(Integer).label("employee_count"),
+        )
+        .group_by(daily.c.service_id, daily.c.mois, daily.c.nom_mois)
+        .order_by(daily.c.service_id, daily.c.mois)
+    )
+
+
+def daily_totals(date_ids: Sequence[int]) -> Subquery:
+    """
+    The daily service summary rows of date_ids. The days still pending are
+    computed from the attendance rows as the summary refresh would, so reports
+    never wait for the warehouse refresh.
+
+    return service_id | date_id | absence_count | headcount
+    """
+    summarised = select(
+        DailyServiceSummary.service_id,
+        DailyServiceSummary.date_id,
+        DailyServiceSummary.absence_count,
+        DailyServiceSummary.headcount,
+    ).where(
+        DailyServiceSummary.date_id.in_(date_ids),
+        ~exists().where(summary_pending_dates.c.date_id == DailyServiceSummary.date_id),
+    )
+    pending = (
+        select(
+            DimEmployee.service_id,
+            DailyAttendance.date_id,
+            func.count().filter(~DailyAttendance.present).label("absence_count"),
+            func.coalesce(func.max(DailyHeadcount.headcount), 0).label("headcount"),
+        )
+        .join(DimEmployee, DimEmployee.id == DailyAttendance.id_employee)
+        .outerjoin(
+            DailyHeadcount,
+            and_(
+                DailyHeadcount.date_id == DailyAttendance.date_id,
+                DailyHeadcount.service_id == DimEmployee.service_id,
+            ),
+        )
+        .where(
+            DailyAttendance.date_id.in_(date_ids),
+            exists().where(summary_pending_dates.c.date_id == DailyAttendance.date_id),
+        )
+        .group_by(DimEmployee.service_id, DailyAttendance.date_id)
+    )
+    return union_all(summarised, pending).subquery("daily_totals")
+
+
+# Coarsest first: one monthly row stands for about twenty daily summary rows,
+# which each stand for one attendance row per employee of the service
+MONTHLY_SOURCES: List[ReportSource] = [
+    ReportSource(MONTHLY_SUMMARY, _monthly_summary_is_fresh, _monthly_summary_stmt),
+    ReportSource(DAILY_SUMMARY, _daily_summary_is_fresh, _daily_summary_stmt),
+]
+
+
+def plan_monthly_query(session: Session, period: Period) -> Tuple[str, Select]:
+    """
+    return source name | statement for the working day totals of every service and month of the period
+    """
+    for source in MONTHLY_SOURCES:
+        if source.is_fresh(session, period):
+            return source.name, source.statement(period)
+
+    return RAW_FACTS, _raw_facts_stmt(period)
@@ -0,0 +1,194 @@
+import io
+import os
+import shutil
+import time
+from typing import Any, List, Sequence, Tuple
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from prefect import task
+from prefect.logging import get_run_logger
+from sqlalchemy import Connection, text
+from database import SNAPSHOT_DIR
+from database.db import get_engine
+from database.snapshot import (
+    SNAPSHOT_COMPRESSION,
+    SNAPSHOT_DIMENSIONS,
+    SNAPSHOT_FACTS,
+    dimension_file,
+    month_file,
+    read_dimension,
+    read_fact_months,
+    table_schema,
+)
+
+SNAPSHOT_MONTHS = text("SELECT DISTINCT date_id / 100 FROM hr_data.dim_date ORDER BY 1")
+
+
+def _copy_to_arrow(conn: Connection, table: str, where: str = "") -> pa.Table:
+    """
+    COPY a table out of Postgres in CSV, parsed with the schema of its model
+    """
+    schema = table_schema(table)
+    buffer = io.BytesIO()
+    with conn.connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY (SELECT {', '.join(schema.names)} FROM hr_data.{table} {where}) "
+            "TO STDOUT WITH (FORMAT csv, HEADER)",
+            buffer,
+        )
+    buffer.seek(0)
+
+    # COPY writes NULL unquoted and empty strings quoted
+    return pa_csv.read_csv(
+        buffer,
+        convert_options=pa_csv.ConvertOptions(
+            column_types=schema,
+            true_values=["t"],
+            false_values=["f"],
+            null_values=[""],
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False,
+        ),
+    ).cast(schema)
+
+
+def _write(table: pa.Table, path: str) -> int:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(table, path, compression=SNAPSHOT_COMPRESSION)
+    return os.path.getsize(path)
+
+
+@task
+def export_snapshot() -> Tuple[int, int]:
+    """
+    Write the dimensions and the facts, one file per month, from one consistent
+    read of the database. The previous snapshot is replaced once the new one is
+    complete.
+
+    return rows written | bytes written
+    """
+    logger = get_run_logger()
+    try:
+        engine = get_engine()
+    except Exception as e:
+        logger.error(f"Error while connecting to the database: {e}")
+        exit(1)
+
+    start = time.perf_counter()
+    staging = f"{SNAPSHOT_DIR}.new"
+    shutil.rmtree(staging, ignore_errors=True)
+    rows = size = 0
+
+    # Every COPY reads the same snapshot of the database
+    with (
+        engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn,
+        conn.begin(),
+    ):
+        for table in SNAPSHOT_DIMENSIONS:
+            data = _copy_to_arrow(conn, table)
+            size += _write(data, dimension_file(table, staging))
+            rows += data.num_rows
+
+        months = conn.execute(SNAPSHOT_MONTHS).scalars().all()
+        for table, date_column in SNAPSHOT_FACTS.items():
+            table_rows = 0
+            for month in months:
+                data = _copy_to_arrow(
+                    conn,
+                    table,
+                    f"WHERE {date_column} >= {month * 100} "
+                    f"AND {date_column} < {(month + 1) * 100}",
+                )
+                if data.num_rows:
+                    size += _write(data, month_file(table, month, staging))
+                    table_rows += data.num_rows
+            logger.info(f"hr_data.{table}: {table_rows} rows exported")
+            rows += table_rows
+
+    previous = f"{SNAPSHOT_DIR}.old"
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(SNAPSHOT_DIR):
+        os.rename(SNAPSHOT_DIR, previous)
+    os.rename(staging, SNAPSHOT_DIR)
+    shutil.rmtree(previous, ignore_errors=True)
+
+    logger.info(
+        f"Snapshot EXPORTED to {SNAPSHOT_DIR} in {time.perf_counter() - start:.2f}s: "
+        f"{rows} rows, {size / 2**20:.1f} MiB"
+    )
+    return rows, size
+
+
+def multi_grain_rows(
+    day_ids: Sequence[int], month_day_ids: Sequence[int]
+) -> List[Tuple[Any, ...]]:
+    """
+    The rows of multi_grain_stmt, computed from the snapshot: the daily service
+    summary is rebuilt from the attendance and headcount of the days asked for
+
+    return service id | is month grain | date id or YYYYMM | absence count | total employees
+    """
+    date_ids = pa.array(sorted({*day_ids, *month_day_ids}), pa.int32())
+    months = {date_id // 100 for date_id in date_ids.to_pylist()}
+
+    attendance = read_fact_months(
+        "fact_daily_attendance", months, ["date_id", "id_employee", "present"]
+    )
+    attendance = attendance.filter(pc.is_in(attendance["date_id"], date_ids))
+    employees = read_dimension("dim_employee", ["id", "service_id"])
+    headcounts = read_fact_months(
+        "fact_daily_headcount", months, ["date_id", "service_id", "headcount"]
+    )
+
+    daily = (
+        pa.table(
+            {
+                "date_id": attendance["date_id"],
+                "service_id": pc.take(
+                    employees["service_id"],
+                    pc.index_in(attendance["id_employee"], employees["id"]),
+                ),
+                "absence": pc.cast(pc.invert(attendance["present"]), pa.int32()),
+            }
+        )
+        .group_by(["date_id", "service_id"])
+        .aggregate([("absence", "sum")])
+        .join(headcounts, ["date_id", "service_id"], join_type="left outer")
+    )
+    daily = daily.set_column(
+        daily.schema.get_field_index("headcount"),
+        "headcount",
+        pc.fill_null(daily["headcount"], 0),
+    )
+
+    days = daily.filter(pc.is_in(daily["date_id"], pa.array(day_ids, pa.int32())))
+    month_days = daily.filter(
+        pc.is_in(daily["date_id"], pa.array(month_day_ids, pa.int32()))
+    )
+    # Integer division: YYYYMM
+    monthly = (
+        month_days.append_column("month", pc.divide(month_days["date_id"], 100))
+        .group_by(["service_id", "month"])
+        .aggregate([("absence_sum", "sum"), ("headcount", "sum")])
+    )
+
+    rows = [
+        (service_id, False, date_id, absence, headcount)
+        for service_id, date_id, absence, headcount in zip(
+            days["service_id"].to_pylist(),
+            days["date_id"].to_pylist(),
+            days["absence_sum"].to_pylist(),
+            days["headcount"].to_pylist(),
+        )
+    ] + [
+        (service_id, True, month, absence, headcount)
+        for service_id, month, absence, headcount in zip(
+            monthly["service_id"].to_pylist(),
+            monthly["month"].to_pylist(),
+            monthly["absence_sum_sum"].to_pylist(),
+            monthly["headcount_sum"].to_pylist(),
+        )
+    ]
+    return sorted(rows, key=lambda row: (row[0], row[2]))
@@ -1,79 +1,145 @@
 import csv
+from contextlib import contextmanager
+from dataclasses import replace
+from collections import defaultdict
 from datetime import timedelta, date
+from decimal import ROUND_HALF_UP, Decimal
 import os
-from typing import Any, List, Tuple, Sequence
-from sqlalchemy import Integer, Row, select, func
-from sqlalchemy.orm import Session, joinedload
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Sequence
+import numpy as np
+from sqlalchemy import (
+    ColumnElement,
+    Engine,
+    Integer,
+    Row,
+    Select,
+    case,
+    func,
+    select,
+    tuple_,
+)
+from sqlalchemy.orm import Session
 from database.models import (
+    DAY_NAMES,
+    MONTH_NAMES,
     DateDimension,
     DimEmployee,
     DailyAttendance,
-    DimService,
+    DailyHeadcount,
+    DurationStats,
+    AttendanceClassification,
+    EmployeeAttendance,
+    ReportDataset,
+    ServiceAbsences,
 )
 from prefect import task
 from prefect.logging import get_run_logger
+from database import REPORT_BACKEND
 from database.db import get_engine
-import xlsxwriter
+from database.dimensions import CalendarIndex, calendar_index, services
+from tasks.absences import write_absence_worksheet
+from tasks.durations import write_duration_worksheet
+from tasks.query_router import Period, daily_totals, plan_monthly_query
+from tasks.workbook import DATE_FORMAT, ReportWorkbook, sheet_name
+from tasks.snapshot import multi_grain_rows
 
+# Rows fetched per round trip when streaming from a server-side cursor
+STREAM_BATCH_SIZE = 5000
 
-@task
-def fetch_employees_per_date(
-    target_date_id: int,
-) -> Sequence[Row[Tuple[DimEmployee, DailyAttendance, Any]]] | None:
-    logger = get_run_logger()
-    try:
-        engine = get_engine()
-    except Exception as e:
-        logger.error(f"Error while connecting to the database: {e}")
-        exit(1)
 
+def employees_per_date_stmt(target_date_id: int) -> Select:
     work_duration = DailyAttendance.check_out_hour - DailyAttendance.check_in_hour
 
-    stmt = (
-        select(DimEmployee, DailyAttendance, work_duration)
+    # Only the columns read downstream: no ORM entities, no identity map
+    return (
+        select(
+            DimEmployee.matricule,
+            DimEmployee.first_name,
+            DimEmployee.last_name,
+            DailyAttendance.present,
+            func.extract("epoch", work_duration).cast(Integer).label("work_seconds"),
+        )
         .join(DailyAttendance, DimEmployee.id == DailyAttendance.id_employee)
         .join(DateDimension, DailyAttendance.date_id == DateDimension.date_id)
         .where(~DateDimension.est_ferie)  # Not holiday
         .where(DateDimension.date_id == target_date_id)
-        .options(joinedload(DailyAttendance.date_table))
     )
 
-    with Session(engine) as session:
-        employees = session.execute(stmt).all()
 
-    return employees
+def stream_employees_per_date(
+    engine: Engine, target_date_id: int, batch_size: int = STREAM_BATCH_SIZE
+) -> Iterator[List[EmployeeAttendance]]:
+    """
+    Yield the rows of fetch_employees_per_date in batches read from a
+    server-side cursor
+    """
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(
+            employees_per_date_stmt(target_date_id)
+        )
+        for partition in result.partitions():
+            yield [EmployeeAttendance._make(row) for row in partition]
 
 
 @task
-def fetch_absent_employees(
-    employees_data: Sequence[Row[Tuple[DimEmployee, DailyAttendance, Any]]],
-) -> List[DimEmployee]:
-    absent_employees = []
+def fetch_employees_per_date(target_date_id: int) -> List[EmployeeAttendance] | None:
+    """
+    return matricule | first name | last name | present | worked seconds
+    """
+    logger = get_run_logger()
+    try:
+        engine = get_engine()
+    except Exception as e:
+        logger.error(f"Error while connecting to the database: {e}")
+        exit(1)
 
-    for e, d, _ in employees_data:
-        # 3rd (2nd index) column is 'present'
-        if not d.present:
-            absent_employees.append(e)
-    return absent_employees
+    with engine.connect() as conn:
+        employees = [
+            EmployeeAttendance._make(row)
+            for row in conn.execute(employees_per_date_stmt(target_date_id))
+        ]
+
+    return employees
 
 
 @task
-def fetch_employees_under_working(
-    employees_data: Sequence[Row[Tuple[DimEmployee, DailyAttendance, Any]]],
-    under_work_threshold: float,
-) -> List[Tuple[DimEmployee, Any]]:
-    under_work_hours_timedelta = timedelta(hours=under_work_threshold)
-    filtered_employees = []
+def classify_attendance(
+    employees_data: Sequence[EmployeeAttendance],
+    under_work_thresholds: Sequence[float],
+) -> AttendanceClassification:
+    """
+    Bucket every row against all the thresholds (in hours) in a single pass.
+    A row belongs to every threshold its worked time is strictly under.
+    """
+    row_count = len(employees_data)
+    present = np.fromiter((e.present for e in employees_data), bool, row_count)
+    seconds = np.fromiter(
+        (e.work_seconds or 0 for e in employees_data), np.int64, row_count
+    )
+
+    thresholds = sorted(set(under_work_thresholds))
+    bounds = np.array([int(t * 3600) for t in thresholds], dtype=np.int64)
+    # Index of the smallest threshold the row is under, len(bounds) if none
+    rank = np.searchsorted(bounds, seconds, side="right")
+    rank[seconds == 0] = len(bounds)  # No recorded work duration
 
-    for emp, _, dur in employees_data:
-        if dur and dur < under_work_hours_timedelta:
-            filtered_employees.append((emp, dur))
+    under_thresholds = {
+        threshold: [
+            (employees_data[i], timedelta(seconds=int(seconds[i])))
+            for i in np.flatnonzero(rank <= k)
+        ]
+        for k, threshold in enumerate(thresholds)
+    }
+    absent = [employees_data[i] for i in np.flatnonzero(~present)]
 
-    return filtered_employees
+    return AttendanceClassification(absent=absent, under_thresholds=under_thresholds)
 
 
 @task
-def total_employee_count() -> int:
+def total_employee_count(target_date_id: int) -> int:
+    """
+    return employees on staff on the target date, from fact_daily_headcount
+    """
     logger = get_run_logger()
     try:
         engine = get_engine()
@@ -83,20 +149,60 @@ def total_employee_count() -> int:
 
     with Session(engine) as session:
         employee_count = session.execute(
-            select(func.count()).select_from(DimEmployee)
+            select(func.coalesce(func.sum(DailyHeadcount.headcount), 0)).where(
+                DailyHeadcount.date_id == target_date_id
+            )
         ).scalar_one()
 
     return employee_count
 
 
-@task
-def fetch_weekly_data(
-    start_date: date, end_date: date
-) -> Sequence[Row[Tuple[date, str, bool, int, int, Any]]]:
+def absence_percentage(absence: int, employee_count: int) -> Decimal:
+    if not employee_count:
+        return Decimal("0.00")
+    return (Decimal(absence * 100) / employee_count).quantize(
+        Decimal("0.01"), rounding=ROUND_HALF_UP
+    )
+
+
+def company_table(dataset: ReportDataset) -> List[Tuple[Any, ...]]:
     """
-    return date | day name | is holiday | absence count | total employees | absence percentage
+    Sum the service rows of a dataset per period
+
+    return *period | absence count | total employees | absence percentage
+    """
+    totals: Dict[Tuple[Any, ...], List[int]] = {}
+    for _, *period, absence, employee_count in dataset.rows:
+        total = totals.setdefault(tuple(period), [0, 0])
+        total[0] += absence
+        total[1] += employee_count
+
+    return [
+        (*period, absence, employee_count, absence_percentage(absence, employee_count))
+        for period, (absence, employee_count) in sorted(totals.items())
+    ]
+
+
+def service_tables(dataset: ReportDataset) -> Dict[int, List[Tuple[Any, ...]]]:
+    """
+    Split the rows of a dataset into one table per service
+
+    return *period | absence count | total employees | absence percentage
     """
+    tables: Dict[int, List[Tuple[Any, ...]]] = defaultdict(list)
+    for service_id, *period, absence, employee_count in dataset.rows:
+        tables[service_id].append(
+            (
+                *period,
+                absence,
+                employee_count,
+                absence_percentage(absence, employee_count),
+            )
+        )
+    return tables
+
 
+def _fetch_dataset(stmt: Select) -> ReportDataset:
     logger = get_run_logger()
     try:
         engine = get_engine()
@@ -104,43 +210,13 @@ def fetch_weekly_data(
         logger.error(f"Error while connecting to the database: {e}")
         exit(1)
 
-    stmt = (
-        select(
-            DateDimension.date_literale,
-            DateDimension.nom_jour,
-            DateDimension.est_ferie,
-            func.sum((~DailyAttendance.present).cast(Integer)).label("absence"),
-            func.count(DimEmployee.id).label("employee_count"),
-            (
-                func.round(
-                    func.sum((~DailyAttendance.present).cast(Integer))
-                    * 100.0
-                    / func.count(DimEmployee.id),
-                    2,
-                )
-            ).label("absence_percentage"),
-        )
-        .join(DailyAttendance, DateDimension.date_id == DailyAttendance.date_id)
-        .join(DimEmployee, DimEmployee.id == DailyAttendance.id_employee)
-        .where(DateDimension.date_literale.between(start_date, end_date))
-        .group_by(
-            DateDimension.date_literale,
-            DateDimension.nom_jour,
-            DateDimension.est_ferie,
-        )
-        .order_by(DateDimension.date_literale.asc())
-    )
-
     with Session(engine) as session:
-        employees = session.execute(stmt).all()
+        rows = session.execute(stmt).all()
 
-    return employees
+    return ReportDataset(services=services(), rows=rows)
 
 
-@task
-def fetch_monthly_data(
-    target_month: int, target_year: int
-) -> Sequence[Row[Tuple[DateDimension, int, Any]]]:
+def _fetch_routed_dataset(period: Period) -> ReportDataset:
     logger = get_run_logger()
     try:
         engine = get_engine()
@@ -148,116 +224,381 @@ def fetch_monthly_data(
         logger.error(f"Error while connecting to the database: {e}")
         exit(1)
 
-    stmt = (
+    with Session(engine) as session:
+        source, stmt = plan_monthly_query(session, period)
+        logger.info(f"Reading monthly totals from {source}")
+        rows = session.execute(stmt).all()
+
+    return ReportDataset(services=services(), rows=rows)
+
+
+def daily_totals_stmt(date_ids: Sequence[int]) -> Select:
+    """
+    return service id | date id | absence count | total employees
+    """
+    daily = daily_totals(date_ids)
+    return (
         select(
-            DateDimension,
-            func.sum((~DailyAttendance.present).cast(Integer)).label("absence"),
+            daily.c.service_id,
+            daily.c.date_id,
+            func.sum(daily.c.absence_count).cast(Integer).label("absence"),
+            func.sum(daily.c.headcount).cast(Integer).label("employee_count"),
+        )
+        .group_by(daily.c.service_id, daily.c.date_id)
+        .order_by(daily.c.service_id, daily.c.date_id)
+    )
+
+
+def _dated_rows(
+    calendar: CalendarIndex, rows: Sequence[Row], with_holidays: bool
+) -> List[Tuple[Any, ...]]:
+    """
+    Replace the date id of daily totals by date | day name [| is holiday]
+    """
+    dated = []
+    for service_id, date_id, absence, employee_count in rows:
+        day = calendar.day(date_id)
+        holiday = (calendar.is_holiday(day),) if with_holidays else ()
+        dated.append(
             (
-                func.round(
-                    func.sum((~DailyAttendance.present).cast(Integer))
-                    * 100.0
-                    / func.count(DimEmployee.id),
-                    2,
-                )
-            ).label("absence_percentage"),
+                service_id,
+                day,
+                DAY_NAMES[day.weekday()],
+                *holiday,
+                absence,
+                employee_count,
+            )
         )
-        .join(DailyAttendance, DateDimension.date_id == DailyAttendance.date_id)
-        .join(DimEmployee, DimEmployee.id == DailyAttendance.id_employee)
-        .group_by(DateDimension.date_id)
-        .where(DateDimension.mois == target_month)
-        .where(DateDimension.annee == target_year)
-        .where(DateDimension.jour_semaine.not_in([6, 7]))
-        .order_by(DateDimension.date_id)
+    return dated
+
+
+# The days of a week or month come from the calendar index, so the daily
+# totals are read by date_id without joining dim_date
+def weekly_dataset_stmt(
+    calendar: CalendarIndex, start_date: date, end_date: date
+) -> Select:
+    return daily_totals_stmt(calendar.date_ids_between(start_date, end_date))
+
+
+def weekly_rows(calendar: CalendarIndex, rows: Sequence[Row]) -> List[Tuple[Any, ...]]:
+    return _dated_rows(calendar, rows, with_holidays=True)
+
+
+@task
+def fetch_weekly_dataset(start_date: date, end_date: date) -> ReportDataset:
+    """
+    return service id | date | day name | is holiday | absence count | total employees
+    """
+    shared = _prefetched_dataset(("weekly", start_date, end_date))
+    if shared is not None:
+        return shared
+
+    calendar = calendar_index()
+    dataset = _fetch_dataset(weekly_dataset_stmt(calendar, start_date, end_date))
+    return replace(dataset, rows=weekly_rows(calendar, dataset.rows))
+
+
+def month_period(target_month: int, target_year: int) -> Tuple[date, date]:
+    first_day = date(target_year, target_month, 1)
+    next_month = (first_day + timedelta(days=31)).replace(day=1)
+    return first_day, next_month - timedelta(days=1)
+
+
+def monthly_dataset_stmt(
+    calendar: CalendarIndex, target_month: int, target_year: int
+) -> Select:
+    # Weekdays only, holidays included
+    return daily_totals_stmt(
+        calendar.weekday_ids_between(*month_period(target_month, target_year))
     )
 
-    with Session(engine) as session:
-        return session.execute(stmt).all()
+
+def monthly_rows(calendar: CalendarIndex, rows: Sequence[Row]) -> List[Tuple[Any, ...]]:
+    return _dated_rows(calendar, rows, with_holidays=False)
 
 
 @task
-def fetch_quarterly_data(
-    target_quarter: int, target_year: int
-) -> Sequence[Row[Tuple[int, str, int, Any]]]:
-    logger = get_run_logger()
-    try:
-        engine = get_engine()
-    except Exception as e:
-        logger.error(f"Error while connecting to the database: {e}")
-        exit(1)
+def fetch_monthly_dataset(target_month: int, target_year: int) -> ReportDataset:
+    """
+    return service id | date | day name | absence count | total employees
+    """
+    shared = _prefetched_dataset(("monthly", *month_period(target_month, target_year)))
+    if shared is not None:
+        return shared
 
-    stmt = (
-        select(
-            DateDimension.mois,
-            DateDimension.nom_mois,
-            func.sum((~DailyAttendance.present).cast(Integer)).label("absence"),
-            (
-                func.round(
-                    func.sum((~DailyAttendance.present).cast(Integer))
-                    * 100.0
-                    / func.count(DimEmployee.id),
-                    2,
-                )
-            ).label("absence_percentage"),
-        )
-        .join(DailyAttendance, DateDimension.date_id == DailyAttendance.date_id)
-        .join(DimEmployee, DimEmployee.id == DailyAttendance.id_employee)
-        .group_by(DateDimension.mois, DateDimension.nom_mois)
-        .where(DateDimension.trimestre == target_quarter)
-        .where(DateDimension.annee == target_year)
-        .where(~DateDimension.est_ferie)
-        .where(DateDimension.jour_semaine.not_in([6, 7]))
-        .order_by(DateDimension.mois)
+    calendar = calendar_index()
+    dataset = _fetch_dataset(monthly_dataset_stmt(calendar, target_month, target_year))
+    return replace(dataset, rows=monthly_rows(calendar, dataset.rows))
+
+
+def quarter_period(target_quarter: int, target_year: int) -> Period:
+    first_month = target_quarter * 3 - 2
+    return (
+        target_year * 10000 + first_month * 100 + 1,
+        target_year * 10000 + (first_month + 2) * 100 + 31,
     )
 
-    with Session(engine) as session:
-        return session.execute(stmt).all()
+
+def year_period(target_year: int) -> Period:
+    return target_year * 10000 + 101, target_year * 10000 + 1231
 
 
 @task
-def fetch_yearly_data(target_year: int) -> Sequence[Row[Tuple[int, str, int, Any]]]:
-    logger = get_run_logger()
-    try:
-        engine = get_engine()
-    except Exception as e:
-        logger.error(f"Error while connecting to the database: {e}")
-        exit(1)
+def fetch_quarterly_dataset(target_quarter: int, target_year: int) -> ReportDataset:
+    """
+    return service id | month | month name | absence count | total employees
+    """
+    shared = _prefetched_dataset(
+        report_period("quarterly", date(target_year, target_quarter * 3, 1))
+    )
+    if shared is not None:
+        return shared
+
+    return _fetch_routed_dataset(quarter_period(target_quarter, target_year))
+
+
+@task
+def fetch_yearly_dataset(target_year: int) -> ReportDataset:
+    """
+    return service id | month | month name | absence count | total employees
+    """
+    shared = _prefetched_dataset(report_period("yearly", date(target_year, 1, 1)))
+    if shared is not None:
+        return shared
+
+    return _fetch_routed_dataset(year_period(target_year))
+
+
+# *------------------------- Several periods from one scan -------------------------*
+
+REPORT_KINDS = ("weekly", "monthly", "quarterly", "yearly")
+
+# kind | first day | last day
+ReportPeriod = Tuple[str, date, date]
+
+# Datasets fetched ahead by `shared_datasets`, read by the fetch_*_dataset tasks
+_shared_datasets: Dict[ReportPeriod, ReportDataset] = {}
+
+
+def report_period(kind: str, day: date) -> ReportPeriod:
+    """
+    return the period of the report kind that covers day
+    """
+    if kind == "weekly":
+        monday = day - timedelta(days=day.weekday())
+        return kind, monday, monday + timedelta(days=4)
+    if kind == "monthly":
+        return kind, *month_period(day.month, day.year)
+    if kind == "quarterly":
+        first_month = (day.month - 1) // 3 * 3 + 1
+        return (
+            kind,
+            date(day.year, first_month, 1),
+            month_period(first_month + 2, day.year)[1],
+        )
+    if kind == "yearly":
+        return kind, date(day.year, 1, 1), date(day.year, 12, 31)
+    raise ValueError(f"Invalid report kind: {kind}")
+
+
+def report_periods(
+    kinds: Sequence[str], start_date: date, end_date: date
+) -> List[ReportPeriod]:
+    """
+    Every period of the report kinds that overlaps start_date to end_date
+    """
+    periods: Dict[ReportPeriod, None] = {}
+    day = start_date
+    while day <= end_date:
+        for kind in kinds:
+            periods.setdefault(report_period(kind, day))
+        day += timedelta(days=1)
+    return list(periods)
+
+
+def multi_grain_stmt(day_ids: Sequence[int], month_day_ids: Sequence[int]) -> Select:
+    """
+    Totals of day_ids per service and day, and of month_day_ids per service and
+    month, grouped by GROUPING SETS in one scan of the daily totals. Days out
+    of day_ids fall in a NULL day, months with none of month_day_ids total NULL.
+
+    return service id | is month grain | date id or YYYYMM | absence count | total employees
+    """
+    daily = daily_totals(sorted({*day_ids, *month_day_ids}))
+    day = case((daily.c.date_id.in_(day_ids), daily.c.date_id))
+    month = daily.c.date_id // 100
+    is_month = func.grouping(day) == 1
 
-    stmt = (
+    def total(column: ColumnElement[int]) -> ColumnElement[int]:
+        # A month only counts the days asked for it
+        month_total = func.sum(column).filter(daily.c.date_id.in_(month_day_ids))
+        return case((is_month, month_total), else_=func.sum(column)).cast(Integer)
+
+    return (
         select(
-            DateDimension.mois,
-            DateDimension.nom_mois,
-            func.sum((~DailyAttendance.present).cast(Integer)).label("absence"),
-            (
-                func.round(
-                    func.sum((~DailyAttendance.present).cast(Integer))
-                    * 100.0
-                    / func.count(DimEmployee.id),
-                    2,
-                )
-            ).label("absence_percentage"),
+            daily.c.service_id,
+            is_month.label("is_month"),
+            case((is_month, month), else_=day).label("period"),
+            total(daily.c.absence_count).label("absence"),
+            total(daily.c.headcount).label("employee_count"),
         )
-        .join(DailyAttendance, DateDimension.date_id == DailyAttendance.date_id)
-        .join(DimEmployee, DimEmployee.id == DailyAttendance.id_employee)
-        .group_by(DateDimension.mois, DateDimension.nom_mois)
-        .where(DateDimension.annee == target_year)
-        .where(~DateDimension.est_ferie)
-        .where(DateDimension.jour_semaine.not_in([6, 7]))
-        .order_by(DateDimension.mois)
+        .group_by(
+            func.grouping_sets(
+                tuple_(daily.c.service_id, day), tuple_(daily.c.service_id, month)
+            )
+        )
+        .order_by(daily.c.service_id, "period")
     )
 
-    with Session(engine) as session:
-        return session.execute(stmt).all()
 
+def _period_day_ids(calendar: CalendarIndex, period: ReportPeriod) -> List[int]:
+    kind, start_date, end_date = period
+    if kind == "weekly":
+        return calendar.date_ids_between(start_date, end_date)
+    if kind == "monthly":
+        return calendar.weekday_ids_between(start_date, end_date)
+    return calendar.working_day_ids_between(start_date, end_date)
 
-# *--------------------------------- CSV / EXCEL generation -------------------------------------*
+
+@task
+def fetch_period_datasets(
+    periods: Sequence[ReportPeriod],
+) -> Dict[ReportPeriod, ReportDataset]:
+    """
+    The datasets of every period, from one multi-grain query split per period.
+    Weekly and monthly reports read days, quarterly and yearly ones months.
+    """
+    calendar = calendar_index()
+    day_ids: set[int] = set()
+    month_day_ids: set[int] = set()
+    for period in periods:
+        ids = month_day_ids if period[0] in ("quarterly", "yearly") else day_ids
+        ids.update(_period_day_ids(calendar, period))
+
+    if REPORT_BACKEND == "snapshot":
+        rows = multi_grain_rows(sorted(day_ids), sorted(month_day_ids))
+    else:
+        logger = get_run_logger()
+        try:
+            engine = get_engine()
+        except Exception as e:
+            logger.error(f"Error while connecting to the database: {e}")
+            exit(1)
+
+        with engine.connect() as conn:
+            rows = conn.execute(
+                multi_grain_stmt(sorted(day_ids), sorted(month_day_ids))
+            ).all()
+
+    # Rows are ordered by service, then day or month, each period keeps it
+    period_rows: Dict[ReportPeriod, List[Tuple[Any, ...]]] = defaultdict(list)
+    day_kinds = {kind for kind, _, _ in periods} & {"weekly", "monthly"}
+    month_kinds = {kind for kind, _, _ in periods} & {"quarterly", "yearly"}
+    for service_id, is_month, period_id, absence, employee_count in rows:
+        if period_id is None or absence is None:
+            continue  # Days or months no period asked for
+        if is_month:
+            year, month = divmod(period_id, 100)
+            day = date(year, month, 1)
+            row = (service_id, month, MONTH_NAMES[month - 1], absence, employee_count)
+            kinds = month_kinds
+        else:
+            day = calendar.day(period_id)
+            row = (service_id, period_id, absence, employee_count)
+            kinds = day_kinds
+        for kind in kinds:
+            period_rows[report_period(kind, day)].append(row)
+
+    dimension = services()
+    datasets = {}
+    for period in periods:
+        kind = period[0]
+        if kind == "weekly":
+            dataset_rows = weekly_rows(calendar, period_rows[period])
+        elif kind == "monthly":
+            dataset_rows = monthly_rows(calendar, period_rows[period])
+        else:
+            dataset_rows = period_rows[period]
+        datasets[period] = ReportDataset(services=dimension, rows=dataset_rows)
+    return datasets
+
+
+def _prefetched_dataset(period: ReportPeriod) -> ReportDataset | None:
+    """
+    The dataset shared with the report, or read from the snapshot backend
+    """
+    if period in _shared_datasets:
+        return _shared_datasets[period]
+    if REPORT_BACKEND == "snapshot":
+        return fetch_period_datasets.fn([period])[period]
+    return None
+
+
+@contextmanager
+def shared_datasets(datasets: Dict[ReportPeriod, ReportDataset]) -> Iterator[None]:
+    """
+    Serve the datasets to the fetch_*_dataset tasks of this process, so report
+    flows run together slice one query instead of running their own
+    """
+    _shared_datasets.update(datasets)
+    try:
+        yield
+    finally:
+        for period in datasets:
+            _shared_datasets.pop(period, None)
 
 
 @task
-def generate_daily_csv(
-    daily_data: Sequence[Row[Tuple[DimEmployee, Any, bool]]], filename: str
-):
-    def format_timedelta(td: timedelta) -> str:
-        total_minutes = td.total_seconds() // 60
+def fetch_weekly_data(
+    dataset: ReportDataset,
+) -> List[Tuple[date, str, bool, int, int, Decimal]]:
+    """
+    return date | day name | is holiday | absence count | total employees | absence percentage
+    """
+    return company_table(dataset)
+
+
+@task
+def fetch_monthly_data(dataset: ReportDataset) -> List[Tuple[date, str, int, Decimal]]:
+    """
+    return date | day name | absence count | absence percentage
+    """
+    return [
+        (date_literal, day_name, absence, percentage)
+        for date_literal, day_name, absence, _, percentage in company_table(dataset)
+    ]
+
+
+@task
+def fetch_quarterly_data(dataset: ReportDataset) -> List[Tuple[int, str, int, Decimal]]:
+    """
+    return month | month name | absence count | absence percentage
+    """
+    return [
+        (month, month_name, absence, percentage)
+        for month, month_name, absence, _, percentage in company_table(dataset)
+    ]
+
+
+@task
+def fetch_yearly_data(dataset: ReportDataset) -> List[Tuple[int, str, int, Decimal]]:
+    """
+    return month | month name | absence count | absence percentage
+    """
+    return [
+        (month, month_name, absence, percentage)
+        for month, month_name, absence, _, percentage in company_table(dataset)
+    ]
+
+
+# *--------------------------------- CSV / EXCEL generation -------------------------------------*
+
+
+def _write_daily_csv(
+    batches: Iterable[Sequence[EmployeeAttendance]], filename: str
+) -> str:
+    def format_duration(seconds: int) -> str:
+        total_minutes = seconds // 60
         hours = int(total_minutes // 60)
         minutes = int(total_minutes % 60)
         return f"{hours}h {minutes}m"
@@ -271,18 +612,63 @@ def generate_daily_csv(
         # Header
         writer.writerow(["Matricule", "Nom", "Prénom", "Présent", "Durée de travail"])
 
-        for emp, daily, dur in daily_data:
-            matricule = emp.matricule
-            first_name = emp.first_name
-            last_name = emp.last_name
-            present = "OUI" if daily.present else "NON"
-            work_duration = format_timedelta(dur) if present == "OUI" else "0"
+        for batch in batches:
+            for emp in batch:
+                matricule = emp.matricule
+                first_name = emp.first_name
+                last_name = emp.last_name
+                present = "OUI" if emp.present else "NON"
+                work_duration = (
+                    format_duration(emp.work_seconds) if present == "OUI" else "0"
+                )
 
-            writer.writerow([matricule, last_name, first_name, present, work_duration])
+                writer.writerow(
+                    [matricule, last_name, first_name, present, work_duration]
+                )
 
     return f"data/daily_reports/{filename}.csv"
 
 
+@task
+def generate_daily_csv(daily_data: Sequence[EmployeeAttendance], filename: str):
+    return _write_daily_csv([daily_data], filename)
+
+
+@task
+def stream_daily_attendance(
+    target_date_id: int, under_work_thresholds: Sequence[float], filename: str
+) -> Tuple[AttendanceClassification, str]:
+    """
+    Write the daily CSV and classify the rows batch by batch from a server-side
+    cursor, so memory holds one batch plus the classified rows
+
+    return classification | csv file path
+    """
+    logger = get_run_logger()
+    try:
+        engine = get_engine()
+    except Exception as e:
+        logger.error(f"Error while connecting to the database: {e}")
+        exit(1)
+
+    classification = classify_attendance.fn([], under_work_thresholds)
+
+    def classified(
+        batches: Iterable[List[EmployeeAttendance]],
+    ) -> Iterator[List[EmployeeAttendance]]:
+        for batch in batches:
+            batch_classification = classify_attendance.fn(batch, under_work_thresholds)
+            classification.absent.extend(batch_classification.absent)
+            for threshold, rows in batch_classification.under_thresholds.items():
+                classification.under_thresholds[threshold].extend(rows)
+            yield batch
+
+    filepath = _write_daily_csv(
+        classified(stream_employees_per_date(engine, target_date_id)), filename
+    )
+    return classification, filepath
+
+
 @task
 def generate_weekly_csv(
     weekly_data: Sequence[Row[Tuple[date, str, bool, int, int, Any]]], filename: str
@@ -322,364 +708,127 @@ def generate_weekly_csv(
 
 
 @task
-def generate_weekly_excel(start_date: date, end_date: date, filename: str) -> str:
-    logger = get_run_logger()
-
-    os.makedirs("data/weekly_reports/", exist_ok=True)
-    workbook = xlsxwriter.Workbook(f"data/weekly_reports/{filename}.xlsx")
-    date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
-
-    try:
-        engine = get_engine()
-    except Exception as e:
-        logger.error(f"Error while connecting to the database: {e}")
-        exit(1)
-
-    logger.info("Fetching data from database")
-    with Session(engine) as session:
-        services = session.execute(select(DimService.id, DimService.name)).all()
-        for service in services:
-            stmt = (
-                select(
-                    DateDimension.date_literale,
-                    DateDimension.nom_jour,
-                    DateDimension.est_ferie,
-                    func.sum((~DailyAttendance.present).cast(Integer)).label("absence"),
-                    func.count(DimEmployee.id).label("employee_count"),
-                    (
-                        func.round(
-                            func.sum((~DailyAttendance.present).cast(Integer))
-                            * 100.0
-                            / func.count(DimEmployee.id),
-                            2,
-                        )
-                    ).label("absence_percentage"),
-                )
-                .join(DailyAttendance, DateDimension.date_id == DailyAttendance.date_id)
-                .join(DimEmployee, DimEmployee.id == DailyAttendance.id_employee)
-                .join(DimService, DimService.id == DimEmployee.service_id)
-                .where(DateDimension.date_literale.between(start_date, end_date))
-                .where(DimService.id == service.id)
-                .group_by(
-                    DateDimension.date_literale,
-                    DateDimension.nom_jour,
-                    DateDimension.est_ferie,
-                )
-                .order_by(DateDimension.date_literale.asc())
+def generate_weekly_excel(dataset: ReportDataset, filename: str) -> str:
+    path = f"data/weekly_reports/{filename}.xlsx"
+    tables = service_tables(dataset)
+    with ReportWorkbook(path) as workbook:
+        for service in dataset.services:
+            worksheet = workbook.add_sheet(
+                sheet_name(service.name),
+                f"Rapport hebdomadaire - {service.name}",
+                [
+                    "Date",
+                    "Jour",
+                    "Férié",
+                    "Nombre d'absences",
+                    "Nombre total d'employés",
+                    "Absence %",
+                ],
+                [12, 12, 10, 16, 26, 16],
+                {0: DATE_FORMAT},
             )
-
-            table = session.execute(stmt).all()
-
-            cleaned_name = "".join(
-                [c for c in service.name if c not in ["'", "/", '"', "@"]]
+            workbook.write_rows(
+                worksheet,
+                (
+                    (date_literal, day_name, "OUI" if is_holiday else "NON", *totals)
+                    for date_literal, day_name, is_holiday, *totals in tables.get(
+                        service.id, []
+                    )
+                ),
             )
 
-            worksheet_name = cleaned_name[:31]
-            worksheet = workbook.add_worksheet(name=worksheet_name)
-            worksheet.set_column(0, 0, 12)  # Date column
-            worksheet.set_column(1, 1, 12)  # Day name
-            worksheet.set_column(2, 2, 10)  # Férié
-            worksheet.set_column(3, 3, 16)  # Absences
-            worksheet.set_column(4, 4, 26)  # Total employees
-            worksheet.set_column(5, 5, 16)  # Other columns
-
-            headers = [
-                "Date",
-                "Jour",
-                "Férié",
-                "Nombre d'absences",
-                "Nombre total d'employés",
-                "Absence %",
-            ]
-
-            # Add a title in the first row
-            title = f"Rapport hebdomadaire - {service.name}"
-            title_format = workbook.add_format(
-                {"align": "center", "bold": True, "font_size": 14}
-            )
-            worksheet.merge_range(0, 0, 0, len(headers) - 1, title, title_format)
-
-            # Write headers in the second row
-            for col, header in enumerate(headers):
-                worksheet.write(1, col, header)
-
-            # Write data starting from the third row
-            for row_idx, row in enumerate(table, start=2):
-                for col_idx, value in enumerate(row):
-                    if col_idx == 0 and isinstance(value, date):  # Date column
-                        worksheet.write_datetime(row_idx, col_idx, value, date_format)
-                    elif col_idx == 2:  # Férié column
-                        worksheet.write(row_idx, col_idx, "OUI" if value else "NON")
-                    else:
-                        worksheet.write(row_idx, col_idx, value)
-
-    workbook.close()
-    return f"data/weekly_reports/{filename}.xlsx"
+    return path
 
 
 @task
-def generate_monthly_excel(target_month: int, target_year: int, filename: str) -> str:
-    logger = get_run_logger()
-
-    os.makedirs("data/monthly_reports/", exist_ok=True)
-    workbook = xlsxwriter.Workbook(f"data/monthly_reports/{filename}.xlsx")
-    date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
-
-    try:
-        engine = get_engine()
-    except Exception as e:
-        logger.error(f"Error while connecting to the database: {e}")
-        exit(1)
-
-    logger.info("Fetching data from database")
-
-    with Session(engine) as session:
-        services = session.execute(select(DimService.id, DimService.name)).all()
-        for service in services:
-            stmt = (
-                select(
-                    DateDimension,
-                    func.sum((~DailyAttendance.present).cast(Integer)).label("absence"),
-                    (
-                        func.round(
-                            func.sum((~DailyAttendance.present).cast(Integer))
-                            * 100.0
-                            / func.count(DimEmployee.id),
-                            2,
-                        )
-                    ).label("absence_percentage"),
-                )
-                .join(DailyAttendance, DateDimension.date_id == DailyAttendance.date_id)
-                .join(DimEmployee, DimEmployee.id == DailyAttendance.id_employee)
-                .join(DimService, DimService.id == DimEmployee.service_id)
-                .group_by(DateDimension.date_id)
-                .where(DateDimension.mois == target_month)
-                .where(DateDimension.annee == target_year)
-                .where(DateDimension.jour_semaine.not_in([6, 7]))
-                .where(DimService.id == service.id)
-                .order_by(DateDimension.date_id)
+def generate_monthly_excel(
+    dataset: ReportDataset,
+    target_month: int,
+    filename: str,
+    durations: Sequence[DurationStats] | None = None,
+    absences: Sequence[ServiceAbsences] | None = None,
+) -> str:
+    path = f"data/monthly_reports/{filename}.xlsx"
+    tables = service_tables(dataset)
+    with ReportWorkbook(path) as workbook:
+        for service in dataset.services:
+            worksheet = workbook.add_sheet(
+                sheet_name(service.name),
+                f"Rapport du mois {target_month} - {service.name}",
+                ["Date", "Jour", "Nombre d'absences", "Absence %"],
+                [12, 12, 16, 16],
+                {0: DATE_FORMAT},
+            )
+            workbook.write_rows(
+                worksheet,
+                (
+                    (date_literal, day_name, absence, absence_percentage)
+                    for date_literal, day_name, absence, _, absence_percentage in (
+                        tables.get(service.id, [])
+                    )
+                ),
             )
 
-            table = session.execute(stmt).all()
-
-            cleaned_name = "".join(
-                [c for c in service.name if c not in ["'", "/", '"', "@"]]
+        if durations is not None:
+            write_duration_worksheet(
+                workbook, durations, dataset.services, f"mois {target_month}"
             )
 
-            worksheet_name = cleaned_name[:31]
-            worksheet = workbook.add_worksheet(name=worksheet_name)
-            worksheet.set_column(0, 0, 12)
-            worksheet.set_column(1, 1, 12)
-            worksheet.set_column(2, 2, 16)
-            worksheet.set_column(3, 3, 16)
-
-            headers = [
-                "Date",
-                "Jour",
-                "Nombre d'absences",
-                "Absence %",
-            ]
-
-            # Add a title in the first row
-            title = f"Rapport du mois {target_month} - {service.name}"
-            title_format = workbook.add_format(
-                {"align": "center", "bold": True, "font_size": 14}
+        if absences is not None:
+            write_absence_worksheet(
+                workbook, absences, dataset.services, f"mois {target_month}"
             )
-            worksheet.merge_range(0, 0, 0, len(headers) - 1, title, title_format)
 
-            # Write headers in the second row
-            for col, header in enumerate(headers):
-                worksheet.write(1, col, header)
+    return path
 
-            # Write data starting from the third row
-            for row_idx, row in enumerate(table, start=2):
-                date_dim = row[0]
-                absence = row[1]
-                absence_percentage = row[2]
 
-                # Write date and day name
-                worksheet.write_datetime(
-                    row_idx, 0, date_dim.date_literale, date_format
+def _write_month_sheets(
+    workbook: ReportWorkbook, dataset: ReportDataset, title: str
+) -> None:
+    tables = service_tables(dataset)
+    for service in dataset.services:
+        worksheet = workbook.add_sheet(
+            sheet_name(service.name),
+            f"{title} - {service.name}",
+            ["Mois", "Nom mois", "Nombre d'absences", "Absence %"],
+            [12, 12, 16, 16],
+        )
+        workbook.write_rows(
+            worksheet,
+            (
+                (month, month_name, absence, absence_percentage)
+                for month, month_name, absence, _, absence_percentage in tables.get(
+                    service.id, []
                 )
-                worksheet.write(row_idx, 1, date_dim.nom_jour)
-                # Write absence and absence percentage
-                worksheet.write(row_idx, 2, absence)
-                worksheet.write(row_idx, 3, absence_percentage)
-
-    workbook.close()
-    return f"data/monthly_reports/{filename}.xlsx"
+            ),
+        )
 
 
 @task
 def generate_quarterly_excel(
-    target_quarter: int, target_year: int, filename: str
+    dataset: ReportDataset, target_quarter: int, filename: str
 ) -> str:
-    logger = get_run_logger()
+    path = f"data/quarterly_reports/{filename}.xlsx"
+    with ReportWorkbook(path) as workbook:
+        _write_month_sheets(workbook, dataset, f"Rapport du trimestre {target_quarter}")
 
-    os.makedirs("data/quarterly_reports/", exist_ok=True)
-    workbook = xlsxwriter.Workbook(f"data/quarterly_reports/{filename}.xlsx")
-
-    try:
-        engine = get_engine()
-    except Exception as e:
-        logger.error(f"Error while connecting to the database: {e}")
-        exit(1)
-
-    logger.info("Fetching data from database")
-
-    with Session(engine) as session:
-        services = session.execute(select(DimService.id, DimService.name)).all()
-        for service in services:
-            stmt = (
-                select(
-                    DateDimension.mois,
-                    DateDimension.nom_mois,
-                    func.sum((~DailyAttendance.present).cast(Integer)).label("absence"),
-                    (
-                        func.round(
-                            func.sum((~DailyAttendance.present).cast(Integer))
-                            * 100.0
-                            / func.count(DimEmployee.id),
-                            2,
-                        )
-                    ).label("absence_percentage"),
-                )
-                .join(DailyAttendance, DateDimension.date_id == DailyAttendance.date_id)
-                .join(DimEmployee, DimEmployee.id == DailyAttendance.id_employee)
-                .join(DimService, DimService.id == DimEmployee.service_id)
-                .group_by(DateDimension.mois, DateDimension.nom_mois)
-                .where(DateDimension.trimestre == target_quarter)
-                .where(~DateDimension.est_ferie)
-                .where(DateDimension.annee == target_year)
-                .where(DateDimension.jour_semaine.not_in([6, 7]))
-                .where(DimService.id == service.id)
-                .order_by(DateDimension.mois)
-            )
-
-            table = session.execute(stmt).all()
-
-            cleaned_name = "".join(
-                [c for c in service.name if c not in ["'", "/", '"', "@"]]
-            )
-
-            worksheet_name = cleaned_name[:31]
-            worksheet = workbook.add_worksheet(name=worksheet_name)
-            worksheet.set_column(0, 0, 12)
-            worksheet.set_column(1, 1, 12)
-            worksheet.set_column(2, 2, 16)
-            worksheet.set_column(3, 3, 16)
-
-            headers = [
-                "Mois",
-                "Nom mois",
-                "Nombre d'absences",
-                "Absence %",
-            ]
-
-            title = f"Rapport du trimestre {target_quarter} - {service.name}"
-            title_format = workbook.add_format(
-                {"align": "center", "bold": True, "font_size": 14}
-            )
-            worksheet.merge_range(0, 0, 0, len(headers) - 1, title, title_format)
-
-            for col, header in enumerate(headers):
-                worksheet.write(1, col, header)
-
-            for row_idx, row in enumerate(table, start=2):
-                month = row[0]
-                month_name = row[1]
-                absence = row[2]
-                absence_percentage = row[3]
-                worksheet.write(row_idx, 0, month)
-                worksheet.write(row_idx, 1, month_name)
-                worksheet.write(row_idx, 2, absence)
-                worksheet.write(row_idx, 3, absence_percentage)
-
-    workbook.close()
-    return f"data/quarterly_reports/{filename}.xlsx"
+    return path
 
 
 @task
-def generate_yearly_excel(target_year: int, filename: str) -> str:
-    logger = get_run_logger()
-
-    os.makedirs("data/yearly_reports/", exist_ok=True)
-    workbook = xlsxwriter.Workbook(f"data/yearly_reports/{filename}.xlsx")
-
-    try:
-        engine = get_engine()
-    except Exception as e:
-        logger.error(f"Error while connecting to the database: {e}")
-        exit(1)
-
-    logger.info("Fetching data from database")
-
-    with Session(engine) as session:
-        services = session.execute(select(DimService.id, DimService.name)).all()
-        for service in services:
-            stmt = (
-                select(
-                    DateDimension.mois,
-                    DateDimension.nom_mois,
-                    func.sum((~DailyAttendance.present).cast(Integer)).label("absence"),
-                    (
-                        func.round(
-                            func.sum((~DailyAttendance.present).cast(Integer))
-                            * 100.0
-                            / func.count(DimEmployee.id),
-                            2,
-                        )
-                    ).label("absence_percentage"),
-                )
-                .join(DailyAttendance, DateDimension.date_id == DailyAttendance.date_id)
-                .join(DimEmployee, DimEmployee.id == DailyAttendance.id_employee)
-                .join(DimService, DimService.id == DimEmployee.service_id)
-                .group_by(DateDimension.mois, DateDimension.nom_mois)
-                .where(~DateDimension.est_ferie)
-                .where(DateDimension.annee == target_year)
-                .where(DateDimension.jour_semaine.not_in([6, 7]))
-                .where(DimService.id == service.id)
-                .order_by(DateDimension.mois)
-            )
-
-            table = session.execute(stmt).all()
+def generate_yearly_excel(
+    dataset: ReportDataset,
+    target_year: int,
+    filename: str,
+    durations: Sequence[DurationStats] | None = None,
+) -> str:
+    path = f"data/yearly_reports/{filename}.xlsx"
+    with ReportWorkbook(path) as workbook:
+        _write_month_sheets(workbook, dataset, f"Rapport de l'année {target_year}")
 
-            cleaned_name = "".join(
-                [c for c in service.name if c not in ["'", "/", '"', "@"]]
+        if durations is not None:
+            write_duration_worksheet(
+                workbook, durations, dataset.services, f"année {target_year}"
             )
 
-            worksheet_name = cleaned_name[:31]
-            worksheet = workbook.add_worksheet(name=worksheet_name)
-            worksheet.set_column(0, 0, 12)
-            worksheet.set_column(1, 1, 12)
-            worksheet.set_column(2, 2, 16)
-            worksheet.set_column(3, 3, 16)
-
-            headers = [
-                "Mois",
-                "Nom mois",
-                "Nombre d'absences",
-                "Absence %",
-            ]
-
-            title = f"Rapport de l'année {target_year} - {service.name}"
-            title_format = workbook.add_format(
-                {"align": "center", "bold": True, "font_size": 14}
-            )
-            worksheet.merge_range(0, 0, 0, len(headers) - 1, title, title_format)
-
-            for col, header in enumerate(headers):
-                worksheet.write(1, col, header)
-
-            for row_idx, row in enumerate(table, start=2):
-                month = row[0]
-                month_name = row[1]
-                absence = row[2]
-                absence_percentage = row[3]
-                worksheet.write(row_idx, 0, month)
-                worksheet.write(row_idx, 1, month_name)
-                worksheet.write(row_idx, 2, absence)
-                worksheet.write(row_idx, 3, absence_percentage)
-
-    workbook.close()
-    return f"data/yearly_reports/{filename}.xlsx"
+    return path
@@ -1,11 +1,314 @@
+import time
+from datetime import date, datetime, timezone
+from typing import List, Tuple
 from prefect import task
 from prefect.logging import get_run_logger, disable_run_logger
 from database.db import get_engine
-from sqlalchemy import text
+from sqlalchemy import Connection, text
+
+# Staff on each day of the calendar, per service. An employee counts from their
+# integration_date up to, but excluding, their departure_date. Movements dated
+# before the calendar starts are folded into its first day.
+DAILY_HEADCOUNT_UPSERT = text(
+    """
+    INSERT INTO hr_data.fact_daily_headcount AS hc (date_id, service_id, headcount)
+    SELECT
+        dd.date_id,
+        s.id,
+        sum(COALESCE(mv.delta, 0)) OVER (
+            PARTITION BY s.id ORDER BY dd.date_literale
+        )
+    FROM hr_data.dim_date dd
+    CROSS JOIN hr_data.dim_service s
+    LEFT JOIN (
+        SELECT service_id, GREATEST(day, cal.first_day) AS day, sum(delta) AS delta
+        FROM (
+            SELECT service_id, integration_date AS day, 1 AS delta
+            FROM hr_data.dim_employee
+            UNION ALL
+            SELECT service_id, departure_date, -1
+            FROM hr_data.dim_employee
+            WHERE departure_date IS NOT NULL
+        ) movements
+        CROSS JOIN (SELECT min(date_literale) AS first_day FROM hr_data.dim_date) cal
+        GROUP BY service_id, GREATEST(day, cal.first_day)
+    ) mv ON mv.service_id = s.id AND mv.day = dd.date_literale
+    ON CONFLICT (date_id, service_id) DO UPDATE
+    SET headcount = EXCLUDED.headcount
+    WHERE hc.headcount IS DISTINCT FROM EXCLUDED.headcount
+    """
+)
+# The same counts for a single day, cheap enough to run ahead of a daily report
+# so that employees loaded since the last warehouse refresh are counted
+DAY_HEADCOUNT_UPSERT = text(
+    """
+    INSERT INTO hr_data.fact_daily_headcount AS hc (date_id, service_id, headcount)
+    SELECT dd.date_id, s.id, count(e.id)
+    FROM hr_data.dim_date dd
+    CROSS JOIN hr_data.dim_service s
+    LEFT JOIN hr_data.dim_employee e
+        ON e.service_id = s.id
+        AND e.integration_date <= dd.date_literale
+        AND (e.departure_date IS NULL OR e.departure_date > dd.date_literale)
+    WHERE dd.date_id = :date_id
+    GROUP BY dd.date_id, s.id
+    ON CONFLICT (date_id, service_id) DO UPDATE
+    SET headcount = EXCLUDED.headcount
+    WHERE hc.headcount IS DISTINCT FROM EXCLUDED.headcount
+    """
+)
+
+# Days are queued in hr_data.summary_pending_dates by triggers on the attendance
+# and headcount tables. Taking them with DELETE ... RETURNING lets concurrent
+# refreshes split the work instead of recomputing the same days twice.
+SUMMARY_MARK_ALL_PENDING = text(
+    """
+    INSERT INTO hr_data.summary_pending_dates (date_id)
+    SELECT DISTINCT date_id FROM hr_data.fact_daily_attendance
+    ON CONFLICT DO NOTHING
+    """
+)
+SUMMARY_TAKE_PENDING = text(
+    "DELETE FROM hr_data.summary_pending_dates RETURNING date_id"
+)
+SUMMARY_CLEAR = text(
+    "DELETE FROM hr_data.fact_daily_service_summary WHERE date_id = ANY(:date_ids)"
+)
+SUMMARY_MARK_MONTHS_PENDING = text(
+    """
+    INSERT INTO hr_data.absence_pending_months (target, annee, mois)
+    SELECT DISTINCT 'hr_data.fact_monthly_service_summary', annee, mois
+    FROM hr_data.dim_date
+    WHERE date_id = ANY(:date_ids)
+    ON CONFLICT DO NOTHING
+    """
+)
+SUMMARY_INSERT = text(
+    """
+    INSERT INTO hr_data.fact_daily_service_summary
+        (date_id, service_id, absence_count, headcount, worked_seconds)
+    SELECT
+        a.date_id,
+        e.service_id,
+        count(*) FILTER (WHERE NOT a.present),
+        COALESCE(max(hc.headcount), 0),
+        COALESCE(
+            sum(extract(epoch FROM a.check_out_hour - a.check_in_hour))
+                FILTER (WHERE a.present),
+            0
+        )
+    FROM hr_data.fact_daily_attendance a
+    JOIN hr_data.dim_employee e ON e.id = a.id_employee
+    LEFT JOIN hr_data.fact_daily_headcount hc
+        ON hc.date_id = a.date_id AND hc.service_id = e.service_id
+    WHERE a.date_id = ANY(:date_ids)
+    GROUP BY a.date_id, e.service_id
+    """
+)
+
+
+# Monthly rollups. The absence tables keep their former materialized view names;
+# triggers on fact_absence, dim_employee and dim_service queue the (annee, mois)
+# buckets they need to recompute in hr_data.absence_pending_months. The service
+# summary rollup is queued by the daily summary refresh and only covers working
+# days.
+MONTHLY_ROLLUP_BUCKETS = "unnest(CAST(:annees AS integer[]), CAST(:mois AS integer[]))"
+MONTHLY_ROLLUP_SELECTS = {
+    "hr_data.mv_employee_absence_monthly": f"""
+        SELECT
+            dd.annee,
+            dd.mois,
+            e.id,
+            e.first_name,
+            e.last_name,
+            count(*)
+        FROM hr_data.fact_absence abs
+        JOIN hr_data.dim_employee e ON e.id = abs.id_employe
+        JOIN hr_data.dim_date dd ON dd.date_id = abs.date_absence_id
+        JOIN {MONTHLY_ROLLUP_BUCKETS} AS b (annee, mois)
+            ON b.annee = dd.annee AND b.mois = dd.mois
+        GROUP BY dd.annee, dd.mois, e.id, e.first_name, e.last_name
+    """,
+    "hr_data.mv_service_absence_monthly": f"""
+        SELECT
+            dd.annee,
+            dd.mois,
+            s.id,
+            s.name,
+            count(*)
+        FROM hr_data.fact_absence abs
+        JOIN hr_data.dim_employee e ON e.id = abs.id_employe
+        JOIN hr_data.dim_date dd ON dd.date_id = abs.date_absence_id
+        JOIN hr_data.dim_service s ON s.id = e.service_id
+        JOIN {MONTHLY_ROLLUP_BUCKETS} AS b (annee, mois)
+            ON b.annee = dd.annee AND b.mois = dd.mois
+        GROUP BY dd.annee, dd.mois, s.id, s.name
+    """,
+    "hr_data.fact_monthly_service_summary": f"""
+        SELECT
+            dd.annee,
+            dd.mois,
+            s.service_id,
+            sum(s.absence_count),
+            sum(s.headcount)
+        FROM hr_data.fact_daily_service_summary s
+        JOIN hr_data.dim_date dd ON dd.date_id = s.date_id
+        JOIN {MONTHLY_ROLLUP_BUCKETS} AS b (annee, mois)
+            ON b.annee = dd.annee AND b.mois = dd.mois
+        WHERE NOT dd.est_ferie AND dd.jour_semaine NOT IN (6, 7)
+        GROUP BY dd.annee, dd.mois, s.service_id
+    """,
+}
+MONTHLY_ROLLUP_TAKE_PENDING = text(
+    """
+    DELETE FROM hr_data.absence_pending_months
+    WHERE target = :target
+    RETURNING annee, mois
+    """
+)
+
+
+# Monthly partitions of the fact tables, named <table>_y<YYYY>m<MM>, see
+# database/migrations/2026_10_22.sql. Their names sort chronologically.
+FACT_PARTITIONED_TABLES = ["fact_daily_attendance", "fact_absence"]
+CREATE_FACT_PARTITIONS = text("SELECT hr_data.create_fact_partitions()")
+FACT_PARTITIONS_BEFORE = text(
+    """
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = CAST(:parent AS regclass) AND c.relname < :first_kept
+    ORDER BY c.relname
+    """
+)
+
+
+REFRESH_LOG_INSERT = text(
+    """
+    INSERT INTO hr_data.warehouse_refresh_log (target, started_at, duration_seconds)
+    VALUES (:target, :started_at, :duration_seconds)
+    """
+)
+
+
+def record_refresh(
+    conn: Connection, target: str, started_at: datetime, duration: float
+) -> None:
+    """
+    Log a refresh in the same transaction, so only committed refreshes are logged
+    """
+    conn.execute(
+        REFRESH_LOG_INSERT,
+        {"target": target, "started_at": started_at, "duration_seconds": duration},
+    )
+
+
+def refresh_service_summary(conn: Connection, full_rebuild: bool = False) -> int:
+    """
+    Recompute the summary rows of every pending day, return the number of days
+    """
+    if full_rebuild:
+        conn.execute(SUMMARY_MARK_ALL_PENDING)
+
+    date_ids = list(conn.execute(SUMMARY_TAKE_PENDING).scalars())
+    if date_ids:
+        conn.execute(SUMMARY_CLEAR, {"date_ids": date_ids})
+        conn.execute(SUMMARY_INSERT, {"date_ids": date_ids})
+        conn.execute(SUMMARY_MARK_MONTHS_PENDING, {"date_ids": date_ids})
+
+    return len(date_ids)
+
+
+def refresh_monthly_rollup(
+    conn: Connection, target: str, full_rebuild: bool = False
+) -> int:
+    """
+    Recompute the pending months of a monthly rollup, return their number
+    """
+    if full_rebuild:
+        conn.execute(
+            text(
+                f"""
+                INSERT INTO hr_data.absence_pending_months (target, annee, mois)
+                SELECT DISTINCT :target, annee, mois FROM hr_data.dim_date
+                UNION
+                SELECT :target, annee, mois FROM {target}
+                ON CONFLICT DO NOTHING
+                """
+            ),
+            {"target": target},
+        )
+
+    buckets = conn.execute(MONTHLY_ROLLUP_TAKE_PENDING, {"target": target}).all()
+    if buckets:
+        params = {
+            "annees": [annee for annee, _ in buckets],
+            "mois": [mois for _, mois in buckets],
+        }
+        conn.execute(
+            text(
+                f"""
+                DELETE FROM {target} t
+                USING {MONTHLY_ROLLUP_BUCKETS} AS b (annee, mois)
+                WHERE t.annee = b.annee AND t.mois = b.mois
+                """
+            ),
+            params,
+        )
+        conn.execute(
+            text(f"INSERT INTO {target} {MONTHLY_ROLLUP_SELECTS[target]}"), params
+        )
+
+    return len(buckets)
+
+
+def _refresh_monthly_rollup_task(target: str, full_rebuild: bool):
+    logger = get_run_logger()
+    try:
+        engine = get_engine()
+    except Exception as e:
+        logger.error(f"Error while connecting to the database: {e}")
+        exit(1)
+
+    logger.info(f"Refreshing {target} table...")
+
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        refreshed = refresh_monthly_rollup(conn, target, full_rebuild)
+        duration = time.perf_counter() - start
+        record_refresh(conn, target, started_at, duration)
+
+    logger.info(f"{target} REFRESHED in {duration:.2f}s ({refreshed} months)")
+    return duration
+
+
+@task
+def refresh_monthly_employee_absence_mv(full_rebuild: bool = False):
+    return _refresh_monthly_rollup_task(
+        "hr_data.mv_employee_absence_monthly", full_rebuild
+    )
+
+
+@task
+def refresh_monthly_service_absence_mv(full_rebuild: bool = False):
+    return _refresh_monthly_rollup_task(
+        "hr_data.mv_service_absence_monthly", full_rebuild
+    )
 
 
 @task
-def refresh_monthly_employee_absence_mv():
+def refresh_monthly_service_summary(full_rebuild: bool = False):
+    return _refresh_monthly_rollup_task(
+        "hr_data.fact_monthly_service_summary", full_rebuild
+    )
+
+
+@task
+def refresh_daily_headcount(date_id: int | None = None):
+    """
+    Recount the headcount of every day, or only of date_id
+    """
     logger = get_run_logger()
     try:
         engine = get_engine()
@@ -13,18 +316,28 @@ def refresh_monthly_employee_absence_mv():
         logger.error(f"Error while connecting to the database: {e}")
         exit(1)
 
-    logger.info("Refreshing hr_data.mv_employee_absence_monthly materialized view...")
+    logger.info("Refreshing hr_data.fact_daily_headcount table...")
 
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
     with engine.begin() as conn:
-        conn.execute(
-            text("REFRESH MATERIALIZED VIEW hr_data.mv_employee_absence_monthly")
-        )
+        changed = (
+            conn.execute(DAILY_HEADCOUNT_UPSERT)
+            if date_id is None
+            else conn.execute(DAY_HEADCOUNT_UPSERT, {"date_id": date_id})
+        ).rowcount
+        duration = time.perf_counter() - start
+        record_refresh(conn, "hr_data.fact_daily_headcount", started_at, duration)
 
-    logger.info("hr_data.mv_employee_absence_monthly materialized view REFRESHED")
+    logger.info(
+        f"hr_data.fact_daily_headcount REFRESHED in {duration:.2f}s "
+        f"({changed} rows changed)"
+    )
+    return duration
 
 
 @task
-def refresh_monthly_service_absence_mv():
+def refresh_daily_service_summary(full_rebuild: bool = False):
     logger = get_run_logger()
     try:
         engine = get_engine()
@@ -32,14 +345,67 @@ def refresh_monthly_service_absence_mv():
         logger.error(f"Error while connecting to the database: {e}")
         exit(1)
 
-    logger.info("Refreshing hr_data.mv_service_absence_monthly materialized view...")
+    logger.info("Refreshing hr_data.fact_daily_service_summary table...")
 
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
     with engine.begin() as conn:
-        conn.execute(
-            text("REFRESH MATERIALIZED VIEW hr_data.mv_service_absence_monthly")
-        )
+        refreshed = refresh_service_summary(conn, full_rebuild)
+        duration = time.perf_counter() - start
+        record_refresh(conn, "hr_data.fact_daily_service_summary", started_at, duration)
+
+    logger.info(
+        f"hr_data.fact_daily_service_summary REFRESHED in {duration:.2f}s "
+        f"({refreshed} days)"
+    )
+    return duration
+
+
+@task
+def manage_fact_partitions(
+    retention_months: int | None = None,
+) -> Tuple[int, List[str]]:
+    """
+    return partitions created | partitions detached
+    """
+    logger = get_run_logger()
+    try:
+        engine = get_engine()
+    except Exception as e:
+        logger.error(f"Error while connecting to the database: {e}")
+        exit(1)
+
+    detached: List[str] = []
+    with engine.begin() as conn:
+        created = conn.execute(CREATE_FACT_PARTITIONS).scalar_one()
+
+        if retention_months is not None:
+            today = date.today()
+            first_kept_year, first_kept_month = divmod(
+                today.year * 12 + today.month - 1 - retention_months, 12
+            )
+            for table in FACT_PARTITIONED_TABLES:
+                old_partitions = conn.execute(
+                    FACT_PARTITIONS_BEFORE,
+                    {
+                        "parent": f"hr_data.{table}",
+                        "first_kept": (
+                            f"{table}_y{first_kept_year}m{first_kept_month + 1:02d}"
+                        ),
+                    },
+                ).scalars()
+                for partition in old_partitions:
+                    # The detached table keeps its rows and can be archived
+                    conn.execute(
+                        text(
+                            f"ALTER TABLE hr_data.{table} "
+                            f"DETACH PARTITION hr_data.{partition}"
+                        )
+                    )
+                    detached.append(partition)
 
-    logger.info("hr_data.mv_service_absence_monthly materialized view REFRESHED")
+    logger.info(f"{created} partitions created, {len(detached)} detached")
+    return created, detached
 
 
 if __name__ == "__main__":
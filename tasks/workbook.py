@@ -0,0 +1,75 @@
+import os
+from typing import Any, Dict, Iterable, Sequence, Tuple
+import xlsxwriter
+from xlsxwriter.format import Format
+from xlsxwriter.worksheet import Worksheet
+
+TITLE_FORMAT = {"align": "center", "bold": True, "font_size": 14}
+DATE_FORMAT = {"num_format": "yyyy-mm-dd"}
+
+
+def sheet_name(name: str) -> str:
+    """
+    return name without the characters Excel refuses, cut to 31 characters
+    """
+    return "".join(c for c in name if c not in ["'", "/", '"', "@"])[:31]
+
+
+class ReportWorkbook:
+    """
+    A workbook in xlsxwriter's constant_memory mode: each row is flushed to a
+    temporary file once a later row is written, so memory stays flat whatever
+    the size of the workbook. Sheets are therefore written one at a time, top
+    to bottom. Formats are created once per workbook and shared by its sheets.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+        self._formats: Dict[Tuple[Tuple[str, Any], ...], Format] = {}
+
+    def __enter__(self) -> "ReportWorkbook":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.workbook.close()
+
+    def format(self, properties: Dict[str, Any]) -> Format:
+        key = tuple(sorted(properties.items()))
+        if key not in self._formats:
+            self._formats[key] = self.workbook.add_format(properties)
+        return self._formats[key]
+
+    def add_sheet(
+        self,
+        name: str,
+        title: str,
+        headers: Sequence[str],
+        widths: Sequence[float],
+        column_formats: Dict[int, Dict[str, Any]] | None = None,
+    ) -> Worksheet:
+        """
+        Add a sheet with its title merged over the headers, the rows start on
+        the third line. Cells written without a format take the one of their
+        column.
+        """
+        column_formats = column_formats or {}
+        worksheet = self.workbook.add_worksheet(name=name)
+        for col, width in enumerate(widths):
+            properties = column_formats.get(col)
+            worksheet.set_column(
+                col, col, width, self.format(properties) if properties else None
+            )
+
+        worksheet.merge_range(
+            0, 0, 0, len(headers) - 1, title, self.format(TITLE_FORMAT)
+        )
+        worksheet.write_row(1, 0, headers)
+        return worksheet
+
+    def write_rows(
+        self, worksheet: Worksheet, rows: Iterable[Sequence[Any]], first_row: int = 2
+    ) -> None:
+        for row_idx, row in enumerate(rows, start=first_row):
+            worksheet.write_row(row_idx, 0, row)